@@ -0,0 +1,319 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+from metrics import ADMISSION_DECISIONS, ADMISSION_WAIT_SECONDS
+
+# Lower value is served first
+URGENT = "urgent"
+NORMAL = "normal"
+BULK = "bulk"
+PRIORITIES = {URGENT: 0, NORMAL: 1, BULK: 2}
+
+# Requests that must never queue: probes, stats, long-lived sockets, long polls and index lookups
+EXEMPT_PATHS = ('/health', '/metrics', '/pool-stats', '/cache-stats', '/available-voices', '/voice-session',
+                '/retrieve', '/knowledge-stats')
+
+# Endpoints whose text decides between the urgent and normal lane
+TTS_PATHS = ('/text-to-speech', '/text-to-speech-file', '/text-to-speech-stream')
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; the server answers 429."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify_request(method: str, path: str, priority_header: Optional[str] = None,
+                     text: Optional[str] = None, segmented: bool = False,
+                     urgent_max_chars: int = 200) -> Optional[str]:
+    """
+    Pick the scheduling lane for a request.
+
+    Short instruction synthesis, recognition of live calls and spoken
+    questions (/voice-turn) go to the urgent lane; batch work and anything
+    the client marks as "bulk" or "prefetch" (e.g. cache warming from the
+    app) go last.
+
+    Args:
+        method (str): HTTP method
+        path (str): Request path
+        priority_header (str, optional): X-Priority header (urgent, normal, bulk or prefetch)
+        text (str, optional): Text to synthesize for TTS endpoints
+        segmented (bool): Whether a TTS request asked for segmented synthesis
+        urgent_max_chars (int): Longest TTS text still treated as urgent
+
+    Returns:
+        str: URGENT, NORMAL or BULK, or None if the request bypasses admission
+    """
+    if method == 'OPTIONS' or path in EXEMPT_PATHS:
+        return None
+    if path.startswith('/recognition-sessions') and method == 'GET':
+        return None
+
+    if priority_header:
+        priority = priority_header.strip().lower()
+        if priority == 'prefetch':
+            return BULK
+        if priority in PRIORITIES:
+            return priority
+
+    if path == '/batch-transcribe':
+        return BULK
+    if path in ('/speech-to-text', '/voice-turn') or (
+            path.startswith('/recognition-sessions/') and path.endswith('/audio')):
+        return URGENT
+    if path in TTS_PATHS:
+        return URGENT if text and len(text) <= urgent_max_chars and not segmented else NORMAL
+    return NORMAL
+
+
+class _Waiter:
+    def __init__(self, priority: str, wake):
+        self.priority = priority
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class Ticket:
+    """A granted execution slot; release() it when the request is done."""
+
+    def __init__(self, controller: "AdmissionController", priority: str, wait_seconds: float):
+        self.controller = controller
+        self.priority = priority
+        self.wait_seconds = wait_seconds
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        """Return the slot and hand it to the next queued request."""
+        if not self._released:
+            self._released = True
+            self.controller._release(time.perf_counter() - self.started)
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a priority queue in front of the voice handlers.
+
+    At most max_concurrent requests run at once; the rest wait in a queue
+    ordered by lane (urgent, normal, bulk) and arrival. A full queue or a
+    wait longer than queue_timeout rejects the request straight away with
+    a Retry-After estimate, instead of letting threads pile up until the
+    server falls over. reserved_urgent slots are only ever used by the
+    urgent lane, so emergency traffic still runs while bulk work saturates
+    everything else.
+    """
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64,
+                 queue_timeout: float = 10.0, reserved_urgent: int = 2):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrent (int): Requests executing at once
+            max_queue (int): Requests waiting per lane before new ones are rejected
+            queue_timeout (float): Seconds a request may wait for a slot
+            reserved_urgent (int): Slots kept free for the urgent lane
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.reserved_urgent = min(max(0, reserved_urgent), self.max_concurrent - 1)
+
+        self._lock = threading.Lock()
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._running = 0
+        # Moving average of slot hold time, for Retry-After
+        self._service_seconds = 1.0
+
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected": 0,
+            "timed_out": 0,
+        }
+
+    def _capacity(self, priority: str) -> int:
+        return self.max_concurrent if priority == URGENT else self.max_concurrent - self.reserved_urgent
+
+    def _retry_after(self) -> int:
+        backlog = sum(self._queued.values()) + self._running
+        return max(1, int(round(backlog * self._service_seconds / self.max_concurrent)))
+
+    def _enqueue(self, priority: str, wake) -> Optional[_Waiter]:
+        """Admit immediately (returns None) or queue a waiter; raises when the lane is full."""
+        if priority not in PRIORITIES:
+            priority = NORMAL
+        with self._lock:
+            # Nobody may overtake an equal or more important request already waiting
+            ahead = any(self._queued[p] for p in PRIORITIES if PRIORITIES[p] <= PRIORITIES[priority])
+            if not ahead and self._running < self._capacity(priority):
+                self._running += 1
+                self.stats["admitted"] += 1
+                return None
+
+            if self._queued[priority] >= self.max_queue:
+                self.stats["rejected"] += 1
+                retry_after = self._retry_after()
+                ADMISSION_DECISIONS.inc(priority=priority, outcome="rejected")
+                raise AdmissionRejected(f"Server busy ({priority} queue full)", retry_after)
+
+            waiter = _Waiter(priority, wake)
+            heapq.heappush(self._heap, (PRIORITIES[priority], next(self._sequence), waiter))
+            self._queued[priority] += 1
+            self.stats["queued"] += 1
+            return waiter
+
+    def _dispatch(self):
+        # Called with the lock held: grant free slots to the head of the queue
+        while self._heap:
+            _, _, waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self._running >= self._capacity(waiter.priority):
+                break
+            heapq.heappop(self._heap)
+            self._queued[waiter.priority] -= 1
+            self._running += 1
+            self.stats["admitted"] += 1
+            waiter.granted = True
+            waiter.wake()
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """Stop waiting; returns False if the slot was granted in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued[waiter.priority] -= 1
+            self._dispatch()
+        return True
+
+    def _timed_out(self, waiter: _Waiter) -> AdmissionRejected:
+        with self._lock:
+            self.stats["timed_out"] += 1
+            retry_after = self._retry_after()
+        ADMISSION_DECISIONS.inc(priority=waiter.priority, outcome="timed_out")
+        return AdmissionRejected(f"Server busy (waited {self.queue_timeout:g}s)", retry_after)
+
+    def _release(self, held_seconds: float):
+        with self._lock:
+            self._running -= 1
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * held_seconds
+            self._dispatch()
+
+    def _admitted(self, priority: str, started: float) -> Ticket:
+        wait_seconds = time.perf_counter() - started
+        ADMISSION_WAIT_SECONDS.observe(wait_seconds, priority=priority)
+        ADMISSION_DECISIONS.inc(priority=priority, outcome="admitted")
+        return Ticket(self, priority, wait_seconds)
+
+    def acquire(self, priority: str = NORMAL) -> Ticket:
+        """
+        Wait for an execution slot on the calling thread.
+
+        Args:
+            priority (str): URGENT, NORMAL or BULK
+
+        Returns:
+            Ticket: Slot to release when the request finishes
+
+        Raises:
+            AdmissionRejected: Queue full or no slot within queue_timeout
+        """
+        started = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        if waiter is not None and not event.wait(self.queue_timeout) and self._cancel(waiter):
+            raise self._timed_out(waiter)
+        return self._admitted(priority, started)
+
+    async def acquire_async(self, priority: str = NORMAL) -> Ticket:
+        """
+        Wait for an execution slot without blocking the event loop.
+
+        Args:
+            priority (str): URGENT, NORMAL or BULK
+
+        Returns:
+            Ticket: Slot to release when the request finishes
+
+        Raises:
+            AdmissionRejected: Queue full or no slot within queue_timeout
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            # Slots may be released from worker threads
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, wake)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if self._cancel(waiter):
+                    raise self._timed_out(waiter)
+            except asyncio.CancelledError:
+                # Client went away while queued; hand back a slot granted meanwhile
+                if not self._cancel(waiter):
+                    self._release(0.0)
+                raise
+        return self._admitted(priority, started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and counters.
+
+        Returns:
+            dict: running, limits, queued per lane, lifetime counters and the Retry-After estimate
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_depth": dict(self._queued),
+                "avg_service_seconds": round(self._service_seconds, 3),
+                "retry_after": self._retry_after(),
+            })
+        return stats
+
+
+def create_admission_controller_from_env() -> Optional[AdmissionController]:
+    """
+    Create AdmissionController instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_MAX_CONCURRENT_REQUESTS: Requests executing at once (default: 16, 0 disables admission control)
+    - ATLAS_MAX_QUEUED_REQUESTS: Waiting requests per lane before 429 (default: 64)
+    - ATLAS_QUEUE_TIMEOUT: Seconds a request may wait for a slot (default: 10)
+    - ATLAS_URGENT_RESERVED_SLOTS: Slots only the urgent lane may use (default: 2)
+
+    Returns:
+        AdmissionController: Configured controller or None if disabled
+    """
+    max_concurrent = int(os.getenv('ATLAS_MAX_CONCURRENT_REQUESTS', '16'))
+    if max_concurrent <= 0:
+        return None
+    return AdmissionController(
+        max_concurrent=max_concurrent,
+        max_queue=int(os.getenv('ATLAS_MAX_QUEUED_REQUESTS', '64')),
+        queue_timeout=float(os.getenv('ATLAS_QUEUE_TIMEOUT', '10')),
+        reserved_urgent=int(os.getenv('ATLAS_URGENT_RESERVED_SLOTS', '2'))
+    )
@@ -0,0 +1,269 @@
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+# Harakat, tanween, shadda, sukun, superscript alef and Quranic marks
+_DIACRITICS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+TATWEEL = "\u0640"
+# Zero-width joiners and bidi marks that STT output and copy/paste leave behind
+_INVISIBLE = re.compile(r"[\u200b-\u200f\u202a-\u202e\u2066-\u2069\ufeff]")
+
+# Arabic-Indic and Extended (Persian) digits to ASCII
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+# Spelling variants that sound the same (or are Maghrebi spellings of the same letter)
+_LETTER_FOLDS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و", "ئ": "ي", "ى": "ي", "ی": "ي",
+    "ة": "ه",
+    "ڤ": "ف", "ڭ": "ك", "گ": "ك", "ک": "ك",
+    "ء": None,
+})
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Definite article, alone or behind a conjunction/preposition; longest first
+ARTICLE_PREFIXES = ("وال", "بال", "فال", "كال", "لل", "ال")
+
+# Light stemming for fuzzy lookup: Darija verb prefixes (كي/كت progressive,
+# ت/ي/ن person) and pronoun/plural suffixes; longest first
+STEM_PREFIXES = ("كيت", "كين", "كي", "كت", "كن", "يت", "نت", "تت", "ت", "ي", "ن", "م")
+STEM_SUFFIXES = ("تهم", "تها", "ات", "ين", "ون", "تي", "ها", "هم", "كم", "ني", "نا", "ه", "ت", "و", "ي", "ا")
+# Negation suffix (ما ... ش), only ever behind a verb prefix: "انعاش" keeps its ش
+NEGATION_SUFFIX = "ش"
+# Long vowels dropped after the first letter, so broken plurals meet their singular (كسور/كسر)
+_LONG_VOWELS = re.compile(r"[اوي]")
+# Similarity given to vocabulary terms sharing a light stem with the looked-up term
+STEM_SIMILARITY = 0.8
+
+
+def normalize_for_speech(text: str) -> str:
+    """
+    Normalize text without changing how it is pronounced.
+
+    Presentation forms and ligatures are decomposed (NFKC), tatweel and
+    invisible marks are removed, digits become ASCII and whitespace is
+    collapsed. Diacritics and hamza are kept because the voice reads them.
+
+    Args:
+        text (str): Text sent for synthesis
+
+    Returns:
+        str: Normalized text
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = _INVISIBLE.sub("", text).replace(TATWEEL, "").translate(_DIGITS)
+    return " ".join(text.split())
+
+
+def normalize_for_search(text: str) -> str:
+    """
+    Fold the spelling variants STT produces for ar-MA so they compare equal.
+
+    On top of normalize_for_speech(): diacritics are removed, alef/hamza,
+    ya/alef maqsura and taa marbuta/haa variants are unified, Maghrebi
+    letters (ڤ, ڭ) map to their standard equivalents and Latin words
+    ("CPR") are case-folded.
+
+    Args:
+        text (str): Transcript, query or corpus text
+
+    Returns:
+        str: Folded text
+    """
+    text = _DIACRITICS.sub("", normalize_for_speech(text))
+    return text.translate(_LETTER_FOLDS).casefold()
+
+
+def strip_article(token: str) -> str:
+    """Remove a leading definite article, keeping at least two letters."""
+    for prefix in ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+
+def light_stems(term: str) -> Set[str]:
+    """
+    Reduce a folded term to rough consonant skeletons.
+
+    A leading ت/ي/ن/م can be a verb prefix or a root letter, so the term
+    is stemmed both with and without one prefix; without it, a trailing
+    negation ش is dropped too. Each form then loses one suffix (keeping
+    at least three letters) and the long vowels after its first letter.
+    "تحرقت", "تحرق", "حروق" and "محروقة" all yield "حرق". Only used to
+    find spelling variants, never as index terms.
+
+    Args:
+        term (str): Normalized term, e.g. from tokenize()
+
+    Returns:
+        set: Skeletons of at least three letters, possibly empty
+    """
+    forms = [term]
+    for prefix in STEM_PREFIXES:
+        if term.startswith(prefix) and len(term) - len(prefix) >= 3:
+            verb = term[len(prefix):]
+            if verb.endswith(NEGATION_SUFFIX) and len(verb) > 3:
+                verb = verb[:-len(NEGATION_SUFFIX)]
+            forms.append(verb)
+            break
+
+    stems = set()
+    for form in forms:
+        for suffix in STEM_SUFFIXES:
+            if form.endswith(suffix) and len(form) - len(suffix) >= 3:
+                form = form[:-len(suffix)]
+                break
+        skeleton = form[0] + _LONG_VOWELS.sub("", form[1:])
+        if len(skeleton) >= 3:
+            stems.add(skeleton)
+    return stems
+
+
+# Question words, pronoun-suffixed helpers and particles of Darija and MSA.
+# They carry no first-aid meaning but are frequent in both questions and
+# the guide, so left in they decide the ranking. Spelled as written;
+# STOPWORDS holds their folded, article-stripped form. "ما" is left out:
+# folded, "ماء" (water) becomes the same term.
+_STOPWORD_SPELLINGS = """
+كيفاش كيف شنو شنا اشنو آش أش واش علاش لاش فين فاين أين منين إمتى امتى متى شحال قداش أشمن
+كيفاه واشنو شكون مين من ماذا لماذا هل كم
+نعرف تعرف عرفت نعمل تعمل يعمل ندير تدير دير نديرو ديرو يدير خاص خاصك خاصني خصني خصك
+بغيت نبغي ممكن يمكن عافاك واخا صافي راه راني راك راها راهم كاين كاينة كاينين
+عند عندو عندي عندك عندها عندنا عندهم عنده عندكم
+ديال ديالي ديالك ديالو ديالها ديالنا ديالهم دال
+هاد هادا هادي هادو هدا هذا هذه هذي ذلك تلك هؤلاء هاذ
+أنا انا نتا نتي انت أنت هو هي حنا نحن نتوما هوما هما هم
+فيه فيها فيا فيك فيهم ليه ليها ليا ليك ليهم عليه عليها عليا عليك بيه بيها بيا معاه معاها معايا
+في فـ ف ب ل و أو او ولا وَلا مع على عن إلى الى حتى ملي إلا إذا اذا إن أن اللي الي لي الذي التي
+شي شيء واحد وحد غير بزاف كثير ياك يا أي
+"""
+
+STOPWORDS: FrozenSet[str] = frozenset(
+    strip_article(token) for token in _TOKEN.findall(normalize_for_search(_STOPWORD_SPELLINGS))
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into search terms.
+
+    Used for both queries and indexed text, so stopwords are dropped on
+    both sides.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Folded terms without definite articles or STOPWORDS, in order
+    """
+    terms = (strip_article(token) for token in _TOKEN.findall(normalize_for_search(text)))
+    return [term for term in terms if term not in STOPWORDS]
+
+
+def char_ngrams(term: str, n: int = 3) -> Set[str]:
+    """
+    Character n-grams of a term, padded so short terms and word edges count.
+
+    Args:
+        term (str): Normalized term
+        n (int): Gram length
+
+    Returns:
+        set: Distinct n-grams
+    """
+    padded = f" {term} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NGramIndex:
+    """
+    Character n-gram index for fuzzy term lookup.
+
+    Maps every gram to the terms containing it, so a misspelled term is
+    compared only with terms that share at least one gram instead of the
+    whole vocabulary. Similarity is the Dice coefficient of gram sets.
+
+    Terms are also keyed by light_stems(), so inflected and broken-plural
+    forms whose spelling differs too much for n-grams ("تحرقت"/"حروق",
+    "كسر"/"كسور") still match, at STEM_SIMILARITY.
+    """
+
+    def __init__(self, terms: Iterable[str] = (), n: int = 3):
+        """
+        Build the index.
+
+        Args:
+            terms (Iterable[str]): Normalized vocabulary
+            n (int): Gram length
+        """
+        self.n = n
+        self.terms: List[str] = []
+        self._gram_counts: List[int] = []
+        self._grams: Dict[str, List[int]] = {}
+        self._stems: Dict[str, List[int]] = {}
+        self._ids: Dict[str, int] = {}
+        for term in terms:
+            self.add(term)
+
+    def add(self, term: str):
+        """Add a term to the vocabulary (no-op if already present)."""
+        if term in self._ids:
+            return
+        term_id = self._ids[term] = len(self.terms)
+        self.terms.append(term)
+        grams = char_ngrams(term, self.n)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(term_id)
+        for stem in light_stems(term):
+            self._stems.setdefault(stem, []).append(term_id)
+
+    def _stem_ids(self, term: str) -> Set[int]:
+        return {term_id for stem in light_stems(term) for term_id in self._stems.get(stem, ())}
+
+    def variants(self, term: str) -> List[str]:
+        """
+        Other vocabulary terms sharing a light stem with term.
+
+        Args:
+            term (str): Normalized term, e.g. from tokenize()
+
+        Returns:
+            list: Variant terms, term itself excluded
+        """
+        return [self.terms[term_id] for term_id in sorted(self._stem_ids(term)) if self.terms[term_id] != term]
+
+    def lookup(self, term: str, limit: int = 3, min_similarity: float = 0.5) -> List[Tuple[str, float]]:
+        """
+        Find vocabulary terms spelled like term.
+
+        Args:
+            term (str): Normalized term, e.g. from tokenize()
+            limit (int): Maximum matches
+            min_similarity (float): Lowest Dice coefficient accepted for terms
+                not sharing a light stem with term
+
+        Returns:
+            list: (term, similarity) pairs, most similar first
+        """
+        grams = char_ngrams(term, self.n)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for term_id in self._grams.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        stem_ids = self._stem_ids(term)
+
+        matches = []
+        for term_id in shared.keys() | stem_ids:
+            dice = 2.0 * shared.get(term_id, 0) / (len(grams) + self._gram_counts[term_id])
+            similarity = max(dice, STEM_SIMILARITY) if term_id in stem_ids else dice
+            if similarity >= min_similarity:
+                matches.append((self.terms[term_id], similarity, dice))
+        matches.sort(key=lambda match: (match[1], match[2]), reverse=True)
+        return [(match, similarity) for match, similarity, _ in matches[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.terms)
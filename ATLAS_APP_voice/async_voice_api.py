@@ -0,0 +1,1034 @@
+#!/usr/bin/env python3
+"""
+Asyncio API Server for Azure Voice Services
+Same endpoints as flask_voice_api.py, served from one event loop.
+
+Synthesis and upload recognition are bridged from SDK events to awaitables,
+so an in-flight request costs a coroutine instead of a WSGI thread.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from aiohttp import web, WSMsgType
+
+from azure_voice_service import ARABIC_VOICES, create_voice_service_from_env
+from tts_cache import create_audio_cache_from_env, make_cache_key
+from audio_formats import (AudioOutputFormat, negotiate_output_format, pcm_to_wav, stitch_audio,
+                           streaming_wav_header, wav_pcm_data)
+from text_segmenter import split_sentences
+from segmented_synthesis import create_segmented_synthesizer_from_env
+from speech_async import AsyncVoiceService, ThreadedAsyncVoiceService
+from phrase_stats import create_phrase_tracker_from_env
+from cache_warmup import start_cache_warmup_from_env
+from recognition_sessions import create_session_manager_from_env
+from batch_transcribe import iter_batch, to_ndjson, transcribe_audio
+from single_flight import AsyncSingleFlight
+from first_aid_retrieval import create_retriever_from_env
+from knowledge_reload import create_knowledge_reloader_from_env
+from voice_pipeline import QueueAudioReader, VoiceTurnPipeline, create_response_generator_from_env
+from admission import AdmissionRejected, classify_request, create_admission_controller_from_env
+from metrics import (REGISTRY, PROMETHEUS_CONTENT_TYPE, REQUEST_SECONDS, TIME_TO_FIRST_AUDIO_SECONDS,
+                     AUDIO_BYTES_OUT, TTS_CACHE_REQUESTS, register_service_gauges, stage_timer)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 4096
+URGENT_TTS_MAX_CHARS = int(os.getenv('ATLAS_URGENT_TTS_MAX_CHARS', '200'))
+MAX_RETRIEVE_RESULTS = 20
+VOICE_TURN_TTS_PARALLEL = int(os.getenv('ATLAS_VOICE_TURN_TTS_PARALLEL', '3'))
+VOICE_TURN_TTS_TIMEOUT = float(os.getenv('ATLAS_VOICE_TURN_TTS_TIMEOUT', '30'))
+
+
+def json_error(message: str, status: int = 500, headers: dict = None, **extra) -> web.Response:
+    body = {'success': False, 'error': message}
+    body.update(extra)
+    return web.json_response(body, status=status, headers=headers)
+
+
+def audio_response(audio: bytes, cache_status: str, audio_format: AudioOutputFormat) -> web.Response:
+    """Build a downloadable audio response from an in-memory buffer"""
+    return web.Response(
+        body=audio,
+        content_type=audio_format.mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=speech.{audio_format.extension}',
+            'X-Cache': cache_status,
+            'X-Audio-Format': audio_format.name,
+            'Vary': 'Accept'
+        }
+    )
+
+
+def endpoint_name(request: web.Request) -> str:
+    """Route path used as the endpoint label in metrics"""
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else 'unknown'
+
+
+def record_first_audio(request: web.Request, cache_status: str, audio_format: AudioOutputFormat,
+                       audio_bytes: int = 0):
+    """Record time-to-first-audio-byte, cache outcome and (for whole files) bytes sent"""
+    endpoint = endpoint_name(request)
+    TIME_TO_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - request['started'],
+                                        endpoint=endpoint, cache=cache_status)
+    # Coalesced requests are counted even without a cache, they are a saving of their own
+    coalesced_or_cached = request.app['audio_cache'] or cache_status == 'COALESCED'
+    TTS_CACHE_REQUESTS.inc(endpoint=endpoint, outcome=cache_status if coalesced_or_cached else 'DISABLED')
+    if audio_bytes:
+        AUDIO_BYTES_OUT.inc(audio_bytes, endpoint=endpoint, format=audio_format.name)
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    """Time every request into atlas_http_request_seconds"""
+    request['started'] = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - request['started'],
+                                endpoint=endpoint_name(request), method=request.method, status=str(status))
+
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    """Allow the Flutter app to call the API from any origin"""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = '*'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+
+@web.middleware
+async def service_middleware(request: web.Request, handler):
+    """Reject voice endpoints until the service is up"""
+    if request.path not in ('/health', '/available-voices', '/metrics', '/retrieve', '/knowledge-stats') and request.app['voice_service'] is None:
+        return web.json_response({'error': 'Voice service not initialized'}, status=500)
+    return await handler(request)
+
+
+@web.middleware
+async def admission_middleware(request: web.Request, handler):
+    """Wait for an execution slot in the request's priority lane, or reject with 429"""
+    admission = request.app['admission']
+    if admission is None:
+        return await handler(request)
+
+    data = await read_json(request) if request.content_type == 'application/json' else {}
+    priority = classify_request(
+        request.method,
+        request.path,
+        request.headers.get('X-Priority'),
+        text=data.get('text') if isinstance(data, dict) else None,
+        segmented=bool(data.get('segmented')) if isinstance(data, dict) else False,
+        urgent_max_chars=URGENT_TTS_MAX_CHARS
+    )
+    if priority is None:
+        return await handler(request)
+
+    try:
+        ticket = await admission.acquire_async(priority)
+    except AdmissionRejected as e:
+        return json_error(e.reason, status=429, retry_after=e.retry_after,
+                          headers={'Retry-After': str(e.retry_after)})
+    try:
+        # Streaming handlers write their whole body before returning
+        return await handler(request)
+    finally:
+        ticket.release()
+
+
+async def read_json(request: web.Request) -> dict:
+    try:
+        return await request.json()
+    except (ValueError, json.JSONDecodeError):
+        return {}
+
+
+def next_in_thread(generator) -> asyncio.Future:
+    """Run next(generator) on a worker thread; the future resolves to None once it is exhausted."""
+    return asyncio.get_running_loop().run_in_executor(None, next, generator, None)
+
+
+async def close_in_thread(generator, pending: Optional[asyncio.Future] = None):
+    """
+    Close a blocking generator without blocking the event loop.
+
+    Its finally blocks may wait for threads that need this loop (e.g. the
+    voice-turn TTS executor), so close() runs on a worker thread, and only
+    after a next() still running there (left by a cancelled handler) returns.
+    """
+    if pending is not None and not pending.done():
+        loop = asyncio.get_running_loop()
+
+        def close_when_idle(future):
+            if not future.cancelled():
+                # Retrieved so an error after the client left is not logged as unhandled
+                future.exception()
+            loop.run_in_executor(None, generator.close)
+
+        pending.add_done_callback(close_when_idle)
+        return
+    await asyncio.to_thread(generator.close)
+
+
+async def synthesize_coalesced(app: web.Application, cache_key: str, synthesize):
+    """
+    Await synthesize() at most once at a time per cache key and cache its audio.
+
+    Returns (audio, cache_status): 'MISS' for the request that synthesized,
+    'COALESCED' for requests that waited on it, 'HIT' if the cache was
+    filled while the caller was looking up.
+    """
+    audio_cache = app['audio_cache']
+
+    async def run():
+        # A flight that finished since the caller's lookup may have filled the cache
+        if audio_cache:
+            cached_audio = audio_cache.get(cache_key)
+            if cached_audio is not None:
+                return cached_audio, 'HIT'
+        audio = await synthesize()
+        if audio and audio_cache:
+            audio_cache.put(cache_key, audio)
+        return audio, 'MISS'
+
+    (audio, cache_status), shared = await app['tts_flights'].do(cache_key, run)
+    return audio, 'COALESCED' if shared else cache_status
+
+
+async def synthesize_cached(app: web.Application, text: str, voice: str,
+                            audio_format: AudioOutputFormat):
+    """Synthesize one phrase to bytes, going through the audio cache"""
+    audio_cache = app['audio_cache']
+    cache_key = make_cache_key(text, voice, audio_format.name)
+    if audio_cache:
+        cached_audio = audio_cache.get(cache_key)
+        if cached_audio is not None:
+            return cached_audio
+
+    audio, _ = await synthesize_coalesced(
+        app, cache_key, lambda: app['async_service'].synthesize(text, voice, audio_format)
+    )
+    return audio
+
+
+def synthesize_segments(app: web.Application, segments: list, voice: str,
+                        audio_format: AudioOutputFormat):
+    """Async-iterate audio for each segment in order; segments render in parallel"""
+    return app['segment_synthesizer'].iter_audio_async(
+        segments,
+        lambda segment: synthesize_cached(app, segment, voice, audio_format)
+    )
+
+
+async def open_speech_stream(app: web.Application, text: str, voice: str,
+                             audio_format: AudioOutputFormat, segmented: bool = False):
+    """
+    Start streaming synthesis for text, serving from the cache when possible.
+
+    Returns (cache_status, chunks) where chunks is an async iterator of audio
+    bytes (for WAV, a streaming header first), or (None, None) if no audio
+    could be produced. With segmented=True sentences are synthesized in
+    parallel and streamed in order.
+    """
+    audio_cache = app['audio_cache']
+    cache_key = make_cache_key(text, voice, audio_format.name)
+    if audio_cache:
+        cached_audio = audio_cache.get(cache_key)
+        if cached_audio is not None:
+            async def generate_cached():
+                for offset in range(0, len(cached_audio), CHUNK_SIZE):
+                    yield cached_audio[offset:offset + CHUNK_SIZE]
+            return 'HIT', generate_cached()
+
+    if segmented:
+        segments = split_sentences(text)
+        if len(segments) > 1:
+            return await open_segmented_stream(app, text, segments, voice, audio_format)
+
+    chunks = app['async_service'].stream(text, voice, audio_format).__aiter__()
+    try:
+        first_chunk = await chunks.__anext__()
+    except (StopAsyncIteration, RuntimeError) as e:
+        logger.error(f"Streaming synthesis failed: {e}")
+        return None, None
+
+    async def generate():
+        audio_chunks = [first_chunk]
+        if audio_format.is_pcm:
+            yield streaming_wav_header(audio_format.sample_rate)
+        yield first_chunk
+        async for chunk in chunks:
+            audio_chunks.append(chunk)
+            yield chunk
+
+        # Only complete utterances are cached
+        if audio_cache:
+            audio = b''.join(audio_chunks)
+            if audio_format.is_pcm:
+                audio = pcm_to_wav(audio, audio_format.sample_rate)
+            audio_cache.put(cache_key, audio)
+
+    return 'MISS', generate()
+
+
+async def open_segmented_stream(app: web.Application, text: str, segments: list, voice: str,
+                                audio_format: AudioOutputFormat):
+    """Stream sentence segments in order while later ones are still being synthesized"""
+    audio_segments = synthesize_segments(app, segments, voice, audio_format)
+    try:
+        first_segment = await audio_segments.__anext__()
+    except RuntimeError as e:
+        logger.error(f"Segmented synthesis failed: {e}")
+        await audio_segments.aclose()
+        return None, None
+
+    def payload(audio):
+        # Segments are complete WAV files; only their samples go after the streaming header
+        return wav_pcm_data(audio) if audio_format.is_pcm else audio
+
+    async def generate():
+        completed = [first_segment]
+        if audio_format.is_pcm:
+            yield streaming_wav_header(audio_format.sample_rate)
+        yield payload(first_segment)
+        try:
+            async for audio in audio_segments:
+                completed.append(audio)
+                yield payload(audio)
+        except RuntimeError as e:
+            logger.error(f"Segmented synthesis failed: {e}")
+            return
+
+        if app['audio_cache']:
+            app['audio_cache'].put(make_cache_key(text, voice, audio_format.name),
+                                   stitch_audio(completed, audio_format))
+
+    return 'MISS', generate()
+
+
+async def health_check(request: web.Request) -> web.Response:
+    """Health check endpoint (speech service status comes from the background probe)"""
+    cache_warmer = request.app['cache_warmer']
+    voice_service = request.app['voice_service']
+    speech_health = voice_service.get_health() if voice_service else None
+    speech_status = speech_health['status'] if speech_health else 'down'
+    status = {'down': 'unhealthy', 'degraded': 'degraded'}.get(speech_status, 'healthy')
+    return web.json_response({
+        'status': status,
+        'voice_service_ready': speech_status != 'down',
+        'speech_service': speech_health,
+        'cache_warm': cache_warmer is None or cache_warmer.done,
+        'warmup': cache_warmer.get_progress() if cache_warmer else None,
+        'mode': 'asyncio'
+    }, status=503 if status == 'unhealthy' else 200)
+
+
+async def test_setup(request: web.Request) -> web.Response:
+    """Test Azure voice setup (uses the server microphone and speaker)"""
+    try:
+        test_results = await asyncio.to_thread(request.app['voice_service'].test_voice_setup)
+        return web.json_response({
+            'test_results': test_results,
+            'all_tests_passed': all(test_results.values())
+        })
+    except Exception as e:
+        logger.error(f"Setup test error: {e}")
+        return web.json_response({'error': str(e)}, status=500)
+
+
+async def speech_to_text(request: web.Request) -> web.Response:
+    """Convert speech to text using Azure STT"""
+    voice_service = request.app['voice_service']
+
+    try:
+        # Audio in the request body: transcribe the client's recording
+        if request.content_type.startswith('audio/') or request.content_type == 'application/octet-stream':
+            language = request.query.get('language', 'ar-MA')
+            sample_rate = int(request.query.get('sample_rate', 16000))
+
+            recognized_text = await request.app['async_service'].recognize_stream(
+                request.content.iter_chunked(8192),
+                language,
+                sample_rate=sample_rate
+            )
+        else:
+            data = await read_json(request)
+            language = data.get('language', 'ar-MA')
+
+            # Server microphone mode is single-speaker, so a worker thread is fine here
+            recognized_text = await asyncio.to_thread(voice_service.stt.recognize_once, language)
+
+        if recognized_text:
+            logger.info(f"Speech recognized: {recognized_text}")
+            return web.json_response({
+                'success': True,
+                'text': recognized_text,
+                'language': language
+            })
+
+        logger.warning("No speech recognized")
+        return web.json_response({
+            'success': False,
+            'text': None,
+            'error': 'No speech detected'
+        })
+
+    except Exception as e:
+        logger.error(f"STT error: {e}")
+        return json_error(str(e))
+
+
+async def text_to_speech(request: web.Request) -> web.Response:
+    """Convert text to speech and play it on the server speaker"""
+    try:
+        data = await read_json(request)
+        text = data.get('text', '')
+        voice = data.get('voice', 'ar-MA-MounaNeural')
+
+        if not text:
+            return web.json_response({'error': 'No text provided'}, status=400)
+
+        success = await asyncio.to_thread(request.app['voice_service'].tts.speak_text, text, voice)
+
+        if success:
+            return web.json_response({
+                'success': True,
+                'message': 'Speech synthesis completed'
+            })
+        return json_error('Speech synthesis failed')
+
+    except Exception as e:
+        logger.error(f"TTS error: {e}")
+        return json_error(str(e))
+
+
+async def text_to_speech_file(request: web.Request) -> web.Response:
+    """Convert text to speech and return audio file"""
+    audio_cache = request.app['audio_cache']
+
+    try:
+        data = await read_json(request)
+        text = data.get('text', '')
+        voice = data.get('voice', 'ar-MA-MounaNeural')
+
+        if not text:
+            return web.json_response({'error': 'No text provided'}, status=400)
+
+        try:
+            audio_format = negotiate_output_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return json_error(str(e), status=400)
+
+        request.app['phrase_tracker'].record(text, voice, audio_format.name)
+
+        cache_key = make_cache_key(text, voice, audio_format.name)
+        if audio_cache:
+            cached_audio = audio_cache.get(cache_key)
+            if cached_audio is not None:
+                record_first_audio(request, 'HIT', audio_format, len(cached_audio))
+                return audio_response(cached_audio, 'HIT', audio_format)
+
+        # Long responses: synthesize sentences in parallel and stitch them into one file
+        segments = split_sentences(text) if data.get('segmented') else [text]
+
+        async def synthesize():
+            if len(segments) > 1:
+                try:
+                    return stitch_audio(
+                        [audio async for audio in synthesize_segments(request.app, segments, voice, audio_format)],
+                        audio_format
+                    )
+                except RuntimeError as e:
+                    logger.error(f"Segmented synthesis failed: {e}")
+                    return None
+            return await request.app['async_service'].synthesize(text, voice, audio_format)
+
+        # Identical requests arriving while this one synthesizes share its result
+        audio, cache_status = await synthesize_coalesced(request.app, cache_key, synthesize)
+
+        if audio:
+            record_first_audio(request, cache_status, audio_format, len(audio))
+            return audio_response(audio, cache_status, audio_format)
+        return json_error('Audio generation failed')
+
+    except Exception as e:
+        logger.error(f"TTS file error: {e}")
+        return json_error(str(e))
+
+
+async def text_to_speech_stream(request: web.Request) -> web.StreamResponse:
+    """Convert text to speech and stream audio chunks as they are produced"""
+    try:
+        data = await read_json(request)
+        text = data.get('text', '')
+        voice = data.get('voice', 'ar-MA-MounaNeural')
+
+        if not text:
+            return web.json_response({'error': 'No text provided'}, status=400)
+
+        try:
+            audio_format = negotiate_output_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return json_error(str(e), status=400)
+
+        request.app['phrase_tracker'].record(text, voice, audio_format.name)
+
+        cache_status, chunks = await open_speech_stream(
+            request.app, text, voice, audio_format, segmented=bool(data.get('segmented'))
+        )
+        if chunks is None:
+            return json_error('Audio generation failed')
+        record_first_audio(request, cache_status, audio_format)
+
+        response = web.StreamResponse(headers={
+            'Content-Type': audio_format.mimetype,
+            'X-Cache': cache_status,
+            'X-Audio-Format': audio_format.name,
+            'Vary': 'Accept'
+        })
+        response.enable_chunked_encoding()
+
+    except Exception as e:
+        logger.error(f"TTS stream error: {e}")
+        return json_error(str(e))
+
+    # Headers are sent from here on, so failures can no longer become a JSON error
+    await response.prepare(request)
+    sent = 0
+    try:
+        async for chunk in chunks:
+            await response.write(chunk)
+            sent += len(chunk)
+    except Exception as e:
+        logger.error(f"TTS stream failed after {sent} bytes: {e}")
+        # Drop the connection so the client sees a truncated body rather than a complete one
+        response.force_close()
+        if request.transport is not None:
+            request.transport.close()
+        return response
+    finally:
+        AUDIO_BYTES_OUT.inc(sent, endpoint=endpoint_name(request), format=audio_format.name)
+    await response.write_eof()
+    return response
+
+
+async def voice_session(request: web.Request) -> web.WebSocketResponse:
+    """Full-duplex voice session; same message protocol as flask_voice_api.py"""
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    voice_service = request.app['voice_service']
+    recognition = None
+    utterance_done = None
+
+    def send_from_sdk(message: dict):
+        # SDK callbacks run on their own threads; hop onto the loop to send
+        asyncio.run_coroutine_threadsafe(ws.send_json(message), loop)
+
+    try:
+        async for msg in ws:
+            if msg.type == WSMsgType.BINARY:
+                if recognition:
+                    recognition.write(msg.data)
+                continue
+            if msg.type != WSMsgType.TEXT:
+                break
+
+            try:
+                command = json.loads(msg.data)
+            except ValueError:
+                await ws.send_json({'type': 'error', 'error': 'Invalid message'})
+                continue
+
+            message_type = command.get('type')
+
+            if message_type == 'start':
+                if recognition:
+                    recognition.stop(wait=False)
+                language = command.get('language', 'ar-MA')
+                utterance_done = loop.create_future()
+                done = utterance_done
+                recognition = voice_service.stt.create_push_recognition(
+                    language,
+                    sample_rate=int(command.get('sample_rate', 16000)),
+                    on_recognized=lambda text: send_from_sdk({'type': 'final', 'text': text}),
+                    on_recognizing=lambda text: send_from_sdk({'type': 'partial', 'text': text}),
+                    on_stopped=lambda: loop.call_soon_threadsafe(
+                        lambda: done.done() or done.set_result(None)
+                    )
+                )
+                recognition.start(wait=False)
+                await ws.send_json({'type': 'listening', 'language': language})
+
+            elif message_type == 'stop':
+                if not recognition:
+                    await ws.send_json({'type': 'error', 'error': 'No active utterance'})
+                    continue
+                recognition.close()
+                try:
+                    await asyncio.wait_for(utterance_done, 30)
+                except asyncio.TimeoutError:
+                    pass
+                recognition.stop(wait=False)
+                text = " ".join(recognition.results) if recognition.results else None
+                await ws.send_json({'type': 'utterance_end', 'text': text, 'error': recognition.error})
+                recognition = None
+
+            elif message_type == 'speak':
+                text = command.get('text', '')
+                voice = command.get('voice', 'ar-MA-MounaNeural')
+                if not text:
+                    await ws.send_json({'type': 'error', 'error': 'No text provided'})
+                    continue
+
+                try:
+                    audio_format = negotiate_output_format(command.get('format'))
+                except ValueError as e:
+                    await ws.send_json({'type': 'error', 'error': str(e)})
+                    continue
+
+                cache_status, chunks = await open_speech_stream(
+                    request.app, text, voice, audio_format, segmented=bool(command.get('segmented'))
+                )
+                if chunks is None:
+                    await ws.send_json({'type': 'error', 'error': 'Audio generation failed'})
+                    continue
+
+                await ws.send_json({
+                    'type': 'audio_start',
+                    'format': audio_format.name,
+                    'mimetype': audio_format.mimetype,
+                    'cache': cache_status
+                })
+                audio_bytes = 0
+                async for chunk in chunks:
+                    await ws.send_bytes(chunk)
+                    audio_bytes += len(chunk)
+                AUDIO_BYTES_OUT.inc(audio_bytes, endpoint=endpoint_name(request), format=audio_format.name)
+                await ws.send_json({'type': 'audio_end', 'bytes': audio_bytes})
+
+            elif message_type == 'close':
+                break
+
+            else:
+                await ws.send_json({'type': 'error', 'error': f'Unknown message type: {message_type}'})
+
+    except Exception as e:
+        logger.error(f"Voice session error: {e}")
+    finally:
+        if recognition:
+            recognition.stop(wait=False)
+        await ws.close()
+
+    return ws
+
+
+async def voice_conversation(request: web.Request) -> web.Response:
+    """Handle complete voice conversation cycle (server speaker + microphone)"""
+    try:
+        data = await read_json(request)
+        bot_response = data.get('bot_response', '')
+
+        if not bot_response:
+            return web.json_response({'error': 'No bot response provided'}, status=400)
+
+        user_input = await asyncio.to_thread(request.app['voice_service'].voice_conversation, bot_response)
+
+        return web.json_response({
+            'success': True,
+            'user_input': user_input,
+            'bot_response': bot_response
+        })
+
+    except Exception as e:
+        logger.error(f"Voice conversation error: {e}")
+        return json_error(str(e))
+
+
+async def set_voice(request: web.Request) -> web.Response:
+    """Set TTS voice"""
+    try:
+        data = await read_json(request)
+        voice_type = data.get('voice_type', 'male')
+
+        request.app['voice_service'].set_arabic_voice(voice_type)
+
+        return web.json_response({
+            'success': True,
+            'voice_type': voice_type,
+            'message': f'Voice set to {voice_type}'
+        })
+
+    except Exception as e:
+        logger.error(f"Set voice error: {e}")
+        return json_error(str(e))
+
+
+async def available_voices(request: web.Request) -> web.Response:
+    """Get list of available Arabic voices"""
+    return web.json_response({'voices': ARABIC_VOICES})
+
+
+async def create_recognition_session(request: web.Request) -> web.Response:
+    """Start a live transcription; audio is then posted in chunks to its /audio URL"""
+    data = await read_json(request)
+    manager = request.app['recognition_sessions']
+    # Starting a recognizer waits for the SDK, keep it off the event loop
+    session = await asyncio.to_thread(
+        manager.create_session,
+        data.get('language', 'ar-MA'),
+        int(data.get('sample_rate', 16000))
+    )
+    if session is None:
+        error = ('Too many recognition sessions' if manager.max_sessions > 0
+                 else 'Recognition sessions are disabled on this server')
+        return json_error(error, status=503, max_sessions=manager.max_sessions)
+
+    return web.json_response({
+        'success': True,
+        'session_id': session.session_id,
+        'idle_timeout': manager.idle_timeout
+    }, status=201)
+
+
+async def list_recognition_sessions(request: web.Request) -> web.Response:
+    """Get session limits, lifetime counters and per-session stats"""
+    return web.json_response(request.app['recognition_sessions'].get_stats())
+
+
+async def recognition_session_audio(request: web.Request) -> web.Response:
+    """Push raw PCM audio (the request body) into a session and return any new results"""
+    session = request.app['recognition_sessions'].get_session(request.match_info['session_id'])
+    if session is None:
+        return web.json_response({'error': 'Unknown recognition session'}, status=404)
+
+    accepted = True
+    async for chunk in request.content.iter_chunked(8192):
+        # Push-stream writes only buffer, so they do not block the loop
+        accepted = session.write(chunk)
+        if not accepted:
+            break
+
+    return web.json_response({
+        'accepted': accepted,
+        'events': session.poll(),
+        'stats': session.get_stats()
+    }, status=200 if accepted else 413)
+
+
+async def recognition_session_results(request: web.Request) -> web.Response:
+    """Long-poll for partial/final results (?wait=seconds, at most 30)"""
+    session = request.app['recognition_sessions'].get_session(request.match_info['session_id'])
+    if session is None:
+        return web.json_response({'error': 'Unknown recognition session'}, status=404)
+
+    wait = min(float(request.query.get('wait', 0)), 30.0)
+    events = await asyncio.to_thread(session.poll, wait) if wait > 0 else session.poll()
+    return web.json_response({'events': events, 'state': session.state})
+
+
+async def close_recognition_session(request: web.Request) -> web.Response:
+    """End a session and return its full transcript"""
+    result = await asyncio.to_thread(
+        request.app['recognition_sessions'].close_session, request.match_info['session_id']
+    )
+    if result is None:
+        return web.json_response({'error': 'Unknown recognition session'}, status=404)
+
+    return web.json_response({'success': True, **result})
+
+
+async def batch_transcribe(request: web.Request) -> web.StreamResponse:
+    """Transcribe uploaded WAV files (multipart field "files"), streaming one NDJSON line per file"""
+    form = await request.post()
+    uploads = [field for field in form.getall('files', []) if isinstance(field, web.FileField)]
+    if not uploads:
+        return web.json_response({'error': 'No files provided'}, status=400)
+
+    language = form.get('language', 'ar-MA')
+    workers = int(os.getenv('ATLAS_BATCH_WORKERS', '4'))
+    results = iter_batch(
+        request.app['voice_service'].stt, uploads,
+        lambda stt, upload: transcribe_audio(stt, upload.file, upload.filename, language=language),
+        workers=workers
+    )
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    # The worker pool runs on threads; each result is handed back to the loop as it completes
+    pending = None
+    try:
+        while True:
+            pending = next_in_thread(results)
+            result = await asyncio.shield(pending)
+            if result is None:
+                break
+            await response.write(to_ndjson(result).encode('utf-8'))
+    finally:
+        # Closing waits for in-flight transcriptions, so never on the loop thread
+        await close_in_thread(results, pending)
+    await response.write_eof()
+    return response
+
+
+async def retrieve(request: web.Request) -> web.Response:
+    """Top-k first-aid passages for a query (JSON {"query", "k"} or ?q=&k=)"""
+    data = await read_json(request) if request.method == 'POST' else request.query
+    query = (data.get('query') or data.get('q') or '').strip()
+    if not query:
+        return web.json_response({'error': 'No query provided'}, status=400)
+
+    try:
+        k = min(max(1, int(data.get('k', 3))), MAX_RETRIEVE_RESULTS)
+    except (TypeError, ValueError):
+        return web.json_response({'error': 'k must be an integer'}, status=400)
+
+    # An index lookup takes microseconds, cheaper than a hop to a thread
+    with stage_timer('retrieval', 'search'):
+        results = request.app['retriever'].retrieve(query, k)
+    return web.json_response({'success': True, 'query': query, 'results': results,
+                              'index_version': request.app['retriever'].version})
+
+
+async def voice_turn(request: web.Request) -> web.StreamResponse:
+    """
+    Answer a spoken question: streaming STT -> retrieval -> generation -> per-sentence TTS.
+
+    The body is WAV or raw PCM (?language=&sample_rate=&voice=&format=&k=). Events are
+    streamed as NDJSON while the stages overlap; the last one carries per-stage timings.
+    """
+    app = request.app
+    if app['response_generator'] is None:
+        return json_error('Response generator not available')
+
+    try:
+        language = request.query.get('language', 'ar-MA')
+        sample_rate = int(request.query.get('sample_rate', 16000))
+        k = min(max(1, int(request.query.get('k', 3))), MAX_RETRIEVE_RESULTS)
+        audio_format = negotiate_output_format(request.query.get('format'))
+    except ValueError as e:
+        return json_error(str(e), status=400)
+    voice = request.query.get('voice', 'ar-MA-MounaNeural')
+
+    loop = asyncio.get_running_loop()
+
+    def synthesize(text: str) -> Optional[bytes]:
+        # The pipeline runs on a worker thread; synthesis goes back through the loop's cache and pool
+        future = asyncio.run_coroutine_threadsafe(synthesize_cached(app, text, voice, audio_format), loop)
+        try:
+            return future.result(timeout=VOICE_TURN_TTS_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    pipeline = VoiceTurnPipeline(
+        app['voice_service'].stt, app['retriever'], app['response_generator'], synthesize,
+        max_parallel_tts=VOICE_TURN_TTS_PARALLEL, top_k=k
+    )
+
+    # Upload chunks are handed to the pipeline as they arrive
+    audio = QueueAudioReader()
+
+    async def read_upload():
+        try:
+            async for chunk in request.content.iter_chunked(8192):
+                audio.put(chunk)
+        finally:
+            audio.put(None)
+
+    upload = asyncio.create_task(read_upload())
+    events = pipeline.run(audio, language, sample_rate=sample_rate, audio_format=audio_format.name)
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    pending = None
+    try:
+        while True:
+            # Shielded so a cancelled handler leaves pending tracking the thread's next()
+            pending = next_in_thread(events)
+            event = await asyncio.shield(pending)
+            if event is None:
+                break
+            await response.write(to_ndjson(event).encode('utf-8'))
+    finally:
+        upload.cancel()
+        # On a disconnect the pipeline is abandoned mid-turn; closing it waits for its TTS threads
+        await close_in_thread(events, pending)
+    await response.write_eof()
+    return response
+
+
+async def knowledge_stats(request: web.Request) -> web.Response:
+    """Get retrieval index size and version, and hot reload counters"""
+    reloader = request.app['knowledge_reloader']
+    return web.json_response({
+        'index': request.app['retriever'].get_stats(),
+        'reload': reloader.get_stats() if reloader else None
+    })
+
+
+async def cache_stats(request: web.Request) -> web.Response:
+    """Get TTS audio cache and request coalescing counters"""
+    audio_cache = request.app['audio_cache']
+    coalescing = request.app['tts_flights'].get_stats()
+    if not audio_cache:
+        return web.json_response({'enabled': False, 'coalescing': coalescing})
+    return web.json_response({'enabled': True, 'stats': audio_cache.get_stats(), 'coalescing': coalescing})
+
+
+async def prometheus_metrics(request: web.Request) -> web.Response:
+    """Per-stage timings, time to first audio, bytes out and cache outcomes in Prometheus text format"""
+    return web.Response(body=REGISTRY.render().encode('utf-8'),
+                        headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+
+async def pool_stats(request: web.Request) -> web.Response:
+    """Get synthesizer/recognizer pool occupancy, wait times and admission queue depth"""
+    stats = request.app['voice_service'].get_pool_stats()
+    stats.update(request.app['async_service'].get_pool_stats())
+    admission = request.app['admission']
+    stats['admission'] = admission.get_stats() if admission else None
+    return web.json_response(stats)
+
+
+async def on_startup(app: web.Application):
+    """Initialize Azure Voice Service inside the running event loop"""
+    # Retrieval works without speech, so keep its index current even if speech init fails
+    if app['knowledge_reloader']:
+        app['knowledge_reloader'].start()
+
+    voice_service = create_voice_service_from_env()
+    if voice_service:
+        logger.info("✅ Azure Voice Service initialized successfully")
+        pool_size = int(os.getenv('ATLAS_ASYNC_POOL_SIZE', '64'))
+        app['voice_service'] = voice_service
+        # Event-bridged synthesizers need the Speech SDK; other backends run on threads
+        service_class = AsyncVoiceService if voice_service.backend.name == 'azure' else ThreadedAsyncVoiceService
+        app['async_service'] = service_class(voice_service, pool_size=pool_size)
+        # Pre-open synthesizer connections and start their keep-alive threads, as the Flask server does
+        await asyncio.to_thread(voice_service.warm_up)
+        await app['async_service'].warm_up()
+        app['audio_cache'] = create_audio_cache_from_env()
+        app['recognition_sessions'] = create_session_manager_from_env(voice_service.stt)
+        app['recognition_sessions'].start()
+        register_service_gauges(voice_service, app['audio_cache'], app['recognition_sessions'],
+                                app['tts_flights'], app['admission'])
+        # Edited knowledge files now also drop their cached audio
+        if app['knowledge_reloader']:
+            app['knowledge_reloader'].audio_cache = app['audio_cache']
+        # The first probe opens a connection, keep it off the event loop
+        await asyncio.to_thread(voice_service.start_health_probe)
+
+        # Re-synthesize the hottest phrases on background threads
+        app['phrase_tracker'].start()
+        if app['audio_cache']:
+            app['cache_warmer'] = start_cache_warmup_from_env(
+                lambda text, voice, output_format: voice_service.tts.synthesize_to_bytes(
+                    text, voice=voice, output_format=output_format
+                ),
+                app['audio_cache'],
+                app['phrase_tracker']
+            )
+    else:
+        logger.error("❌ Failed to initialize Azure Voice Service")
+
+
+async def on_cleanup(app: web.Application):
+    """Persist phrase counts, end live transcriptions and stop background watchers on shutdown"""
+    app['phrase_tracker'].stop()
+    if app['recognition_sessions']:
+        app['recognition_sessions'].stop()
+    if app['knowledge_reloader']:
+        app['knowledge_reloader'].stop()
+    if app['voice_service'] and app['voice_service'].health_probe:
+        app['voice_service'].health_probe.stop()
+    if app['voice_service']:
+        for service in (app['voice_service'].tts, app['voice_service'].stt):
+            if service.connections is not None:
+                service.connections.stop()
+
+
+def create_app() -> web.Application:
+    """Create the aiohttp application with the same routes as the Flask API"""
+    app = web.Application(middlewares=[metrics_middleware, cors_middleware, service_middleware,
+                                         admission_middleware])
+    app['voice_service'] = None
+    app['async_service'] = None
+    app['audio_cache'] = None
+    app['recognition_sessions'] = None
+    app['tts_flights'] = AsyncSingleFlight("tts")
+    app['admission'] = create_admission_controller_from_env()
+    app['phrase_tracker'] = create_phrase_tracker_from_env()
+    app['cache_warmer'] = None
+    app['segment_synthesizer'] = create_segmented_synthesizer_from_env()
+    app['retriever'] = create_retriever_from_env()
+    # Edited knowledge files are re-indexed without a restart (None when disabled)
+    app['knowledge_reloader'] = create_knowledge_reloader_from_env(
+        app['retriever'], voices=[voice['name'] for voices in ARABIC_VOICES.values() for voice in voices]
+    )
+    app['response_generator'] = create_response_generator_from_env()
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/test-setup', test_setup)
+    app.router.add_post('/speech-to-text', speech_to_text)
+    app.router.add_post('/text-to-speech', text_to_speech)
+    app.router.add_post('/text-to-speech-file', text_to_speech_file)
+    app.router.add_post('/text-to-speech-stream', text_to_speech_stream)
+    app.router.add_get('/voice-session', voice_session)
+    app.router.add_post('/batch-transcribe', batch_transcribe)
+    app.router.add_post('/recognition-sessions', create_recognition_session)
+    app.router.add_get('/recognition-sessions', list_recognition_sessions)
+    app.router.add_post('/recognition-sessions/{session_id}/audio', recognition_session_audio)
+    app.router.add_get('/recognition-sessions/{session_id}/results', recognition_session_results)
+    app.router.add_delete('/recognition-sessions/{session_id}', close_recognition_session)
+    app.router.add_post('/voice-conversation', voice_conversation)
+    app.router.add_post('/set-voice', set_voice)
+    app.router.add_get('/available-voices', available_voices)
+    app.router.add_get('/retrieve', retrieve)
+    app.router.add_post('/retrieve', retrieve)
+    app.router.add_post('/voice-turn', voice_turn)
+    app.router.add_get('/knowledge-stats', knowledge_stats)
+    app.router.add_get('/cache-stats', cache_stats)
+    app.router.add_get('/pool-stats', pool_stats)
+    app.router.add_get('/metrics', prometheus_metrics)
+    return app
+
+
+if __name__ == '__main__':
+    print("🎙️ Starting Azure Voice Services API Server (asyncio mode)")
+    print("=" * 50)
+
+    uses_azure = os.getenv('ATLAS_SPEECH_BACKEND', 'azure').lower() == 'azure'
+    if uses_azure and (not os.getenv('AZURE_SPEECH_KEY') or not os.getenv('AZURE_SPEECH_REGION')):
+        print("❌ Failed to initialize voice service. Check your Azure credentials.")
+        print("\nMake sure you have set:")
+        print("- AZURE_SPEECH_KEY environment variable")
+        print("- AZURE_SPEECH_REGION environment variable")
+        exit(1)
+
+    print("\n🚀 Server starting on http://localhost:5000")
+    print("📱 Flutter app can now connect to voice services!")
+
+    web.run_app(create_app(), host='0.0.0.0', port=5000)
@@ -0,0 +1,285 @@
+import struct
+from typing import List, NamedTuple, Optional
+
+# Matches the SDK default output format (riff-16khz-16bit-mono-pcm)
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_BITS_PER_SAMPLE = 16
+DEFAULT_CHANNELS = 1
+
+# Data size written into headers whose final length is not known yet
+STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+def wav_header(data_size: int,
+               sample_rate: int = DEFAULT_SAMPLE_RATE,
+               bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+               channels: int = DEFAULT_CHANNELS) -> bytes:
+    """
+    Build a 44-byte RIFF/WAVE header for PCM data.
+
+    Args:
+        data_size (int): Size of the PCM payload in bytes
+        sample_rate (int): Samples per second
+        bits_per_sample (int): Bits per sample
+        channels (int): Number of channels
+
+    Returns:
+        bytes: WAV header
+    """
+    block_align = channels * bits_per_sample // 8
+    byte_rate = sample_rate * block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample,
+        b'data', data_size
+    )
+
+
+def streaming_wav_header(sample_rate: int = DEFAULT_SAMPLE_RATE,
+                         bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+                         channels: int = DEFAULT_CHANNELS) -> bytes:
+    """
+    Build a WAV header for a stream whose length is unknown up front.
+
+    Returns:
+        bytes: WAV header with maximal RIFF and data sizes
+    """
+    return wav_header(STREAMING_DATA_SIZE, sample_rate, bits_per_sample, channels)
+
+
+def pcm_to_wav(pcm: bytes,
+               sample_rate: int = DEFAULT_SAMPLE_RATE,
+               bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+               channels: int = DEFAULT_CHANNELS) -> bytes:
+    """
+    Wrap raw PCM samples in a WAV container.
+
+    Args:
+        pcm (bytes): Raw little-endian PCM samples
+
+    Returns:
+        bytes: Complete WAV file contents
+    """
+    return wav_header(len(pcm), sample_rate, bits_per_sample, channels) + pcm
+
+
+def parse_wav_header(data: bytes):
+    """
+    Locate the PCM payload in the beginning of a WAV stream.
+
+    Handles extra chunks (LIST, fact, ...) between "fmt " and "data".
+
+    Args:
+        data (bytes): First bytes of the stream
+
+    Returns:
+        tuple: (sample_rate, bits_per_sample, channels, data_offset) once the
+        "data" chunk is reached, or None if more bytes are needed
+
+    Raises:
+        ValueError: If the data is not a PCM WAV stream
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("Not a RIFF/WAVE stream")
+
+    offset = 12
+    audio_format = None
+    while True:
+        if len(data) < offset + 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', data[offset:offset + 8])
+        body = offset + 8
+
+        if chunk_id == b'data':
+            if audio_format is None:
+                raise ValueError("WAV stream has no fmt chunk before data")
+            return audio_format + (body,)
+
+        if len(data) < body + chunk_size:
+            return None
+
+        if chunk_id == b'fmt ':
+            format_tag, channels, sample_rate = struct.unpack('<HHI', data[body:body + 8])
+            bits_per_sample = struct.unpack('<H', data[body + 14:body + 16])[0]
+            if format_tag not in (1, 0xFFFE):
+                raise ValueError(f"Unsupported WAV encoding: {format_tag}")
+            audio_format = (sample_rate, bits_per_sample, channels)
+
+        # Chunks are word aligned
+        offset = body + chunk_size + (chunk_size & 1)
+
+
+def detect_stream_format(header: bytes, sample_rate: int = DEFAULT_SAMPLE_RATE):
+    """
+    Work out the PCM format of uploaded audio from its first bytes.
+
+    WAV input is recognized by its RIFF header; anything else is treated as
+    raw 16-bit mono PCM at the given sample rate.
+
+    Args:
+        header (bytes): Bytes received so far
+        sample_rate (int): Sample rate assumed for raw PCM
+
+    Returns:
+        tuple: (sample_rate, bits_per_sample, channels, data_offset), or None
+        if more bytes are needed
+    """
+    if header[:4] == b'RIFF':
+        return parse_wav_header(header)
+    if len(header) < 4:
+        return None
+    return sample_rate, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS, 0
+
+
+class AudioOutputFormat(NamedTuple):
+    """A client-facing TTS output format and how to produce it with the SDK."""
+    name: str
+    sdk_format: str
+    stream_sdk_format: str
+    mimetype: str
+    extension: str
+    sample_rate: int
+
+    @property
+    def is_pcm(self) -> bool:
+        """True if the format is WAV, i.e. streamed as raw PCM plus a header."""
+        return self.extension == 'wav'
+
+
+# Formats clients may ask for; SDK names are SpeechSynthesisOutputFormat members
+OUTPUT_FORMATS = {
+    'wav': AudioOutputFormat(
+        'wav', 'Riff16Khz16BitMonoPcm', 'Raw16Khz16BitMonoPcm', 'audio/wav', 'wav', 16000
+    ),
+    'wav-8khz': AudioOutputFormat(
+        'wav-8khz', 'Riff8Khz16BitMonoPcm', 'Raw8Khz16BitMonoPcm', 'audio/wav', 'wav', 8000
+    ),
+    'mp3': AudioOutputFormat(
+        'mp3', 'Audio16Khz32KBitRateMonoMp3', 'Audio16Khz32KBitRateMonoMp3', 'audio/mpeg', 'mp3', 16000
+    ),
+    'opus': AudioOutputFormat(
+        'opus', 'Ogg16Khz16BitMonoOpus', 'Ogg16Khz16BitMonoOpus', 'audio/ogg', 'ogg', 16000
+    ),
+}
+
+DEFAULT_OUTPUT_FORMAT = 'wav'
+
+FORMAT_ALIASES = {
+    'ogg': 'opus',
+    'pcm': 'wav',
+    'pcm-16khz': 'wav',
+    'pcm-8khz': 'wav-8khz',
+}
+
+MIMETYPE_FORMATS = {
+    'audio/ogg': 'opus',
+    'audio/opus': 'opus',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+    'audio/wav': 'wav',
+    'audio/wave': 'wav',
+    'audio/x-wav': 'wav',
+}
+
+
+def get_output_format(name: str) -> AudioOutputFormat:
+    """
+    Look up an output format by name or alias.
+
+    Args:
+        name (str): Format name, e.g. "opus", "mp3", "wav", "wav-8khz"
+
+    Returns:
+        AudioOutputFormat: Matching format
+
+    Raises:
+        ValueError: If the format is not a string or not supported
+    """
+    if not isinstance(name, str):
+        raise ValueError(f"Audio format must be a string, got {type(name).__name__}")
+    key = name.strip().lower()
+    key = FORMAT_ALIASES.get(key, key)
+    if key not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported audio format: {name}")
+    return OUTPUT_FORMATS[key]
+
+
+def negotiate_output_format(requested: Optional[str] = None,
+                            accept_header: Optional[str] = None) -> AudioOutputFormat:
+    """
+    Pick the TTS output format for a request.
+
+    An explicit format field wins. Otherwise the Accept header is matched by
+    q-value; "audio/*", "*/*" and a missing header fall back to WAV.
+
+    Args:
+        requested (str, optional): Value of the request's "format" field
+        accept_header (str, optional): Value of the Accept header
+
+    Returns:
+        AudioOutputFormat: Chosen format
+
+    Raises:
+        ValueError: If an explicit format is not a string or unsupported
+    """
+    # Only a missing or empty field falls back; 0, [] or {} from JSON is an error
+    if requested is not None and requested != '':
+        return get_output_format(requested)
+
+    candidates = []
+    for position, item in enumerate((accept_header or '').split(',')):
+        parts = [part.strip() for part in item.split(';')]
+        mimetype = parts[0].lower()
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if mimetype in MIMETYPE_FORMATS and quality > 0:
+            candidates.append((-quality, position, MIMETYPE_FORMATS[mimetype]))
+
+    if candidates:
+        return OUTPUT_FORMATS[min(candidates)[2]]
+    return OUTPUT_FORMATS[DEFAULT_OUTPUT_FORMAT]
+
+
+def wav_pcm_data(audio: bytes) -> bytes:
+    """
+    Strip the header from a complete WAV file.
+
+    Args:
+        audio (bytes): WAV file contents
+
+    Returns:
+        bytes: PCM payload
+    """
+    parsed = parse_wav_header(audio)
+    if parsed is None:
+        raise ValueError("Truncated WAV header")
+    return audio[parsed[3]:]
+
+
+def stitch_audio(segments: List[bytes], audio_format: AudioOutputFormat) -> bytes:
+    """
+    Join separately synthesized segments into one file.
+
+    WAV segments are merged into a single RIFF container. MP3 frames and Ogg
+    pages are self-delimiting, so those segments are concatenated as is
+    (sequential Ogg streams form a valid chained Ogg file).
+
+    Args:
+        segments (list): Audio of each segment, in order
+        audio_format (AudioOutputFormat): Format of every segment
+
+    Returns:
+        bytes: Single audio file
+    """
+    if not audio_format.is_pcm:
+        return b''.join(segments)
+    pcm = b''.join(wav_pcm_data(segment) for segment in segments)
+    return pcm_to_wav(pcm, audio_format.sample_rate)
@@ -1,24 +1,189 @@
 import azure.cognitiveservices.speech as speechsdk
 import os
-from typing import Optional, Callable
+from typing import Optional, Callable, Dict, Iterable, List
 import logging
 import threading
 import time
+from speech_pool import SpeechObjectPool
+from speech_connections import ConnectionKeeper
+from audio_formats import DEFAULT_SAMPLE_RATE, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS
+from speech_backends import SpeechToTextBackend
+from metrics import stage_timer
 
-class AzureSpeechToText:
+
+class PushStreamRecognition:
+    """
+    One continuous-recognition session fed from a PushAudioInputStream.
+    
+    Audio is written as it arrives (e.g. from an HTTP upload) while the
+    recognizer is already running, so recognition overlaps the transfer.
+    Each instance owns its own recognizer, so any number can run at once.
+    """
+    
+    def __init__(self, speech_config: speechsdk.SpeechConfig,
+                 sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+                 channels: int = DEFAULT_CHANNELS,
+                 on_recognized: Optional[Callable[[str], None]] = None,
+                 on_recognizing: Optional[Callable[[str], None]] = None,
+                 on_stopped: Optional[Callable[[], None]] = None,
+                 connections: Optional[ConnectionKeeper] = None):
+        """
+        Create the push stream and recognizer.
+        
+        Args:
+            speech_config (SpeechConfig): Config with the recognition language set
+            sample_rate (int): PCM sample rate of the pushed audio
+            bits_per_sample (int): PCM sample width of the pushed audio
+            channels (int): PCM channel count of the pushed audio
+            on_recognized (Callable, optional): Callback for each final result
+            on_recognizing (Callable, optional): Callback for intermediate results
+            on_stopped (Callable, optional): Callback once the session has ended
+            connections (ConnectionKeeper, optional): Keeper tracking this session's
+                connection, released when the session is stopped
+        """
+        self.on_recognized = on_recognized
+        self.on_recognizing = on_recognizing
+        self.on_stopped = on_stopped
+        self.connections = connections
+        
+        stream_format = speechsdk.audio.AudioStreamFormat(
+            samples_per_second=sample_rate,
+            bits_per_sample=bits_per_sample,
+            channels=channels
+        )
+        self.push_stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        self.recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=speechsdk.audio.AudioConfig(stream=self.push_stream)
+        )
+        
+        self.results: List[str] = []
+        self.error: Optional[str] = None
+        self.bytes_written = 0
+        self._stopped = threading.Event()
+        self._started = False
+        self._closed = False
+        
+        self.logger = logging.getLogger(__name__)
+        
+        self.recognizer.recognized.connect(self._recognized_handler)
+        self.recognizer.recognizing.connect(self._recognizing_handler)
+        self.recognizer.canceled.connect(self._canceled_handler)
+        self.recognizer.session_stopped.connect(lambda evt: self._mark_stopped())
+    
+    def _recognized_handler(self, evt):
+        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech and evt.result.text:
+            self.results.append(evt.result.text)
+            if self.on_recognized:
+                self.on_recognized(evt.result.text)
+    
+    def _recognizing_handler(self, evt):
+        if self.on_recognizing and evt.result.text:
+            self.on_recognizing(evt.result.text)
+    
+    def _canceled_handler(self, evt):
+        # EndOfStream is the normal way a push-stream session finishes
+        if evt.cancellation_details.reason == speechsdk.CancellationReason.Error:
+            self.error = evt.cancellation_details.error_details or "Recognition canceled"
+            self.logger.error(f"Recognition canceled: {self.error}")
+        self._mark_stopped()
+    
+    def _mark_stopped(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            if self.on_stopped:
+                self.on_stopped()
+    
+    def start(self, wait: bool = True):
+        """
+        Start recognizing; audio may be written before or after this call.
+        
+        Args:
+            wait (bool): Block until the SDK confirms the start
+        """
+        if not self._started:
+            future = self.recognizer.start_continuous_recognition_async()
+            if wait:
+                future.get()
+            self._started = True
+    
+    def write(self, chunk: bytes):
+        """
+        Push a chunk of PCM audio.
+        
+        Args:
+            chunk (bytes): Raw PCM samples in the format given at construction
+        """
+        if chunk and not self._closed:
+            self.push_stream.write(chunk)
+            self.bytes_written += len(chunk)
+    
+    def close(self):
+        """Signal end of audio; the recognizer finishes what it has buffered."""
+        if not self._closed:
+            self._closed = True
+            self.push_stream.close()
+    
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for the session to finish and stop the recognizer.
+        
+        Args:
+            timeout (float, optional): Seconds to wait after close()
+            
+        Returns:
+            str: All final results joined by spaces, or None if nothing was recognized
+        """
+        if not self._stopped.wait(timeout):
+            self.logger.warning("Timed out waiting for push-stream recognition to finish")
+        self.stop()
+        return " ".join(self.results) if self.results else None
+    
+    def stop(self, wait: bool = True):
+        """
+        Stop recognition immediately and release the stream.
+        
+        Args:
+            wait (bool): Block until the SDK confirms the stop
+        """
+        self.close()
+        if self._started:
+            self._started = False
+            try:
+                future = self.recognizer.stop_continuous_recognition_async()
+                if wait:
+                    future.get()
+            except Exception as e:
+                self.logger.error(f"Error stopping push-stream recognition: {str(e)}")
+        if self.connections is not None:
+            self.connections.untrack(self)
+    
+    @property
+    def finished(self) -> bool:
+        """True once the recognizer reported the end of the session."""
+        return self._stopped.is_set()
+
+
+class AzureSpeechToText(SpeechToTextBackend):
     """
     Azure Speech-to-Text wrapper class for Arabic voice recognition.
     
     Requires Azure Speech Service subscription key and region.
     """
     
-    def __init__(self, subscription_key: str, region: str):
+    def __init__(self, subscription_key: str, region: str, pool_size: int = 4,
+                 keepalive_interval: float = 60.0, standby_size: int = 2):
         """
         Initialize Azure STT client.
         
         Args:
             subscription_key (str): Azure Speech Service subscription key
             region (str): Azure region (e.g., 'eastus', 'westus2')
+            pool_size (int): Warm microphone recognizers kept per language
+            keepalive_interval (float): Seconds between re-opening dropped pooled connections
+            standby_size (int): Push-stream sessions kept ready, connection open, per warmed
+                language and audio format
         """
         self.subscription_key = subscription_key
         self.region = region
@@ -43,6 +208,102 @@ class AzureSpeechToText:
         self.is_listening = False
         self.recognition_result = None
         
+        # Pooled recognizers connect at construction and stay connected
+        self.connections = ConnectionKeeper("recognizer", interval=keepalive_interval)
+        
+        # Microphone recognizers keyed by (language, audio source)
+        self.recognizer_pool = SpeechObjectPool(
+            self._create_recognizer,
+            max_size=pool_size,
+            name="recognizer",
+            on_discard=self.connections.untrack
+        )
+        
+        # Push-stream sessions are single-use (the stream is bound at construction), so
+        # instead of a pool a few are built ahead of time per (language, rate, bits, channels)
+        self.standby_size = standby_size
+        self._standby: Dict[tuple, List[PushStreamRecognition]] = {}
+        self._refilling = set()
+        self._standby_lock = threading.Lock()
+    
+    def _create_recognizer(self, key: tuple) -> speechsdk.SpeechRecognizer:
+        """Build a default-microphone recognizer for a pool key."""
+        language_code, _ = key
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.subscription_key,
+            region=self.region
+        )
+        speech_config.speech_recognition_language = language_code
+        recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=self.audio_config
+        )
+        self.connections.track(recognizer, speechsdk.Connection.from_recognizer(recognizer))
+        return recognizer
+    
+    def _build_push_recognition(self, key: tuple) -> PushStreamRecognition:
+        """Build a push-stream session for a standby key and open its connection."""
+        language, sample_rate, bits_per_sample, channels = key
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.subscription_key,
+            region=self.region
+        )
+        speech_config.speech_recognition_language = language
+        recognition = PushStreamRecognition(
+            speech_config,
+            sample_rate=sample_rate,
+            bits_per_sample=bits_per_sample,
+            channels=channels,
+            connections=self.connections
+        )
+        self.connections.track(
+            recognition, speechsdk.Connection.from_recognizer(recognition.recognizer),
+            for_continuous_recognition=True
+        )
+        return recognition
+    
+    def warm_push_recognitions(self, keys: Iterable[tuple], count: Optional[int] = None):
+        """
+        Build push-stream sessions ahead of time so uploads skip the connection handshake.
+        
+        Args:
+            keys (Iterable[tuple]): (language, sample rate, bits per sample, channels) keys
+            count (int, optional): Sessions to keep per key, defaults to standby_size
+        """
+        count = self.standby_size if count is None else count
+        for key in keys:
+            with self._standby_lock:
+                missing = count - len(self._standby.get(key, ()))
+            for _ in range(max(missing, 0)):
+                try:
+                    recognition = self._build_push_recognition(key)
+                except Exception as e:
+                    self.logger.error(f"Error warming push-stream recognizer for {key}: {e}")
+                    break
+                with self._standby_lock:
+                    self._standby.setdefault(key, []).append(recognition)
+    
+    def _refill(self, key: tuple):
+        try:
+            self.warm_push_recognitions([key])
+        finally:
+            with self._standby_lock:
+                self._refilling.discard(key)
+    
+    def warm(self, languages: Iterable[str], count: int = 1):
+        """
+        Pre-build microphone recognizers and standby push-stream sessions (16 kHz mono PCM).
+        
+        Args:
+            languages (Iterable[str]): Recognition languages to warm
+            count (int): Microphone recognizers to build per language
+        """
+        languages = list(languages)
+        super().warm(languages, count)
+        self.warm_push_recognitions(
+            [(language, DEFAULT_SAMPLE_RATE, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS) for language in languages]
+        )
+        
     def set_language(self, language_code: str):
         """
         Set the recognition language.
@@ -59,24 +320,26 @@ class AzureSpeechToText:
         self.speech_config.speech_recognition_language = language_code
         self.logger.info(f"Language set to: {language_code}")
     
-    def recognize_once(self) -> Optional[str]:
+    def recognize_once(self, language: Optional[str] = None) -> Optional[str]:
         """
         Recognize speech from microphone (single utterance).
         
+        Args:
+            language (str, optional): Language for this call only, defaults to the current language
+        
         Returns:
             str: Recognized text or None if recognition failed
         """
         try:
-            # Create recognizer
-            recognizer = speechsdk.SpeechRecognizer(
-                speech_config=self.speech_config, 
-                audio_config=self.audio_config
-            )
+            key = (language or self.speech_config.speech_recognition_language, "microphone")
             
-            self.logger.info("Listening for speech... Speak now!")
-            
-            # Perform recognition
-            result = recognizer.recognize_once()
+            # Borrow a warm recognizer for this request
+            with self.recognizer_pool.checkout(key) as recognizer:
+                self.logger.info("Listening for speech... Speak now!")
+                
+                # Perform recognition
+                with stage_timer("stt", "recognition"):
+                    result = recognizer.recognize_once()
             
             if result.reason == speechsdk.ResultReason.RecognizedSpeech:
                 self.logger.info(f"Recognized: {result.text}")
@@ -97,7 +360,10 @@ class AzureSpeechToText:
     
     def recognize_from_file(self, audio_file_path: str) -> Optional[str]:
         """
-        Recognize speech from audio file.
+        Recognize all speech in an audio file.
+        
+        Uses continuous recognition, so every utterance is returned rather
+        than only the first one. See batch_transcribe.py for many files.
         
         Args:
             audio_file_path (str): Path to audio file (.wav format)
@@ -106,35 +372,56 @@ class AzureSpeechToText:
             str: Recognized text or None if recognition failed
         """
         try:
-            # Create audio configuration from file
-            audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
-            
-            # Create recognizer
-            recognizer = speechsdk.SpeechRecognizer(
-                speech_config=self.speech_config, 
-                audio_config=audio_config
-            )
-            
             self.logger.info(f"Recognizing speech from file: {audio_file_path}")
-            
-            # Perform recognition
-            result = recognizer.recognize_once()
-            
-            if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                self.logger.info(f"Recognized from file: {result.text}")
-                return result.text
-            elif result.reason == speechsdk.ResultReason.NoMatch:
-                self.logger.warning("No speech could be recognized from file")
-                return None
-            elif result.reason == speechsdk.ResultReason.Canceled:
-                cancellation_details = result.cancellation_details
-                self.logger.error(f"Speech recognition canceled: {cancellation_details.reason}")
-                return None
+            with open(audio_file_path, 'rb') as audio_file:
+                return self.recognize_stream(iter(lambda: audio_file.read(32 * 1024), b''), timeout=600.0)
                 
         except Exception as e:
             self.logger.error(f"Error recognizing from file: {str(e)}")
             return None
     
+    def create_push_recognition(self, language: Optional[str] = None,
+                                sample_rate: int = DEFAULT_SAMPLE_RATE,
+                                bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+                                channels: int = DEFAULT_CHANNELS,
+                                on_recognized: Optional[Callable[[str], None]] = None,
+                                on_recognizing: Optional[Callable[[str], None]] = None,
+                                on_stopped: Optional[Callable[[], None]] = None
+                                ) -> PushStreamRecognition:
+        """
+        Create a recognition session that is fed audio by the caller.
+        
+        Args:
+            language (str, optional): Language for this session, defaults to the current language
+            sample_rate (int): PCM sample rate of the audio that will be pushed
+            bits_per_sample (int): PCM sample width of the audio that will be pushed
+            channels (int): PCM channel count of the audio that will be pushed
+            on_recognized (Callable, optional): Callback for each final result
+            on_recognizing (Callable, optional): Callback for intermediate results
+            on_stopped (Callable, optional): Callback once the session has ended
+            
+        Returns:
+            PushStreamRecognition: Session, not yet started
+        """
+        key = (language or self.speech_config.speech_recognition_language, sample_rate, bits_per_sample, channels)
+        with self._standby_lock:
+            standby = self._standby.get(key)
+            recognition = standby.pop() if standby else None
+            refill = recognition is not None and key not in self._refilling
+            if refill:
+                self._refilling.add(key)
+        
+        if recognition is None:
+            recognition = self._build_push_recognition(key)
+        elif refill:
+            # Replace the session just taken so the next upload also finds an open connection
+            threading.Thread(target=self._refill, args=(key,), name="push-recognizer-warm", daemon=True).start()
+        
+        recognition.on_recognized = on_recognized
+        recognition.on_recognizing = on_recognizing
+        recognition.on_stopped = on_stopped
+        return recognition
+    
     def start_continuous_recognition(self, 
                                    on_recognized: Callable[[str], None],
                                    on_recognizing: Optional[Callable[[str], None]] = None) -> bool:
@@ -246,6 +533,11 @@ def create_stt_from_env() -> Optional[AzureSpeechToText]:
     - AZURE_SPEECH_KEY: Your Azure Speech Service subscription key
     - AZURE_SPEECH_REGION: Your Azure region
     
+    Optional environment variables:
+    - ATLAS_SPEECH_POOL_SIZE: Warm recognizers per language (default: 4)
+    - ATLAS_SPEECH_KEEPALIVE_INTERVAL: Seconds between re-opening dropped connections (default: 60)
+    - ATLAS_SPEECH_STANDBY_SIZE: Push-stream sessions kept ready per warmed language (default: 2)
+    
     Returns:
         AzureSpeechToText: Configured STT instance or None if env vars missing
     """
@@ -259,7 +551,11 @@ def create_stt_from_env() -> Optional[AzureSpeechToText]:
         print("- AZURE_SPEECH_REGION: Your Azure region (e.g., 'eastus')")
         return None
     
-    return AzureSpeechToText(subscription_key, region)
+    pool_size = int(os.getenv('ATLAS_SPEECH_POOL_SIZE', '4'))
+    keepalive_interval = float(os.getenv('ATLAS_SPEECH_KEEPALIVE_INTERVAL', '60'))
+    standby_size = int(os.getenv('ATLAS_SPEECH_STANDBY_SIZE', '2'))
+    return AzureSpeechToText(subscription_key, region, pool_size=pool_size,
+                             keepalive_interval=keepalive_interval, standby_size=standby_size)
 
 
 if __name__ == "__main__":
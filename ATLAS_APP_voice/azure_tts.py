@@ -1,22 +1,31 @@
 import azure.cognitiveservices.speech as speechsdk
 import os
-from typing import Optional
+from typing import List, Optional, Iterator
 import logging
+import threading
+from speech_pool import SpeechObjectPool
+from speech_connections import ConnectionKeeper
+from audio_formats import DEFAULT_OUTPUT_FORMAT, get_output_format
+from speech_backends import TextToSpeechBackend
+from metrics import stage_timer
 
-class AzureTextToSpeech:
+class AzureTextToSpeech(TextToSpeechBackend):
     """
     Azure Text-to-Speech wrapper class for easy TTS functionality.
     
     Requires Azure Speech Service subscription key and region.
     """
     
-    def __init__(self, subscription_key: str, region: str):
+    def __init__(self, subscription_key: str, region: str, pool_size: int = 4,
+                 keepalive_interval: float = 60.0):
         """
         Initialize Azure TTS client.
         
         Args:
             subscription_key (str): Azure Speech Service subscription key
             region (str): Azure region (e.g., 'eastus', 'westus2')
+            pool_size (int): Warm synthesizers kept per (voice, output format)
+            keepalive_interval (float): Seconds between re-opening dropped pooled connections
         """
         self.subscription_key = subscription_key
         self.region = region
@@ -33,6 +42,53 @@ class AzureTextToSpeech:
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        
+        # Pooled synthesizers connect at construction and stay connected
+        self.connections = ConnectionKeeper("synthesizer", interval=keepalive_interval)
+        
+        # Device-less synthesizers keyed by (voice, output format)
+        self.synthesizer_pool = SpeechObjectPool(
+            self._create_synthesizer,
+            max_size=pool_size,
+            name="synthesizer",
+            on_discard=self.connections.untrack
+        )
+    
+    def _create_synthesizer(self, key: tuple) -> speechsdk.SpeechSynthesizer:
+        """Build a synthesizer without audio output for a pool key."""
+        voice_name, output_format = key
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.subscription_key,
+            region=self.region
+        )
+        speech_config.speech_synthesis_voice_name = voice_name
+        speech_config.set_speech_synthesis_output_format(output_format)
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        self.connections.track(synthesizer, speechsdk.Connection.from_speech_synthesizer(synthesizer))
+        return synthesizer
+    
+    def check_connection(self, timeout: float = 5.0):
+        """
+        Open and close a fresh connection to the synthesis endpoint.
+        
+        Used by the health probe; no text is synthesized, so probing is free.
+        
+        Args:
+            timeout (float): Seconds to wait for the connection
+            
+        Raises:
+            TimeoutError: If the connection did not open in time
+        """
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=self.speech_config, audio_config=None)
+        connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connected = threading.Event()
+        connection.connected.connect(lambda evt: connected.set())
+        try:
+            connection.open(False)
+            if not connected.wait(timeout):
+                raise TimeoutError(f"No connection to Azure Speech ({self.region}) within {timeout}s")
+        finally:
+            connection.close()
     
     def set_voice(self, voice_name: str):
         """
@@ -51,22 +107,33 @@ class AzureTextToSpeech:
         self.speech_config.speech_synthesis_voice_name = voice_name
         self.logger.info(f"Voice set to: {voice_name}")
     
-    def speak_text(self, text: str) -> bool:
+    def speak_text(self, text: str, voice: Optional[str] = None) -> bool:
         """
         Convert text to speech and play it through speakers.
         
         Args:
             text (str): Text to convert to speech
+            voice (str, optional): Voice for this call only, defaults to the current voice
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
+            speech_config = self.speech_config
+            if voice:
+                speech_config = speechsdk.SpeechConfig(
+                    subscription=self.subscription_key,
+                    region=self.region
+                )
+                speech_config.speech_synthesis_voice_name = voice
+            
             # Create synthesizer with default speaker
-            synthesizer = speechsdk.SpeechSynthesizer(speech_config=self.speech_config)
+            with stage_timer("tts", "synthesizer_construction"):
+                synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
             
             # Perform synthesis
-            result = synthesizer.speak_text_async(text).get()
+            with stage_timer("tts", "speaker_synthesis"):
+                result = synthesizer.speak_text_async(text).get()
             
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
                 self.logger.info(f"Speech synthesis completed for text: '{text[:50]}...'")
@@ -82,6 +149,53 @@ class AzureTextToSpeech:
             self.logger.error(f"Error in speech synthesis: {str(e)}")
             return False
     
+    def speak_segments(self, segments: List[str], voice: Optional[str] = None) -> bool:
+        """
+        Play text segments through speakers back to back.
+        
+        All segments are queued on one synthesizer up front, so playback of
+        the first sentence starts as soon as it alone is synthesized instead
+        of after the whole response.
+        
+        Args:
+            segments (list): Text segments in playback order
+            voice (str, optional): Voice for this call only, defaults to the current voice
+        
+        Returns:
+            bool: True if every segment was spoken, False otherwise
+        """
+        try:
+            speech_config = self.speech_config
+            if voice:
+                speech_config = speechsdk.SpeechConfig(
+                    subscription=self.subscription_key,
+                    region=self.region
+                )
+                speech_config.speech_synthesis_voice_name = voice
+            
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
+            futures = [synthesizer.speak_text_async(segment) for segment in segments]
+            
+            for index, future in enumerate(futures):
+                result = future.get()
+                if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+                    cancellation_details = result.cancellation_details
+                    self.logger.error(
+                        f"Speech synthesis canceled at segment {index + 1}/{len(segments)}: "
+                        f"{cancellation_details.reason}"
+                    )
+                    if cancellation_details.error_details:
+                        self.logger.error(f"Error details: {cancellation_details.error_details}")
+                    synthesizer.stop_speaking_async().get()
+                    return False
+            
+            self.logger.info(f"Spoke {len(segments)} segments")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Error in segmented speech synthesis: {str(e)}")
+            return False
+    
     def text_to_audio_file(self, text: str, output_file: str) -> bool:
         """
         Convert text to speech and save as audio file.
@@ -120,6 +234,112 @@ class AzureTextToSpeech:
             self.logger.error(f"Error saving audio file: {str(e)}")
             return False
     
+    def pool_key(self, voice: Optional[str] = None, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                 streaming: bool = False) -> tuple:
+        """
+        Get the synthesizer pool key for a voice and output format.
+        
+        Args:
+            voice (str, optional): Voice name, defaults to the current voice
+            output_format (str): Output format name from audio_formats.OUTPUT_FORMATS
+            streaming (bool): Use the format's streaming variant (raw PCM for WAV)
+            
+        Returns:
+            tuple: (voice name, SpeechSynthesisOutputFormat)
+        """
+        audio_format = get_output_format(output_format)
+        sdk_format = audio_format.stream_sdk_format if streaming else audio_format.sdk_format
+        return (
+            voice or self.speech_config.speech_synthesis_voice_name,
+            getattr(speechsdk.SpeechSynthesisOutputFormat, sdk_format)
+        )
+    
+    def synthesize_to_bytes(self, text: str, voice: Optional[str] = None,
+                            output_format: str = DEFAULT_OUTPUT_FORMAT) -> Optional[bytes]:
+        """
+        Convert text to speech and return the audio in memory.
+        
+        No speaker and no file are involved: a pooled synthesizer without an
+        audio output device is checked out and the result buffer is returned.
+        
+        Args:
+            text (str): Text to convert to speech
+            voice (str, optional): Voice for this call only, defaults to the current voice
+            output_format (str): Output format name ("wav", "wav-8khz", "mp3", "opus")
+            
+        Returns:
+            bytes: Audio data in the requested format or None if synthesis failed
+        """
+        try:
+            key = self.pool_key(voice, output_format)
+            with self.synthesizer_pool.checkout(key) as synthesizer:
+                with stage_timer("tts", "synthesis"):
+                    result = synthesizer.speak_text_async(text).get()
+            
+            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                self.logger.info(f"Synthesized {len(result.audio_data)} bytes for text: '{text[:50]}...'")
+                return result.audio_data
+            elif result.reason == speechsdk.ResultReason.Canceled:
+                cancellation_details = result.cancellation_details
+                self.logger.error(f"Speech synthesis canceled: {cancellation_details.reason}")
+                if cancellation_details.error_details:
+                    self.logger.error(f"Error details: {cancellation_details.error_details}")
+                return None
+                
+        except Exception as e:
+            self.logger.error(f"Error in speech synthesis: {str(e)}")
+            return None
+    
+    def stream_text(self, text: str, chunk_size: int = 4096,
+                    voice: Optional[str] = None,
+                    output_format: str = DEFAULT_OUTPUT_FORMAT) -> Iterator[bytes]:
+        """
+        Convert text to speech and yield audio chunks as they are synthesized.
+        
+        Synthesis is started with start_speaking_text_async(), which returns
+        as soon as the first audio arrives, and the rest is pulled from an
+        AudioDataStream while the service is still rendering.
+        
+        Args:
+            text (str): Text to convert to speech
+            chunk_size (int): Maximum size of each yielded chunk in bytes
+            voice (str, optional): Voice for this call only, defaults to the current voice
+            output_format (str): Output format name ("wav", "wav-8khz", "mp3", "opus")
+            
+        Yields:
+            bytes: Raw PCM chunks for WAV formats (no header), encoded frames otherwise
+            
+        Raises:
+            RuntimeError: If synthesis is canceled after audio started flowing
+        """
+        key = self.pool_key(voice, output_format, streaming=True)
+        
+        # The synthesizer stays checked out until the last chunk is read
+        with self.synthesizer_pool.checkout(key) as synthesizer:
+            with stage_timer("tts", "stream_first_audio"):
+                result = synthesizer.start_speaking_text_async(text).get()
+            
+            if result.reason == speechsdk.ResultReason.Canceled:
+                cancellation_details = result.cancellation_details
+                self.logger.error(f"Speech synthesis canceled: {cancellation_details.reason}")
+                if cancellation_details.error_details:
+                    self.logger.error(f"Error details: {cancellation_details.error_details}")
+                return
+            
+            audio_stream = speechsdk.AudioDataStream(result)
+            audio_buffer = bytes(chunk_size)
+            while True:
+                filled_size = audio_stream.read_data(audio_buffer)
+                if filled_size == 0:
+                    break
+                yield audio_buffer[:filled_size]
+            
+            if audio_stream.status == speechsdk.StreamStatus.Canceled:
+                self.logger.error("Speech synthesis stream canceled before completion")
+                raise RuntimeError("Speech synthesis stream canceled")
+            else:
+                self.logger.info(f"Streaming synthesis completed for text: '{text[:50]}...'")
+    
     def speak_ssml(self, ssml: str) -> bool:
         """
         Convert SSML (Speech Synthesis Markup Language) to speech.
@@ -184,6 +404,10 @@ def create_tts_from_env() -> Optional[AzureTextToSpeech]:
     - AZURE_SPEECH_KEY: Your Azure Speech Service subscription key
     - AZURE_SPEECH_REGION: Your Azure region
     
+    Optional environment variables:
+    - ATLAS_SPEECH_POOL_SIZE: Warm synthesizers per voice/format (default: 4)
+    - ATLAS_SPEECH_KEEPALIVE_INTERVAL: Seconds between re-opening dropped connections (default: 60)
+    
     Returns:
         AzureTextToSpeech: Configured TTS instance or None if env vars missing
     """
@@ -197,7 +421,10 @@ def create_tts_from_env() -> Optional[AzureTextToSpeech]:
         print("- AZURE_SPEECH_REGION: Your Azure region (e.g., 'eastus')")
         return None
     
-    return AzureTextToSpeech(subscription_key, region)
+    pool_size = int(os.getenv('ATLAS_SPEECH_POOL_SIZE', '4'))
+    keepalive_interval = float(os.getenv('ATLAS_SPEECH_KEEPALIVE_INTERVAL', '60'))
+    return AzureTextToSpeech(subscription_key, region, pool_size=pool_size,
+                             keepalive_interval=keepalive_interval)
 
 
 if __name__ == "__main__":
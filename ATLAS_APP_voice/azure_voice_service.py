@@ -2,8 +2,21 @@ import os
 import json
 import logging
 from typing import Optional, Dict, Any
-from azure_tts import AzureTextToSpeech, create_tts_from_env
-from azure_stt import AzureSpeechToText, create_stt_from_env
+from speech_backends import SpeechBackend, create_azure_backend, create_speech_backend_from_env
+from speech_connections import create_health_probe_from_env
+from text_segmenter import split_sentences
+
+# Arabic voices offered to clients, grouped by gender
+ARABIC_VOICES = {
+    'male': [
+        {'name': 'ar-MA-JamalNeural', 'language': 'Arabic (Morocco)', 'gender': 'Male'},
+        {'name': 'ar-SA-HamedNeural', 'language': 'Arabic (Saudi Arabia)', 'gender': 'Male'},
+    ],
+    'female': [
+        {'name': 'ar-MA-MounaNeural', 'language': 'Arabic (Morocco)', 'gender': 'Female'},
+        {'name': 'ar-SA-ZariyahNeural', 'language': 'Arabic (Saudi Arabia)', 'gender': 'Female'},
+    ]
+}
 
 class AzureVoiceService:
     """
@@ -11,20 +24,27 @@ class AzureVoiceService:
     Designed for Arabic voice interactions with the first aid chatbot.
     """
     
-    def __init__(self, subscription_key: str, region: str):
+    def __init__(self, subscription_key: Optional[str] = None, region: Optional[str] = None,
+                 pool_size: int = 4, backend: Optional[SpeechBackend] = None):
         """
         Initialize combined voice service.
         
         Args:
-            subscription_key (str): Azure Speech Service subscription key
-            region (str): Azure region (e.g., 'eastus', 'westus2')
+            subscription_key (str, optional): Azure Speech Service subscription key
+            region (str, optional): Azure region (e.g., 'eastus', 'westus2')
+            pool_size (int): Warm synthesizers/recognizers kept per voice or language
+            backend (SpeechBackend, optional): TTS/STT implementation, defaults to Azure
+                built from subscription_key and region
         """
         self.subscription_key = subscription_key
         self.region = region
         
         # Initialize TTS and STT services
-        self.tts = AzureTextToSpeech(subscription_key, region)
-        self.stt = AzureSpeechToText(subscription_key, region)
+        if backend is None:
+            backend = create_azure_backend(subscription_key, region, pool_size=pool_size)
+        self.backend = backend
+        self.tts = backend.tts
+        self.stt = backend.stt
         
         # Set Arabic voice for TTS (Morocco)
         self.tts.set_voice("ar-MA-JamalNeural")  # Male Arabic voice
@@ -36,7 +56,78 @@ class AzureVoiceService:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
-        self.logger.info("Azure Voice Service initialized for Arabic")
+        # Cached speech service reachability, see start_health_probe()
+        self.health_probe = None
+        
+        self.logger.info(f"Voice Service initialized for Arabic ({backend.name} backend)")
+    
+    def warm_up(self, voices: Optional[list] = None, languages: Optional[list] = None):
+        """
+        Pre-build pooled synthesizers and recognizers so the first requests skip SDK setup.
+        
+        Args:
+            voices (list, optional): Voices to warm, defaults to both Moroccan voices
+            languages (list, optional): Recognition languages to warm, defaults to ar-MA
+        """
+        voices = voices or ["ar-MA-MounaNeural", "ar-MA-JamalNeural"]
+        languages = languages or ["ar-MA"]
+        self.tts.synthesizer_pool.warm([self.tts.pool_key(voice) for voice in voices])
+        self.stt.warm(languages)
+        self.logger.info(f"Warmed speech pools for voices: {', '.join(voices)}; languages: {', '.join(languages)}")
+        
+        # Keep the connections opened during warm-up from going stale
+        for service in (self.tts, self.stt):
+            if service.connections is not None:
+                service.connections.start()
+    
+    def start_health_probe(self):
+        """
+        Start probing the speech service in the background.
+        
+        Configured by ATLAS_HEALTH_PROBE_INTERVAL / ATLAS_HEALTH_PROBE_TIMEOUT;
+        does nothing when probing is disabled or already running.
+        """
+        if self.health_probe is not None:
+            return
+        self.health_probe = create_health_probe_from_env(self.tts.check_connection)
+        if self.health_probe is not None:
+            self.health_probe.start()
+            self.logger.info(f"Speech service health probe started ({self.health_probe.get_status()['status']})")
+    
+    def get_health(self) -> Dict[str, Any]:
+        """
+        Get the last probe result and connection counters.
+        
+        Never contacts the speech service, so it is cheap enough for /health.
+        
+        Returns:
+            dict: "status" ("ok", "degraded", "down", or "unknown" without a probe),
+                "probe" details and "connections" stats per pool
+        """
+        probe = self.health_probe.get_status() if self.health_probe is not None else None
+        connections = {
+            name: service.connections.get_stats()
+            for name, service in (("synthesizers", self.tts), ("recognizers", self.stt))
+            if service.connections is not None
+        }
+        return {
+            "backend": self.backend.name,
+            "status": probe["status"] if probe else "unknown",
+            "probe": probe,
+            "connections": connections
+        }
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Get synthesizer and recognizer pool metrics.
+        
+        Returns:
+            dict: Pool stats keyed by "synthesizers" and "recognizers"
+        """
+        return {
+            "synthesizers": self.tts.synthesizer_pool.get_stats(),
+            "recognizers": self.stt.recognizer_pool.get_stats()
+        }
     
     def speak_and_listen(self, text_to_speak: str, listen_timeout: int = 10) -> Optional[str]:
         """
@@ -85,8 +176,8 @@ class AzureVoiceService:
         Returns:
             str: User's next question/input, or None if conversation ends
         """
-        # Speak the chatbot response
-        if not self.tts.speak_text(chatbot_response):
+        # Speak the chatbot response sentence by sentence so playback starts early
+        if not self.tts.speak_segments(split_sentences(chatbot_response)):
             self.logger.error("Failed to speak chatbot response")
             return None
         
@@ -200,20 +291,24 @@ def create_voice_service_from_env() -> Optional[AzureVoiceService]:
     """
     Create AzureVoiceService instance from environment variables.
     
+    Optional environment variables:
+    - ATLAS_SPEECH_BACKEND: "azure" (default) or "fake" to run offline without credentials
+    - ATLAS_SPEECH_POOL_SIZE: Warm synthesizers/recognizers per voice or language (default: 4)
+    - ATLAS_SPEECH_KEEPALIVE_INTERVAL: Seconds between re-opening dropped Azure connections (default: 60)
+    - ATLAS_HEALTH_PROBE_INTERVAL: Seconds between speech service probes (default: 30, 0 disables)
+    
     Returns:
         AzureVoiceService: Configured voice service or None if env vars missing
     """
-    subscription_key = os.getenv('AZURE_SPEECH_KEY')
-    region = os.getenv('AZURE_SPEECH_REGION')
-    
-    if not subscription_key or not region:
-        print("Error: Missing environment variables!")
-        print("Please set:")
-        print("- AZURE_SPEECH_KEY: Your Azure Speech Service subscription key")
-        print("- AZURE_SPEECH_REGION: Your Azure region (e.g., 'eastus')")
+    backend = create_speech_backend_from_env()
+    if backend is None:
         return None
     
-    return AzureVoiceService(subscription_key, region)
+    return AzureVoiceService(
+        os.getenv('AZURE_SPEECH_KEY'),
+        os.getenv('AZURE_SPEECH_REGION'),
+        backend=backend
+    )
 
 
 if __name__ == "__main__":
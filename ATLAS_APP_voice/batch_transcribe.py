@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Batch transcription of recorded audio (emergency calls, training material).
+
+Every file is transcribed in full with continuous recognition, several
+files run at once on a bounded worker pool, and one NDJSON line is
+written per file as soon as it completes.
+
+Examples:
+    python batch_transcribe.py recordings/ --workers 8 > transcripts.ndjson
+    python batch_transcribe.py call1.wav call2.wav --language ar-SA --output out.ndjson
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from audio_formats import DEFAULT_SAMPLE_RATE, detect_stream_format
+
+CHUNK_SIZE = 32 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def expand_inputs(inputs: Iterable[str], pattern: str = "*.wav", recursive: bool = False) -> List[str]:
+    """
+    Turn file and directory arguments into a sorted list of audio files.
+
+    Args:
+        inputs (Iterable[str]): Files and/or directories
+        pattern (str): Glob pattern for files inside directories
+        recursive (bool): Also search subdirectories
+
+    Returns:
+        list: Audio file paths, without duplicates
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            search = os.path.join(item, "**", pattern) if recursive else os.path.join(item, pattern)
+            paths.extend(sorted(glob.glob(search, recursive=recursive)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(paths))
+
+
+def _new_result(name: str) -> Dict[str, Any]:
+    """Result of one file before transcription; every NDJSON line has these fields."""
+    return {
+        "file": name,
+        "text": None,
+        "segments": [],
+        "audio_seconds": 0.0,
+        "elapsed_seconds": None,
+        "first_result_seconds": None,
+        "realtime_factor": None,
+        "error": None,
+    }
+
+
+def transcribe_audio(stt, audio: BinaryIO, name: str, language: Optional[str] = None,
+                     sample_rate: int = DEFAULT_SAMPLE_RATE, timeout: float = 600.0) -> Dict[str, Any]:
+    """
+    Transcribe one recording from start to end.
+
+    Unlike recognize_once(), every utterance in the file is kept.
+
+    Args:
+        stt (SpeechToTextBackend): Backend creating the push-stream recognition
+        audio (BinaryIO): WAV or raw 16-bit mono PCM, read in chunks
+        name (str): File name reported in the result
+        language (str, optional): Recognition language, defaults to the backend's language
+        sample_rate (int): Sample rate for raw PCM input
+        timeout (float): Seconds to wait for results after the last chunk
+
+    Returns:
+        dict: file, text, segments, audio_seconds, elapsed_seconds,
+            first_result_seconds, realtime_factor and error (None on success)
+    """
+    started = time.perf_counter()
+    first_result = []
+    result = _new_result(name)
+
+    def on_recognized(text: str):
+        if not first_result:
+            first_result.append(time.perf_counter() - started)
+
+    recognition = None
+    try:
+        header = audio.read(CHUNK_SIZE)
+        stream_format = detect_stream_format(header, sample_rate)
+        if stream_format is None:
+            raise ValueError("File too short or not WAV/PCM audio")
+        rate, bits, channels, data_offset = stream_format
+
+        recognition = stt.create_push_recognition(
+            language, sample_rate=rate, bits_per_sample=bits, channels=channels,
+            on_recognized=on_recognized
+        )
+        recognition.start()
+
+        audio_bytes = 0
+        chunk = header[data_offset:]
+        while chunk:
+            recognition.write(chunk)
+            audio_bytes += len(chunk)
+            chunk = audio.read(CHUNK_SIZE)
+
+        recognition.close()
+        result["text"] = recognition.wait(timeout)
+        result["segments"] = list(recognition.results)
+        result["error"] = recognition.error
+        result["audio_seconds"] = round(audio_bytes / (rate * bits // 8 * channels), 2)
+
+    except Exception as e:
+        logger.error(f"Error transcribing {name}: {str(e)}")
+        result["error"] = str(e)
+    finally:
+        # Also covers a wait() that timed out and an interrupted batch (e.g. client disconnect)
+        if recognition is not None and not recognition.finished:
+            recognition.stop()
+
+    elapsed = time.perf_counter() - started
+    result["elapsed_seconds"] = round(elapsed, 3)
+    if first_result:
+        result["first_result_seconds"] = round(first_result[0], 3)
+    if result["audio_seconds"]:
+        result["realtime_factor"] = round(elapsed / result["audio_seconds"], 3)
+    return result
+
+
+def transcribe_file(stt, path: str, language: Optional[str] = None,
+                    timeout: float = 600.0) -> Dict[str, Any]:
+    """
+    Transcribe one audio file from disk.
+
+    Args:
+        stt (SpeechToTextBackend): Backend creating the push-stream recognition
+        path (str): WAV (or raw PCM) file
+        language (str, optional): Recognition language
+        timeout (float): Seconds to wait for results after the last chunk
+
+    Returns:
+        dict: Result as described in transcribe_audio()
+    """
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as audio:
+            return transcribe_audio(stt, audio, path, language=language, timeout=timeout)
+    except OSError as e:
+        logger.error(f"Cannot read {path}: {str(e)}")
+        result = _new_result(path)
+        result["error"] = str(e)
+        result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+
+def iter_batch(stt, sources: Iterable, transcribe, workers: int = 4) -> Iterator[Dict[str, Any]]:
+    """
+    Run transcribe(stt, source) for many sources and yield results as they finish.
+
+    At most `workers` recognitions run at once and no more than that are
+    queued, so a directory of thousands of files does not open thousands
+    of recognizers or hold their results in memory.
+
+    Args:
+        stt (SpeechToTextBackend): Backend passed to transcribe
+        sources (Iterable): Paths or other inputs understood by transcribe
+        transcribe (Callable): transcribe(stt, source) -> result dict
+        workers (int): Concurrent transcriptions
+
+    Yields:
+        dict: One result per source, in completion order
+    """
+    workers = max(1, workers)
+    sources = iter(sources)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-stt") as executor:
+        pending = set()
+        try:
+            for source in sources:
+                pending.add(executor.submit(transcribe, stt, source))
+                if len(pending) >= workers:
+                    break
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    source = next(sources, None)
+                    if source is not None:
+                        pending.add(executor.submit(transcribe, stt, source))
+        finally:
+            # Closed early (e.g. the client left): skip queued files; leaving the
+            # executor still waits for the ones already transcribing
+            for future in pending:
+                future.cancel()
+
+
+def transcribe_files(stt, paths: Iterable[str], language: Optional[str] = None,
+                     workers: int = 4, timeout: float = 600.0) -> Iterator[Dict[str, Any]]:
+    """
+    Transcribe many files concurrently.
+
+    Args:
+        stt (SpeechToTextBackend): Backend creating the push-stream recognitions
+        paths (Iterable[str]): Audio files
+        language (str, optional): Recognition language
+        workers (int): Concurrent transcriptions
+        timeout (float): Per-file seconds to wait for results after the last chunk
+
+    Yields:
+        dict: One result per file, in completion order
+    """
+    return iter_batch(
+        stt, paths,
+        lambda stt, path: transcribe_file(stt, path, language=language, timeout=timeout),
+        workers=workers
+    )
+
+
+def to_ndjson(result: Dict[str, Any]) -> str:
+    """Serialize one result as an NDJSON line (Arabic kept readable)."""
+    return json.dumps(result, ensure_ascii=False) + "\n"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Transcribe WAV files in bulk, one NDJSON line per file")
+    parser.add_argument("inputs", nargs="+", help="WAV files and/or directories")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('ATLAS_BATCH_WORKERS', '4')),
+                        help="Files transcribed at once (default: ATLAS_BATCH_WORKERS or 4)")
+    parser.add_argument("--language", default="ar-MA", help="Recognition language")
+    parser.add_argument("--pattern", default="*.wav", help="File pattern inside directories")
+    parser.add_argument("--recursive", action="store_true", help="Search directories recursively")
+    parser.add_argument("--timeout", type=float, default=600.0,
+                        help="Seconds to wait for results after a file is sent")
+    parser.add_argument("--output", default=None, help="Write NDJSON to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    from speech_backends import create_speech_backend_from_env
+    backend = create_speech_backend_from_env()
+    if backend is None:
+        return 1
+
+    paths = expand_inputs(args.inputs, pattern=args.pattern, recursive=args.recursive)
+    if not paths:
+        print("No audio files found", file=sys.stderr)
+        return 1
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    failed = 0
+    audio_seconds = 0.0
+    try:
+        for result in transcribe_files(backend.stt, paths, language=args.language,
+                                       workers=args.workers, timeout=args.timeout):
+            output.write(to_ndjson(result))
+            output.flush()
+            failed += result["error"] is not None
+            audio_seconds += result.get("audio_seconds") or 0.0
+    finally:
+        if args.output:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Transcribed {len(paths)} file(s), {failed} failed, {audio_seconds:.0f}s of audio "
+          f"in {elapsed:.1f}s with {args.workers} worker(s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
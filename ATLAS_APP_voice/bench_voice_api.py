@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Load-testing benchmark for the Flask voice API.
+
+Starts flask_voice_api in-process on a threaded WSGI server (against the
+offline fake speech backend by default) and drives each endpoint at a
+fixed concurrency (closed loop) or a fixed arrival rate (open loop).
+Reports latency percentiles, throughput, error rate, peak RSS and thread
+count, and writes them as JSON so runs can be compared across commits.
+
+Examples:
+    python bench_voice_api.py --duration 20 --concurrency 16
+    python bench_voice_api.py --endpoints tts-file --rate 50 --output bench.json
+    python bench_voice_api.py --url http://localhost:5000 --endpoints health
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Sample bot responses of varying length (short confirmations to multi-sentence advice)
+BOT_RESPONSES = [
+    "واخا، غادي نعاونك دابا.",
+    "حط الجرح تحت الما البارد لمدة عشر دقايق، وما تحطش عليه الدهن ولا المعجون.",
+    "ضغط مزيان على الجرح بثوب نقي. إلا ما وقفش الدم من بعد عشر دقايق، عيط على الإسعاف فالحين.",
+    "إلا كان الشخص ما كيتنفسش، عيط على 15 وبدا الضغطات على الصدر. دير ثلاثين ضغطة من بعدها جوج نفخات، وعاود حتى توصل الإسعاف.",
+    "شنو وقع بالضبط؟",
+]
+
+ENDPOINTS = ["health", "tts-file", "stt", "voice-conversation"]
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """
+    Linear-interpolated percentile of an already sorted list.
+
+    Args:
+        sorted_values (list): Values in ascending order
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float: Percentile value or None for an empty list
+    """
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceSampler:
+    """Background sampler of RSS and thread count for the benchmarked process."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_rss_bytes = None
+        self.peak_threads = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+
+    def _sample(self):
+        rss = current_rss_bytes()
+        if rss is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._sample()
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop_event.set()
+        self._thread.join()
+        self._sample()
+        return {"peak_rss_bytes": self.peak_rss_bytes, "peak_threads": self.peak_threads}
+
+
+def wav_upload(seconds: float = 3.0) -> bytes:
+    """Build a WAV recording to upload to /speech-to-text."""
+    from fake_speech import render_pcm
+    from audio_formats import pcm_to_wav
+    # ~14 characters per second of speech
+    return pcm_to_wav(render_pcm("x" * int(seconds * 14)))
+
+
+def build_request(endpoint: str, base_url: str, sequence: int, unique_text: bool,
+                  upload: bytes) -> urllib.request.Request:
+    """
+    Build the HTTP request for one call of an endpoint.
+
+    Args:
+        endpoint (str): Benchmark endpoint name from ENDPOINTS
+        base_url (str): Server base URL
+        sequence (int): Request number, used to vary the text
+        unique_text (bool): Make every text unique so the audio cache never hits
+        upload (bytes): WAV body for speech-to-text
+
+    Returns:
+        Request: Ready-to-send request
+    """
+    if endpoint == "health":
+        return urllib.request.Request(f"{base_url}/health")
+
+    if endpoint == "stt":
+        return urllib.request.Request(
+            f"{base_url}/speech-to-text?language=ar-MA",
+            data=upload,
+            headers={"Content-Type": "audio/wav"}
+        )
+
+    text = BOT_RESPONSES[sequence % len(BOT_RESPONSES)]
+    if unique_text:
+        text = f"{text} ({sequence})"
+
+    if endpoint == "tts-file":
+        path, payload = "/text-to-speech-file", {"text": text, "voice": "ar-MA-MounaNeural", "format": "wav"}
+    elif endpoint == "voice-conversation":
+        path, payload = "/voice-conversation", {"bot_response": text}
+    else:
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    return urllib.request.Request(
+        f"{base_url}{path}",
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+
+
+def send(request: urllib.request.Request, timeout: float) -> Tuple[int, int]:
+    """
+    Send a request and read the whole response.
+
+    Returns:
+        tuple: (HTTP status or 0 for transport errors, response bytes)
+    """
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, len(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, len(e.read() or b"")
+    except OSError:
+        return 0, 0
+
+
+def run_endpoint(endpoint: str, base_url: str, args, upload: bytes) -> Dict[str, Any]:
+    """
+    Drive one endpoint for the configured duration and summarize the results.
+
+    With --rate, arrivals follow a Poisson process and latency is measured
+    from each request's scheduled start, so time spent queued behind busy
+    workers counts (no coordinated omission). Otherwise every worker sends
+    requests back to back.
+
+    Returns:
+        dict: Request/error counts, throughput, latency percentiles and status codes
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    bytes_received = 0
+    lock = threading.Lock()
+    sequence = iter(range(sys.maxsize))
+
+    def record(started: float, status: int, size: int):
+        nonlocal bytes_received
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+            bytes_received += size
+
+    def call(scheduled: Optional[float] = None):
+        started = scheduled if scheduled is not None else time.perf_counter()
+        request = build_request(endpoint, base_url, next(sequence), args.unique_text, upload)
+        status, size = send(request, args.timeout)
+        record(started, status, size)
+
+    began = time.perf_counter()
+    deadline = began + args.duration
+
+    if args.rate:
+        # Open loop: schedule arrivals independently of response times
+        rng = random.Random(args.seed)
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="bench") as executor:
+            next_arrival = began
+            while next_arrival < deadline:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(call, next_arrival)
+                next_arrival += rng.expovariate(args.rate)
+    else:
+        # Closed loop: each worker keeps exactly one request in flight
+        def worker():
+            while time.perf_counter() < deadline:
+                call()
+
+        threads = [threading.Thread(target=worker, name=f"bench-{i}") for i in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    wall_seconds = time.perf_counter() - began
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status == 0 or status >= 400)
+    total = len(latencies)
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / wall_seconds if wall_seconds else 0.0,
+        "wall_seconds": wall_seconds,
+        "bytes_received": bytes_received,
+        "latency_ms": {
+            "p50": _ms(percentile(latencies, 50)),
+            "p95": _ms(percentile(latencies, 95)),
+            "p99": _ms(percentile(latencies, 99)),
+            "mean": _ms(sum(latencies) / total) if total else None,
+            "max": _ms(latencies[-1]) if total else None,
+        },
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def start_in_process_server() -> Tuple[str, Callable[[], None]]:
+    """
+    Start flask_voice_api on a threaded WSGI server on a free local port.
+
+    Returns:
+        tuple: (base URL, shutdown function)
+    """
+    from werkzeug.serving import make_server
+    import flask_voice_api
+
+    if not flask_voice_api.initialize_voice_service():
+        raise RuntimeError("Voice service failed to initialize")
+
+    server = make_server("127.0.0.1", 0, flask_voice_api.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="bench-server", daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def git_commit() -> Optional[str]:
+    """Current commit hash, if the benchmark runs inside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args):
+    """Point the in-process server at the selected backend with isolated state."""
+    os.environ.setdefault("ATLAS_SPEECH_BACKEND", args.backend)
+    if args.no_cache:
+        os.environ["ATLAS_TTS_CACHE"] = "0"
+    # Keep benchmark runs from touching the real cache, phrase stats and warm-up
+    os.environ.setdefault("ATLAS_TTS_CACHE_DIR", tempfile.mkdtemp(prefix="atlas_bench_cache_"))
+    os.environ.setdefault("ATLAS_PHRASE_STATS_FILE", "")
+    os.environ.setdefault("ATLAS_WARMUP_TOP_N", "0")
+    os.environ.setdefault("ATLAS_SPEECH_POOL_SIZE", str(args.concurrency))
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark the voice API under concurrent load")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS,
+                        help="Endpoints to benchmark, one after another")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent clients (closed loop) or maximum in-flight requests (with --rate)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Open-loop arrival rate in requests per second (Poisson)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--unique-text", action="store_true",
+                        help="Make every TTS text unique so the audio cache never hits")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the TTS audio cache")
+    parser.add_argument("--backend", choices=["fake", "azure"], default="fake",
+                        help="Speech backend for the in-process server (default: fake)")
+    parser.add_argument("--url", default=None,
+                        help="Benchmark an already running server instead of starting one in-process")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for arrival times")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark and report results"""
+    args = parse_args()
+
+    shutdown = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        configure_environment(args)
+        base_url, shutdown = start_in_process_server()
+
+    upload = wav_upload()
+    sampler = ResourceSampler()
+    sampler.start()
+
+    results = {}
+    try:
+        for endpoint in args.endpoints:
+            print(f"⏱️  {endpoint}: {args.duration:.0f}s at "
+                  f"{f'{args.rate:g} req/s' if args.rate else f'concurrency {args.concurrency}'}...")
+            results[endpoint] = run_endpoint(endpoint, base_url, args, upload)
+    finally:
+        process = sampler.stop()
+        if shutdown:
+            shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "in_process": not args.url,
+            "backend": os.getenv("ATLAS_SPEECH_BACKEND") if not args.url else None,
+            "args": vars(args),
+        },
+        # RSS and threads describe the server only when it runs in-process
+        "process": process if not args.url else None,
+        "results": results,
+    }
+
+    print(f"\n{'endpoint':<20}{'req':>7}{'err%':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, result in results.items():
+        latency = result["latency_ms"]
+        print(f"{endpoint:<20}{result['requests']:>7}{result['error_rate'] * 100:>7.1f}"
+              f"{result['throughput_rps']:>9.1f}{latency['p50'] or 0:>10.1f}"
+              f"{latency['p95'] or 0:>10.1f}{latency['p99'] or 0:>10.1f}")
+    if report["process"]:
+        rss = process["peak_rss_bytes"]
+        print(f"\nPeak RSS: {rss / 1e6:.1f} MB" if rss else "\nPeak RSS: n/a")
+        print(f"Peak threads: {process['peak_threads']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
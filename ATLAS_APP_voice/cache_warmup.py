@@ -0,0 +1,176 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Iterable, Optional, Tuple
+
+from tts_cache import AudioCache, make_cache_key
+
+
+class CacheWarmer:
+    """
+    Re-synthesizes popular phrases into the audio cache after a restart.
+
+    Work runs on a bounded thread pool in the background and stops taking
+    new phrases once the time budget is spent, so warm-up never delays the
+    server indefinitely.
+    """
+
+    def __init__(self, synthesize: Callable[[str, str, str], Optional[bytes]],
+                 audio_cache: AudioCache, max_workers: int = 4, time_budget: float = 30.0):
+        """
+        Initialize the warmer.
+
+        Args:
+            synthesize (Callable): synthesize(text, voice, output_format) -> audio bytes or None
+            audio_cache (AudioCache): Cache to fill
+            max_workers (int): Concurrent syntheses
+            time_budget (float): Seconds after which no new phrases are started
+        """
+        self.synthesize = synthesize
+        self.audio_cache = audio_cache
+        self.max_workers = max(1, max_workers)
+        self.time_budget = time_budget
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._done = threading.Event()
+        self.progress = {
+            "total": 0,
+            "warmed": 0,
+            "already_cached": 0,
+            "failed": 0,
+            "skipped_budget": 0,
+            "started_at": None,
+            "elapsed_seconds": 0.0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def start(self, entries: Iterable[Tuple[str, str, str, int]]):
+        """
+        Start warming in the background.
+
+        Args:
+            entries (Iterable): (text, voice, output format, count) tuples, hottest first
+        """
+        entries = list(entries)
+        with self._lock:
+            self.progress["total"] = len(entries)
+            self.progress["started_at"] = time.time()
+
+        if not entries:
+            self._done.set()
+            return
+
+        self._thread = threading.Thread(target=self._run, args=(entries,), name="cache-warmup", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Warming audio cache with {len(entries)} popular phrases")
+
+    def _warm_one(self, text: str, voice: str, output_format: str) -> str:
+        key = make_cache_key(text, voice, output_format)
+        if self.audio_cache.get(key) is not None:
+            return "already_cached"
+        audio = self.synthesize(text, voice, output_format)
+        if not audio:
+            return "failed"
+        self.audio_cache.put(key, audio)
+        return "warmed"
+
+    def _run(self, entries):
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        pending = set()
+        remaining = iter(entries)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="warmup") as executor:
+            while True:
+                # Keep the pool full while there is budget left
+                while len(pending) < self.max_workers and time.monotonic() < deadline:
+                    entry = next(remaining, None)
+                    if entry is None:
+                        break
+                    text, voice, output_format = entry[:3]
+                    pending.add(executor.submit(self._warm_one, text, voice, output_format))
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()) or None,
+                                     return_when=FIRST_COMPLETED)
+                with self._lock:
+                    for future in done:
+                        try:
+                            outcome = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Warm-up synthesis error: {e}")
+                            outcome = "failed"
+                        self.progress[outcome] += 1
+                    self.progress["elapsed_seconds"] = time.monotonic() - started
+
+        with self._lock:
+            self.progress["skipped_budget"] = sum(1 for _ in remaining)
+            self.progress["elapsed_seconds"] = time.monotonic() - started
+            progress = dict(self.progress)
+        self._done.set()
+
+        self.logger.info(
+            f"Cache warm-up finished in {progress['elapsed_seconds']:.1f}s: "
+            f"{progress['warmed']} warmed, {progress['already_cached']} already cached, "
+            f"{progress['failed']} failed, {progress['skipped_budget']} skipped (time budget)"
+        )
+
+    @property
+    def done(self) -> bool:
+        """True once warm-up finished or ran out of budget."""
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until warm-up is done.
+
+        Returns:
+            bool: True if warm-up finished within the timeout
+        """
+        return self._done.wait(timeout)
+
+    def get_progress(self) -> Dict[str, Any]:
+        """
+        Get warm-up progress.
+
+        Returns:
+            dict: Counters, elapsed time and completion flag
+        """
+        with self._lock:
+            progress = dict(self.progress)
+        progress["done"] = self.done
+        progress["completed"] = progress["warmed"] + progress["already_cached"] + progress["failed"]
+        return progress
+
+
+def start_cache_warmup_from_env(synthesize: Callable[[str, str, str], Optional[bytes]],
+                                audio_cache: AudioCache,
+                                phrase_tracker) -> CacheWarmer:
+    """
+    Start warming the cache with the hottest phrases, configured from the environment.
+
+    Optional environment variables:
+    - ATLAS_WARMUP_TOP_N: Phrases to warm (default: 200, 0 disables warm-up)
+    - ATLAS_WARMUP_WORKERS: Concurrent syntheses (default: 4)
+    - ATLAS_WARMUP_BUDGET: Time budget in seconds (default: 30)
+
+    Returns:
+        CacheWarmer: Running (or already finished) warmer
+    """
+    top_n = int(os.getenv('ATLAS_WARMUP_TOP_N', '200'))
+    warmer = CacheWarmer(
+        synthesize,
+        audio_cache,
+        max_workers=int(os.getenv('ATLAS_WARMUP_WORKERS', '4')),
+        time_budget=float(os.getenv('ATLAS_WARMUP_BUDGET', '30'))
+    )
+    warmer.start(phrase_tracker.top(top_n) if top_n > 0 else [])
+    return warmer
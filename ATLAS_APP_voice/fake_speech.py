@@ -0,0 +1,554 @@
+import os
+import math
+import time
+import array
+import random
+import logging
+import threading
+import zlib
+from typing import Callable, Iterator, List, Optional
+
+from speech_pool import SpeechObjectPool
+from speech_backends import SpeechBackend, TextToSpeechBackend, SpeechToTextBackend
+from audio_formats import (
+    DEFAULT_OUTPUT_FORMAT, DEFAULT_SAMPLE_RATE, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS,
+    get_output_format, pcm_to_wav
+)
+
+# Questions a user of the first aid assistant typically asks (Darija)
+FAKE_TRANSCRIPTS = [
+    "شنو ندير إلا شي واحد تحرق؟",
+    "كيفاش نوقف النزيف ديال الجرح؟",
+    "واحد طاح وما كيتنفسش، شنو ندير؟",
+    "ولدي بلع شي حاجة وكيتخنق",
+    "كيفاش نعرف واش عندو كسر فاليد؟",
+    "شنو ندير فحالة لدغة العقرب؟",
+]
+
+# Approximate encoded size of one second of speech for non-PCM formats
+ENCODED_BYTES_PER_SECOND = {
+    "mp3": 4000,
+    "opus": 2000,
+}
+
+# Leading bytes so clients sniffing the container see the expected type
+ENCODED_MAGIC = {
+    "mp3": b"ID3",
+    "opus": b"OggS",
+}
+
+
+class FakeSpeechConditions:
+    """
+    Simulated service latency, jitter and failure rate shared by the fakes.
+
+    A single seeded random generator drives jitter and failures, so a run
+    with the same seed and request order sees the same delays and errors.
+    """
+
+    def __init__(self, latency: float = 0.15, jitter: float = 0.05, error_rate: float = 0.0,
+                 realtime_factor: float = 0.05, time_scale: float = 1.0, seed: int = 0):
+        """
+        Initialize simulated conditions.
+
+        Args:
+            latency (float): Seconds before the first audio or result
+            jitter (float): Maximum random deviation from latency in seconds
+            error_rate (float): Probability (0-1) that an operation fails
+            realtime_factor (float): Synthesis seconds per second of produced audio
+            time_scale (float): Multiplier for every simulated wait (0 disables waiting)
+            seed (int): Seed for jitter and failures
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.realtime_factor = realtime_factor
+        self.time_scale = time_scale
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds: float):
+        """Wait for a simulated duration, scaled by time_scale."""
+        seconds *= self.time_scale
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait_for_service(self, extra: float = 0.0):
+        """
+        Wait for one simulated service round trip.
+
+        Args:
+            extra (float): Additional work time on top of the jittered latency
+        """
+        with self._lock:
+            deviation = self._random.uniform(-self.jitter, self.jitter)
+        self.sleep(max(0.0, self.latency + deviation) + extra)
+
+    def should_fail(self) -> bool:
+        """Draw whether the current operation fails."""
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def speech_duration(text: str, chars_per_second: float = 14.0) -> float:
+    """
+    Estimate how long text takes to speak.
+
+    Args:
+        text (str): Text to speak
+        chars_per_second (float): Speaking rate
+
+    Returns:
+        float: Duration in seconds (at least half a second)
+    """
+    return max(0.5, len(text) / chars_per_second)
+
+
+def render_pcm(text: str, sample_rate: int = DEFAULT_SAMPLE_RATE,
+               chars_per_second: float = 14.0) -> bytes:
+    """
+    Render a deterministic tone standing in for speech.
+
+    The pitch is derived from the text so different phrases produce
+    different audio, and the length follows speech_duration(). One period
+    is computed and repeated, which keeps rendering cheap under load.
+
+    Args:
+        text (str): Text being "spoken"
+        sample_rate (int): Output sample rate
+        chars_per_second (float): Speaking rate
+
+    Returns:
+        bytes: 16-bit mono little-endian PCM
+    """
+    checksum = zlib.crc32(text.encode('utf-8'))
+    frequency = 150 + checksum % 150
+    period = max(2, round(sample_rate / frequency))
+
+    cycle = array.array('h', (
+        int(8000 * math.sin(2 * math.pi * i / period)) for i in range(period)
+    ))
+    total_samples = int(speech_duration(text, chars_per_second) * sample_rate)
+    samples = cycle * (total_samples // period + 1)
+    return samples.tobytes()[:total_samples * 2]
+
+
+def render_audio(text: str, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                 chars_per_second: float = 14.0, streaming: bool = False) -> bytes:
+    """
+    Render deterministic audio of realistic size for an output format.
+
+    WAV formats get real PCM (with a RIFF header unless streaming, matching
+    what Azure returns). Compressed formats get filler bytes of the size an
+    encoder would produce; they are not decodable.
+
+    Args:
+        text (str): Text being "spoken"
+        output_format (str): Output format name from audio_formats.OUTPUT_FORMATS
+        chars_per_second (float): Speaking rate
+        streaming (bool): Return headerless PCM for WAV formats
+
+    Returns:
+        bytes: Audio data
+    """
+    audio_format = get_output_format(output_format)
+    if audio_format.is_pcm:
+        pcm = render_pcm(text, audio_format.sample_rate, chars_per_second)
+        return pcm if streaming else pcm_to_wav(pcm, audio_format.sample_rate)
+
+    size = int(speech_duration(text, chars_per_second) * ENCODED_BYTES_PER_SECOND.get(audio_format.name, 4000))
+    magic = ENCODED_MAGIC.get(audio_format.name, b"")
+    filler = zlib.crc32(text.encode('utf-8')).to_bytes(4, 'little')
+    return (magic + filler * (size // 4 + 1))[:size]
+
+
+class FakeTextToSpeech(TextToSpeechBackend):
+    """
+    Offline stand-in for AzureTextToSpeech.
+
+    Produces deterministic audio after a simulated service delay, so the API
+    can be load tested without network access, speakers or credentials.
+    """
+
+    def __init__(self, conditions: FakeSpeechConditions, pool_size: int = 4,
+                 chars_per_second: float = 14.0):
+        """
+        Initialize the fake TTS.
+
+        Args:
+            conditions (FakeSpeechConditions): Simulated latency and failures
+            pool_size (int): Fake synthesizers kept per (voice, output format)
+            chars_per_second (float): Speaking rate used for audio length
+        """
+        self.conditions = conditions
+        self.chars_per_second = chars_per_second
+        self.voice_name = "ar-MA-JamalNeural"
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        # Same pool as the Azure backend, so contention shows up in /pool-stats
+        self.synthesizer_pool = SpeechObjectPool(
+            lambda key: key,
+            max_size=pool_size,
+            name="synthesizer"
+        )
+
+    def check_connection(self, timeout: float = 5.0):
+        """
+        Simulate a connection check, failing at the configured error rate.
+
+        Args:
+            timeout (float): Unused, the simulated delay is always short
+        """
+        self.conditions.wait_for_service()
+        if self.conditions.should_fail():
+            raise ConnectionError("Simulated speech service outage")
+
+    def set_voice(self, voice_name: str):
+        """
+        Set the default voice.
+
+        Args:
+            voice_name (str): Voice name
+        """
+        self.voice_name = voice_name
+        self.logger.info(f"Voice set to: {voice_name}")
+
+    def pool_key(self, voice: Optional[str] = None, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                 streaming: bool = False) -> tuple:
+        """
+        Get the synthesizer pool key for a voice and output format.
+
+        Returns:
+            tuple: (voice name, SDK output format name)
+        """
+        audio_format = get_output_format(output_format)
+        return (
+            voice or self.voice_name,
+            audio_format.stream_sdk_format if streaming else audio_format.sdk_format
+        )
+
+    def _synthesis_failed(self, text: str) -> bool:
+        if self.conditions.should_fail():
+            self.logger.error(f"Speech synthesis canceled: simulated error for text: '{text[:50]}...'")
+            return True
+        return False
+
+    def speak_text(self, text: str, voice: Optional[str] = None) -> bool:
+        """
+        Pretend to play text through speakers (waits for the audio duration).
+
+        Returns:
+            bool: True if successful, False on a simulated error
+        """
+        return self.speak_segments([text], voice)
+
+    def speak_segments(self, segments: List[str], voice: Optional[str] = None) -> bool:
+        """
+        Pretend to play segments back to back.
+
+        Returns:
+            bool: True if every segment was spoken, False on a simulated error
+        """
+        for segment in segments:
+            self.conditions.wait_for_service()
+            if self._synthesis_failed(segment):
+                return False
+            self.conditions.sleep(speech_duration(segment, self.chars_per_second))
+        return True
+
+    def text_to_audio_file(self, text: str, output_file: str) -> bool:
+        """
+        Write fake WAV audio for text to a file.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        audio = self.synthesize_to_bytes(text)
+        if audio is None:
+            return False
+        try:
+            with open(output_file, 'wb') as f:
+                f.write(audio)
+            return True
+        except OSError as e:
+            self.logger.error(f"Error saving audio file: {str(e)}")
+            return False
+
+    def synthesize_to_bytes(self, text: str, voice: Optional[str] = None,
+                            output_format: str = DEFAULT_OUTPUT_FORMAT) -> Optional[bytes]:
+        """
+        Return fake audio for text after a simulated synthesis delay.
+
+        Returns:
+            bytes: Audio data in the requested format or None on a simulated error
+        """
+        key = self.pool_key(voice, output_format)
+        with self.synthesizer_pool.checkout(key):
+            duration = speech_duration(text, self.chars_per_second)
+            self.conditions.wait_for_service(duration * self.conditions.realtime_factor)
+            if self._synthesis_failed(text):
+                return None
+            return render_audio(text, output_format, self.chars_per_second)
+
+    def stream_text(self, text: str, chunk_size: int = 4096,
+                    voice: Optional[str] = None,
+                    output_format: str = DEFAULT_OUTPUT_FORMAT) -> Iterator[bytes]:
+        """
+        Yield fake audio chunks at the pace a streaming synthesis would.
+
+        Yields:
+            bytes: Raw PCM chunks for WAV formats (no header), filler frames otherwise
+        """
+        key = self.pool_key(voice, output_format, streaming=True)
+        with self.synthesizer_pool.checkout(key):
+            self.conditions.wait_for_service()
+            if self._synthesis_failed(text):
+                return
+
+            audio = render_audio(text, output_format, self.chars_per_second, streaming=True)
+            chunk_count = max(1, math.ceil(len(audio) / chunk_size))
+            chunk_delay = (speech_duration(text, self.chars_per_second)
+                           * self.conditions.realtime_factor / chunk_count)
+            for offset in range(0, len(audio), chunk_size):
+                if offset:
+                    self.conditions.sleep(chunk_delay)
+                yield audio[offset:offset + chunk_size]
+
+
+class FakePushRecognition:
+    """
+    Offline stand-in for PushStreamRecognition.
+
+    Accepts pushed audio and, once the stream is closed, reports a canned
+    transcript chosen from a checksum of the audio, so the same upload
+    always yields the same text.
+    """
+
+    def __init__(self, conditions: FakeSpeechConditions, transcripts: List[str],
+                 on_recognized: Optional[Callable[[str], None]] = None,
+                 on_recognizing: Optional[Callable[[str], None]] = None,
+                 on_stopped: Optional[Callable[[], None]] = None):
+        self.conditions = conditions
+        self.transcripts = transcripts
+        self.on_recognized = on_recognized
+        self.on_recognizing = on_recognizing
+        self.on_stopped = on_stopped
+
+        self.results: List[str] = []
+        self.error: Optional[str] = None
+        self.bytes_written = 0
+        self._checksum = 0
+        self._stopped = threading.Event()
+        self._started = False
+        self._closed = False
+
+        self.logger = logging.getLogger(__name__)
+
+    def start(self, wait: bool = True):
+        """Start the session; audio may be written before or after this call."""
+        self._started = True
+
+    def write(self, chunk: bytes):
+        """
+        Push a chunk of PCM audio.
+
+        Args:
+            chunk (bytes): Raw PCM samples
+        """
+        if chunk and not self._closed:
+            self._checksum = zlib.crc32(chunk, self._checksum)
+            self.bytes_written += len(chunk)
+
+    def close(self):
+        """Signal end of audio; results arrive after the simulated latency."""
+        if not self._closed:
+            self._closed = True
+            threading.Thread(target=self._finish, name="fake-recognition", daemon=True).start()
+
+    def _finish(self):
+        self.conditions.wait_for_service()
+        if self._stopped.is_set():
+            return
+
+        if self.conditions.should_fail():
+            self.error = "Simulated recognition error"
+            self.logger.error(f"Recognition canceled: {self.error}")
+        elif self.bytes_written:
+            text = self.transcripts[self._checksum % len(self.transcripts)]
+            if self.on_recognizing:
+                self.on_recognizing(text.split()[0])
+            self.results.append(text)
+            if self.on_recognized:
+                self.on_recognized(text)
+        self._mark_stopped()
+
+    def _mark_stopped(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            if self.on_stopped:
+                self.on_stopped()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for the session to finish.
+
+        Returns:
+            str: All final results joined by spaces, or None if nothing was recognized
+        """
+        if not self._stopped.wait(timeout):
+            self.logger.warning("Timed out waiting for push-stream recognition to finish")
+        self.stop()
+        return " ".join(self.results) if self.results else None
+
+    def stop(self, wait: bool = True):
+        """Stop the session immediately."""
+        self._closed = True
+        if self._started:
+            self._started = False
+            self._mark_stopped()
+
+    @property
+    def finished(self) -> bool:
+        """True once the session has ended."""
+        return self._stopped.is_set()
+
+
+class FakeSpeechToText(SpeechToTextBackend):
+    """
+    Offline stand-in for AzureSpeechToText.
+
+    Microphone recognition cycles through the canned transcripts; pushed
+    audio maps deterministically to one of them.
+    """
+
+    def __init__(self, conditions: FakeSpeechConditions, transcripts: Optional[List[str]] = None,
+                 pool_size: int = 4, utterance_seconds: float = 2.0):
+        """
+        Initialize the fake STT.
+
+        Args:
+            conditions (FakeSpeechConditions): Simulated latency and failures
+            transcripts (list, optional): Canned transcripts, defaults to FAKE_TRANSCRIPTS
+            pool_size (int): Fake recognizers kept per language
+            utterance_seconds (float): Simulated speaking time for microphone recognition
+        """
+        self.conditions = conditions
+        self.transcripts = transcripts or FAKE_TRANSCRIPTS
+        self.utterance_seconds = utterance_seconds
+        self.language = "ar-MA"
+
+        self._next_transcript = 0
+        self._lock = threading.Lock()
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        self.recognizer_pool = SpeechObjectPool(
+            lambda key: key,
+            max_size=pool_size,
+            name="recognizer"
+        )
+
+    def set_language(self, language_code: str):
+        """
+        Set the default recognition language.
+
+        Args:
+            language_code (str): Language code
+        """
+        self.language = language_code
+        self.logger.info(f"Language set to: {language_code}")
+
+    def recognize_once(self, language: Optional[str] = None) -> Optional[str]:
+        """
+        Pretend to listen to the microphone for one utterance.
+
+        Returns:
+            str: Next canned transcript, or None on a simulated error
+        """
+        key = (language or self.language, "microphone")
+        with self.recognizer_pool.checkout(key):
+            self.conditions.sleep(self.utterance_seconds)
+            self.conditions.wait_for_service()
+
+        if self.conditions.should_fail():
+            self.logger.error("Speech recognition canceled: simulated error")
+            return None
+
+        with self._lock:
+            text = self.transcripts[self._next_transcript % len(self.transcripts)]
+            self._next_transcript += 1
+        self.logger.info(f"Recognized: {text}")
+        return text
+
+    def test_microphone(self) -> bool:
+        """The fake microphone always works."""
+        return True
+
+    def create_push_recognition(self, language: Optional[str] = None,
+                                sample_rate: int = DEFAULT_SAMPLE_RATE,
+                                bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+                                channels: int = DEFAULT_CHANNELS,
+                                on_recognized: Optional[Callable[[str], None]] = None,
+                                on_recognizing: Optional[Callable[[str], None]] = None,
+                                on_stopped: Optional[Callable[[], None]] = None
+                                ) -> FakePushRecognition:
+        """
+        Create a fake recognition session that is fed audio by the caller.
+
+        Returns:
+            FakePushRecognition: Session, not yet started
+        """
+        return FakePushRecognition(
+            self.conditions,
+            self.transcripts,
+            on_recognized=on_recognized,
+            on_recognizing=on_recognizing,
+            on_stopped=on_stopped
+        )
+
+
+def create_fake_backend_from_env(pool_size: int = 4) -> SpeechBackend:
+    """
+    Create the offline fake backend from environment variables.
+
+    Optional environment variables:
+    - ATLAS_FAKE_LATENCY: Seconds before the first audio or result (default: 0.15)
+    - ATLAS_FAKE_JITTER: Maximum random deviation from the latency (default: 0.05)
+    - ATLAS_FAKE_ERROR_RATE: Probability that an operation fails (default: 0)
+    - ATLAS_FAKE_TIME_SCALE: Multiplier for all simulated waits, 0 disables them (default: 1)
+    - ATLAS_FAKE_SEED: Seed for jitter and failures (default: 0)
+    - ATLAS_FAKE_TRANSCRIPTS: File with one canned transcript per line
+
+    Args:
+        pool_size (int): Fake synthesizers/recognizers per voice or language
+
+    Returns:
+        SpeechBackend: Fake TTS and STT sharing one set of conditions
+    """
+    conditions = FakeSpeechConditions(
+        latency=float(os.getenv('ATLAS_FAKE_LATENCY', '0.15')),
+        jitter=float(os.getenv('ATLAS_FAKE_JITTER', '0.05')),
+        error_rate=float(os.getenv('ATLAS_FAKE_ERROR_RATE', '0')),
+        time_scale=float(os.getenv('ATLAS_FAKE_TIME_SCALE', '1')),
+        seed=int(os.getenv('ATLAS_FAKE_SEED', '0'))
+    )
+
+    transcripts = None
+    transcripts_file = os.getenv('ATLAS_FAKE_TRANSCRIPTS')
+    if transcripts_file:
+        with open(transcripts_file, 'r', encoding='utf-8') as f:
+            transcripts = [line.strip() for line in f if line.strip()]
+
+    return SpeechBackend(
+        "fake",
+        FakeTextToSpeech(conditions, pool_size=pool_size),
+        FakeSpeechToText(conditions, transcripts, pool_size=pool_size)
+    )
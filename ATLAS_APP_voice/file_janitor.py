@@ -0,0 +1,107 @@
+import os
+import glob
+import logging
+import threading
+import time
+from typing import List, Tuple
+
+
+class FileJanitor:
+    """
+    Single background thread that deletes stale temporary files.
+
+    Files matching a glob pattern in a watched directory (e.g. cache
+    writes interrupted by a crash) are removed once they are old enough.
+    """
+
+    def __init__(self, interval: float = 30.0):
+        """
+        Initialize the janitor.
+
+        Args:
+            interval (float): Seconds between directory sweeps
+        """
+        self.interval = interval
+
+        self._condition = threading.Condition()
+        self._watched: List[Tuple[str, float]] = []
+        self._thread = None
+        self._stopped = False
+
+        self.files_removed = 0
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def watch_directory(self, directory: str, pattern: str, max_age: float):
+        """
+        Periodically delete stale files matching a pattern.
+
+        Args:
+            directory (str): Directory to sweep
+            pattern (str): Glob pattern relative to the directory (e.g. "*/*.tmp")
+            max_age (float): Minimum age in seconds before a file is deleted
+        """
+        with self._condition:
+            self._watched.append((os.path.join(directory, pattern), max_age))
+
+    def start(self):
+        """Start the janitor thread (no-op if already running)."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="file-janitor", daemon=True)
+            self._thread.start()
+        self.logger.info("File janitor started")
+
+    def stop(self):
+        """Stop the janitor thread after a last sweep."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join()
+
+    def sweep(self):
+        """Delete stale files in every watched directory."""
+        with self._condition:
+            watched = list(self._watched)
+
+        now = time.time()
+        for pattern, max_age in watched:
+            for path in glob.glob(pattern):
+                try:
+                    if now - os.path.getmtime(path) >= max_age:
+                        self._remove(path)
+                except OSError:
+                    pass
+
+    def _remove(self, path: str):
+        try:
+            os.unlink(path)
+            self.files_removed += 1
+            self.logger.info(f"Cleaned up temp file: {path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Could not remove {path}: {e}")
+
+    def _run(self):
+        next_sweep = time.monotonic()
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                if not self._stopped and now < next_sweep:
+                    self._condition.wait(next_sweep - now)
+                    continue
+                stopped = self._stopped
+
+            self.sweep()
+            next_sweep = time.monotonic() + self.interval
+
+            if stopped:
+                return
@@ -0,0 +1,449 @@
+import os
+import re
+import glob
+import json
+import math
+import heapq
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from arabic_text import STEM_SIMILARITY, NGramIndex, tokenize
+from retrieval_cache import create_retrieval_cache_from_env
+
+# A line of underscores separates the chapters of FirstAidInfo.txt
+CHAPTER_SEPARATOR = re.compile(r"^\s*_{5,}\s*$", re.MULTILINE)
+
+# JSON fields that hold presentation data rather than first-aid content
+SKIPPED_FIELDS = ("id", "icon", "color", "image")
+
+# Spoken labels for topic sections that carry no "title" of their own; other
+# untitled sections are titled by the topic alone so raw JSON keys never reach a caller
+SECTION_TITLES = {
+    "warnings": "تحذيرات",
+    "warning": "تحذير مهم",
+    "steps": "الخطوات",
+    "assessment": "التقييم الأولي",
+    "emergency_call": "متى تتصل بالإسعاف",
+}
+
+# Vocabulary terms an unknown query term may be replaced by
+FUZZY_MATCHES = 3
+
+# How many times title terms are counted against content terms
+TITLE_WEIGHT = 2
+
+
+class KnowledgeChunk:
+    """One retrievable passage: a chapter of the guide or a section of a topic file."""
+
+    def __init__(self, chunk_id: str, title: str, content: str, source: str):
+        self.id = chunk_id
+        self.title = title
+        self.content = content
+        self.source = source
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "title": self.title, "content": self.content, "source": self.source}
+
+
+def chunk_terms(chunk: KnowledgeChunk) -> Counter:
+    """
+    Count the index terms of a chunk, title terms weighted by TITLE_WEIGHT.
+
+    Args:
+        chunk (KnowledgeChunk): Passage to tokenize
+
+    Returns:
+        Counter: term -> frequency
+    """
+    return Counter(tokenize(chunk.title) * TITLE_WEIGHT + tokenize(chunk.content))
+
+
+def load_first_aid_text(path: str, text: Optional[str] = None) -> List[KnowledgeChunk]:
+    """
+    Split the Darija first-aid guide into one chunk per chapter.
+
+    Args:
+        path (str): FirstAidInfo.txt
+        text (str, optional): Contents already read from path
+
+    Returns:
+        list: Chunks titled by the chapter's first line
+    """
+    if text is None:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+
+    chunks = []
+    for index, chapter in enumerate(CHAPTER_SEPARATOR.split(text)):
+        lines = [line.strip() for line in chapter.strip().splitlines() if line.strip()]
+        if len(lines) < 2:
+            # The document title before the first separator carries no content
+            continue
+        chunks.append(KnowledgeChunk(f"guide_{index}", lines[0], "\n".join(lines[1:]), os.path.basename(path)))
+    return chunks
+
+
+def _flatten(value) -> List[str]:
+    """Collect the text of a JSON value, skipping presentation fields."""
+    if isinstance(value, str):
+        return [value.strip()] if value.strip() else []
+    if isinstance(value, dict):
+        return [text for key, item in value.items() if key not in SKIPPED_FIELDS for text in _flatten(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in _flatten(item)]
+    return []
+
+
+def load_topic_json(path: str, text: Optional[str] = None) -> List[KnowledgeChunk]:
+    """
+    Turn one topic file from assets/first_aid_data into chunks.
+
+    The overview (title, subtitle, description) is one chunk, every step
+    is its own chunk and every other section (warnings, assessment,
+    emergency_call, burn_types, ...) is one chunk, each prefixed with the
+    topic title so a query naming the topic still reaches it. Sections
+    without a title of their own use SECTION_TITLES, never the JSON key.
+
+    Args:
+        path (str): Topic JSON file
+        text (str, optional): Contents already read from path
+
+    Returns:
+        list: Chunks of the topic, empty if the file cannot be parsed
+    """
+    if text is None:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    topic = json.loads(text)
+    if not isinstance(topic, dict):
+        return []
+
+    topic_id = topic.get("id") or os.path.splitext(os.path.basename(path))[0]
+    topic_title = topic.get("title", topic_id)
+    source = os.path.basename(path)
+    overview = _flatten([topic.get("subtitle"), topic.get("description")])
+    chunks = [KnowledgeChunk(topic_id, topic_title, "\n".join(overview), source)]
+
+    for key, section in topic.items():
+        if key in SKIPPED_FIELDS or key in ("title", "subtitle", "description"):
+            continue
+        items = section if isinstance(section, list) and all(isinstance(item, dict) for item in section) else [section]
+        for index, item in enumerate(items):
+            texts = _flatten(item)
+            if not texts:
+                continue
+            name = item.get("title") if isinstance(item, dict) and isinstance(item.get("title"), str) else None
+            name = (name or "").strip() or SECTION_TITLES.get(key)
+            chunk_id = f"{topic_id}/{key}" if len(items) == 1 else f"{topic_id}/{key}/{index + 1}"
+            title = f"{topic_title} - {name}" if name else topic_title
+            chunks.append(KnowledgeChunk(chunk_id, title, "\n".join(texts), source))
+    return chunks
+
+
+def source_files(text_path: Optional[str], data_dir: Optional[str]) -> List[str]:
+    """
+    List the files the knowledge base is built from.
+
+    Args:
+        text_path (str, optional): FirstAidInfo.txt
+        data_dir (str, optional): Directory of topic JSON files
+
+    Returns:
+        list: Existing source paths, guide first, topics sorted by name
+    """
+    paths = [text_path] if text_path and os.path.isfile(text_path) else []
+    if data_dir and os.path.isdir(data_dir):
+        paths.extend(sorted(glob.glob(os.path.join(data_dir, "*.json"))))
+    return paths
+
+
+def load_knowledge_chunks(text_path: Optional[str], data_dir: Optional[str]) -> List[KnowledgeChunk]:
+    """
+    Parse the guide and every topic file into chunks.
+
+    Missing sources are logged and skipped, as are topic files that fail to parse.
+
+    Args:
+        text_path (str, optional): FirstAidInfo.txt
+        data_dir (str, optional): Directory of topic JSON files
+
+    Returns:
+        list: Chunks from all sources
+    """
+    logger = logging.getLogger(__name__)
+    if text_path and not os.path.isfile(text_path):
+        logger.warning(f"First-aid guide not found: {text_path}")
+    if data_dir and not os.path.isdir(data_dir):
+        logger.warning(f"First-aid data directory not found: {data_dir}")
+
+    chunks = []
+    for path in source_files(text_path, data_dir):
+        try:
+            chunks.extend(load_first_aid_text(path) if path == text_path else load_topic_json(path))
+        except (OSError, ValueError) as e:
+            logger.error(f"Skipping knowledge file {path}: {str(e)}")
+    return chunks
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Postings, document lengths and idf are computed once at build time; a
+    query only touches the postings of its own terms, so its cost grows
+    with how common the query words are rather than with the corpus size.
+    Query terms missing from the vocabulary (misheard or misspelled words
+    in a transcript) are replaced by similar vocabulary terms from a
+    character n-gram index, weighted by their similarity.
+    """
+
+    def __init__(self, chunks: Iterable[KnowledgeChunk], k1: float = 1.5, b: float = 0.75,
+                 fuzzy_min_similarity: float = 0.6, term_counts: Optional[List[Counter]] = None):
+        """
+        Build the index.
+
+        Args:
+            chunks (Iterable[KnowledgeChunk]): Passages to index
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+            fuzzy_min_similarity (float): Lowest n-gram similarity for replacing an unknown term,
+                0 disables fuzzy matching
+            term_counts (list, optional): chunk_terms() of every chunk, in order, when
+                already computed (e.g. by an incremental reload)
+        """
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_min_similarity = fuzzy_min_similarity
+
+        # term -> [(chunk index, term frequency)]
+        self.postings: Dict[str, List[tuple]] = {}
+        lengths = []
+        if term_counts is None:
+            term_counts = [chunk_terms(chunk) for chunk in self.chunks]
+        for index, counts in enumerate(term_counts):
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((index, frequency))
+
+        count = len(self.chunks)
+        average = sum(lengths) / count if count else 0.0
+        self.idf = {term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for term, postings in self.postings.items()}
+        # k1 * (1 - b + b * |d| / avgdl) per chunk, the length part of the BM25 denominator
+        self._norms = [k1 * (1 - b + b * length / average) if average else k1 for length in lengths]
+        self.ngrams = NGramIndex(self.postings)
+
+    def expand_terms(self, query: str) -> Dict[str, float]:
+        """
+        Map a query to vocabulary terms and their weights.
+
+        Args:
+            query (str): Free-text query
+
+        Returns:
+            dict: term -> weight, 1.0 for exact terms and the similarity for fuzzy
+            ones and for stem variants of exact terms
+        """
+        weights: Dict[str, float] = {}
+        for term in tokenize(query):
+            matches = []
+            if term in self.postings:
+                weights[term] = 1.0
+                if self.fuzzy_min_similarity > 0:
+                    # Other inflections of a known word ("كسر" -> "كسور")
+                    matches = [(variant, STEM_SIMILARITY) for variant in self.ngrams.variants(term)]
+            elif self.fuzzy_min_similarity > 0 and len(term) >= 3:
+                matches = self.ngrams.lookup(term, limit=FUZZY_MATCHES, min_similarity=self.fuzzy_min_similarity)
+            for match, similarity in matches:
+                weights[match] = max(weights.get(match, 0.0), similarity)
+        return weights
+
+    def search(self, query: str, k: int = 3) -> List[tuple]:
+        """
+        Score chunks sharing at least one term with the query.
+
+        Args:
+            query (str): Free-text query
+            k (int): Number of results
+
+        Returns:
+            list: (score, KnowledgeChunk) pairs, best first
+        """
+        scores: Dict[int, float] = {}
+        k1 = self.k1
+        norms = self._norms
+        for term, weight in self.expand_terms(query).items():
+            idf = self.idf[term] * weight
+            for index, frequency in self.postings[term]:
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (k1 + 1) / (frequency + norms[index])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[index]) for index, score in best]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"type": "bm25", "chunks": len(self.chunks), "terms": len(self.postings)}
+
+
+class FirstAidRetriever:
+    """
+    Grounding context for voice turns from the first-aid guide and topic files.
+
+    Replaces the per-query linear scan the app does in rag_service.dart:
+    both sources are parsed and indexed once (or a saved TF-IDF index is
+    memory-mapped), then every lookup is an index query.
+    """
+
+    def __init__(self, text_path: Optional[str] = None, data_dir: Optional[str] = None,
+                 k1: float = 1.5, b: float = 0.75, index_type: str = "bm25",
+                 index_dir: Optional[str] = None, cache=None):
+        """
+        Load the sources and build (or open) the index.
+
+        Args:
+            text_path (str, optional): FirstAidInfo.txt, skipped if None or missing
+            data_dir (str, optional): Directory of topic JSON files, skipped if None or missing
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalization
+            index_type (str): "bm25" (built in memory) or "tfidf" (NumPy, memory-mapped from index_dir)
+            index_dir (str, optional): Where the TF-IDF arrays are saved, None to keep them in memory
+            cache (RetrievalCache, optional): Result cache in front of the index
+        """
+        self.text_path = text_path
+        self.data_dir = data_dir
+        self.k1 = k1
+        self.b = b
+        self.index_type = index_type
+        self.index_dir = index_dir
+        self.cache = cache
+        # Incremented every time a rebuilt index is swapped in
+        self.version = 1
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        if index_type == "tfidf":
+            self.index = self._open_tfidf_index()
+        else:
+            self.index = BM25Index(load_knowledge_chunks(text_path, data_dir), k1=k1, b=b)
+        stats = self.index.get_stats()
+        self.logger.info(f"Indexed {stats['chunks']} first-aid chunks ({stats['terms']} terms, {stats['type']})")
+
+    def _open_tfidf_index(self):
+        # numpy is only needed for this index type
+        try:
+            from tfidf_index import open_tfidf_index
+        except ImportError as e:
+            self.logger.error(f"TF-IDF index unavailable ({str(e)}), using BM25")
+            self.index_type = "bm25"
+            return BM25Index(load_knowledge_chunks(self.text_path, self.data_dir), k1=self.k1, b=self.b)
+        return open_tfidf_index(
+            self.index_dir,
+            source_files(self.text_path, self.data_dir),
+            lambda: load_knowledge_chunks(self.text_path, self.data_dir)
+        )
+
+    def build_index(self, chunks: List[KnowledgeChunk], term_counts: Optional[List[Counter]] = None):
+        """
+        Build an index of the configured type without installing it.
+
+        Args:
+            chunks (list): Passages to index
+            term_counts (list, optional): chunk_terms() of every chunk, in order
+
+        Returns:
+            BM25Index or TfidfIndex: New index (TF-IDF arrays are saved and memory-mapped)
+        """
+        if self.index_type != "tfidf":
+            return BM25Index(chunks, k1=self.k1, b=self.b, term_counts=term_counts)
+
+        from tfidf_index import TfidfIndex, sources_fingerprint
+        fingerprint = sources_fingerprint(source_files(self.text_path, self.data_dir))
+        index = TfidfIndex.build(chunks, fingerprint=fingerprint, term_counts=term_counts)
+        if self.index_dir:
+            try:
+                index.save(self.index_dir)
+                return TfidfIndex.load(self.index_dir, fingerprint) or index
+            except OSError as e:
+                self.logger.error(f"Cannot save TF-IDF index to {self.index_dir}: {str(e)}")
+        return index
+
+    def swap_index(self, index):
+        """
+        Install a rebuilt index.
+
+        Queries read self.index once, so in-flight ones finish on the old
+        index and later ones see the new one; nothing waits on a lock.
+
+        Args:
+            index (BM25Index or TfidfIndex): Index from build_index()
+        """
+        self.index = index
+        self.version += 1
+
+    def retrieve(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Find the passages most relevant to a query.
+
+        Args:
+            query (str): User question or transcript
+            k (int): Maximum number of passages
+
+        Returns:
+            list: Chunk dicts (id, title, content, source) with a "score", best first;
+                shared with the result cache, so treat them as read-only
+        """
+        if self.cache is None:
+            return self._search(query, k)
+
+        # Read the version before the index: swap_index() writes them in the other
+        # order, so results are never stored under a newer version than their index
+        version = self.version
+        results = self.cache.get(query, k, version)
+        if results is None:
+            results = self._search(query, k)
+            self.cache.put(query, k, version, results)
+        return results
+
+    def _search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        return [dict(chunk.to_dict(), score=round(score, 4)) for score, chunk in self.index.search(query, k)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get index size.
+
+        Returns:
+            dict: Index type, number of chunks, distinct terms, index version and cache counters
+        """
+        stats = self.index.get_stats()
+        stats["version"] = self.version
+        stats["cache"] = self.cache.get_stats() if self.cache else None
+        return stats
+
+
+def create_retriever_from_env() -> FirstAidRetriever:
+    """
+    Create FirstAidRetriever instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_FIRST_AID_TEXT: Darija first-aid guide (default: ../FirstAidInfo.txt)
+    - ATLAS_FIRST_AID_DATA_DIR: Topic JSON directory (default: ../assets/first_aid_data)
+    - ATLAS_RETRIEVAL_INDEX: "bm25" or "tfidf" (needs numpy) (default: bm25)
+    - ATLAS_RETRIEVAL_INDEX_DIR: Directory for the memory-mapped TF-IDF arrays, empty to
+      keep them in memory (default: .retrieval_index)
+    - ATLAS_RETRIEVAL_CACHE_SIZE / ATLAS_RETRIEVAL_CACHE_TTL: Result cache, see
+      create_retrieval_cache_from_env()
+
+    Returns:
+        FirstAidRetriever: Retriever with its index built
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return FirstAidRetriever(
+        text_path=os.getenv('ATLAS_FIRST_AID_TEXT', os.path.join(root, 'FirstAidInfo.txt')),
+        data_dir=os.getenv('ATLAS_FIRST_AID_DATA_DIR', os.path.join(root, 'assets', 'first_aid_data')),
+        index_type=os.getenv('ATLAS_RETRIEVAL_INDEX', 'bm25').lower(),
+        index_dir=os.getenv('ATLAS_RETRIEVAL_INDEX_DIR', '.retrieval_index') or None,
+        cache=create_retrieval_cache_from_env()
+    )
@@ -4,19 +4,40 @@ Flask API Server for Azure Voice Services
 Bridges Flutter app with Azure Speech Services (TTS + STT)
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import json
 import os
-import tempfile
-import uuid
-from azure_voice_service import create_voice_service_from_env
-import logging
 import threading
 import time
+from typing import Optional
+from azure_voice_service import ARABIC_VOICES, create_voice_service_from_env
+from tts_cache import create_audio_cache_from_env, make_cache_key
+from audio_formats import (AudioOutputFormat, negotiate_output_format, pcm_to_wav, stitch_audio,
+                           streaming_wav_header, wav_pcm_data)
+from text_segmenter import split_sentences
+from segmented_synthesis import create_segmented_synthesizer_from_env
+from file_janitor import FileJanitor
+from phrase_stats import create_phrase_tracker_from_env
+from cache_warmup import start_cache_warmup_from_env
+from recognition_sessions import create_session_manager_from_env
+from batch_transcribe import iter_batch, to_ndjson, transcribe_audio
+from single_flight import SingleFlight
+from first_aid_retrieval import create_retriever_from_env
+from knowledge_reload import create_knowledge_reloader_from_env
+from voice_pipeline import VoiceTurnPipeline, create_response_generator_from_env
+from admission import AdmissionRejected, classify_request, create_admission_controller_from_env
+from metrics import (REGISTRY, PROMETHEUS_CONTENT_TYPE, REQUEST_SECONDS, TIME_TO_FIRST_AUDIO_SECONDS,
+                     AUDIO_BYTES_OUT, TTS_CACHE_REQUESTS, register_service_gauges, stage_timer)
+import atexit
+import logging
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Flutter app
+sock = Sock(app)  # WebSocket routes
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,13 +46,83 @@ logger = logging.getLogger(__name__)
 # Initialize Azure Voice Service
 voice_service = None
 
+# Synthesized audio cache (None when disabled)
+audio_cache = None
+
+# Shared cleanup thread for interrupted cache writes
+file_janitor = FileJanitor()
+
+# Phrase popularity histogram and the startup warm-up it drives
+phrase_tracker = create_phrase_tracker_from_env()
+cache_warmer = None
+
+# Sentence-level parallel synthesis for long responses
+segment_synthesizer = create_segmented_synthesizer_from_env()
+
+# Concurrent live transcriptions driven over HTTP
+recognition_sessions = None
+
+# Identical syntheses requested at the same moment run once
+tts_flights = SingleFlight("tts")
+
+# BM25 index over the first-aid guide and topic files, built once at startup
+retriever = create_retriever_from_env()
+MAX_RETRIEVE_RESULTS = 20
+
+# Re-indexes edited knowledge files in the background (None when disabled). Retrieval
+# works without speech, so it runs even if the voice service fails to initialize.
+knowledge_reloader = create_knowledge_reloader_from_env(
+    retriever, voices=[voice['name'] for voices in ARABIC_VOICES.values() for voice in voices]
+)
+if knowledge_reloader:
+    knowledge_reloader.start()
+    atexit.register(knowledge_reloader.stop)
+
+# Answers /voice-turn questions from retrieved passages (local extractive stand-in by default)
+response_generator = create_response_generator_from_env()
+VOICE_TURN_TTS_PARALLEL = int(os.getenv('ATLAS_VOICE_TURN_TTS_PARALLEL', '3'))
+
+# Bounded concurrency and priority lanes in front of the voice handlers (None when disabled)
+admission = create_admission_controller_from_env()
+URGENT_TTS_MAX_CHARS = int(os.getenv('ATLAS_URGENT_TTS_MAX_CHARS', '200'))
+
 def initialize_voice_service():
     """Initialize Azure Voice Service on startup"""
-    global voice_service
+    global voice_service, audio_cache, cache_warmer, recognition_sessions
     try:
         voice_service = create_voice_service_from_env()
         if voice_service:
             logger.info("✅ Azure Voice Service initialized successfully")
+            voice_service.warm_up()
+            voice_service.start_health_probe()
+            audio_cache = create_audio_cache_from_env()
+            if audio_cache:
+                logger.info(f"✅ TTS audio cache enabled (dir: {audio_cache.cache_dir})")
+            recognition_sessions = create_session_manager_from_env(voice_service.stt)
+            recognition_sessions.start()
+            atexit.register(recognition_sessions.stop)
+            register_service_gauges(voice_service, audio_cache, recognition_sessions, tts_flights, admission)
+            
+            # Edited knowledge files now also drop their cached audio
+            if knowledge_reloader:
+                knowledge_reloader.audio_cache = audio_cache
+            
+            # Remove audio left behind by interrupted cache writes
+            if audio_cache and audio_cache.cache_dir:
+                file_janitor.watch_directory(audio_cache.cache_dir, '*/*.tmp', max_age=600)
+                file_janitor.start()
+            
+            # Re-synthesize the hottest phrases in the background
+            phrase_tracker.start()
+            atexit.register(phrase_tracker.stop)
+            if audio_cache:
+                cache_warmer = start_cache_warmup_from_env(
+                    lambda text, voice, output_format: voice_service.tts.synthesize_to_bytes(
+                        text, voice=voice, output_format=output_format
+                    ),
+                    audio_cache,
+                    phrase_tracker
+                )
             return True
         else:
             logger.error("❌ Failed to initialize Azure Voice Service")
@@ -40,13 +131,144 @@ def initialize_voice_service():
         logger.error(f"❌ Error initializing voice service: {e}")
         return False
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def admit_request():
+    """Wait for an execution slot in the request's priority lane, or reject with 429"""
+    if not admission:
+        return None
+    
+    data = request.get_json(silent=True) if request.is_json else None
+    priority = classify_request(
+        request.method,
+        request.path,
+        request.headers.get('X-Priority'),
+        text=data.get('text') if isinstance(data, dict) else None,
+        segmented=bool(data.get('segmented')) if isinstance(data, dict) else False,
+        urgent_max_chars=URGENT_TTS_MAX_CHARS
+    )
+    if priority is None:
+        return None
+    
+    try:
+        g.admission_ticket = admission.acquire(priority)
+    except AdmissionRejected as e:
+        response = jsonify({'success': False, 'error': e.reason, 'retry_after': e.retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return None
+
+@app.teardown_request
+def release_admission(error=None):
+    # Streamed responses keep the request context, so this runs after the last chunk
+    ticket = g.pop('admission_ticket', None)
+    if ticket:
+        ticket.release()
+
+@app.after_request
+def record_request_duration(response):
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - g.get('request_started', time.perf_counter()),
+        endpoint=request.endpoint or 'unknown',
+        method=request.method,
+        status=str(response.status_code)
+    )
+    return response
+
+def record_first_audio(cache_status: str, started: float):
+    """Record time-to-first-audio-byte and the cache outcome for the current endpoint"""
+    endpoint = request.endpoint or 'unknown'
+    TIME_TO_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, cache=cache_status)
+    # Coalesced requests are counted even without a cache, they are a saving of their own
+    outcome = cache_status if audio_cache or cache_status == 'COALESCED' else 'DISABLED'
+    TTS_CACHE_REQUESTS.inc(endpoint=endpoint, outcome=outcome)
+
+def metered_chunks(chunks, audio_format: AudioOutputFormat):
+    """Pass audio chunks through while counting bytes sent"""
+    endpoint = request.endpoint or 'unknown'
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        AUDIO_BYTES_OUT.inc(sent, endpoint=endpoint, format=audio_format.name)
+
+def audio_response(audio: bytes, cache_status: str, audio_format: AudioOutputFormat):
+    """Build a downloadable audio response from an in-memory buffer"""
+    record_first_audio(cache_status, g.request_started)
+    AUDIO_BYTES_OUT.inc(len(audio), endpoint=request.endpoint or 'unknown', format=audio_format.name)
+    response = Response(audio, mimetype=audio_format.mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=speech.{audio_format.extension}'
+    response.headers['X-Cache'] = cache_status
+    response.headers['X-Audio-Format'] = audio_format.name
+    response.vary.add('Accept')
+    return response
+
+def request_output_format(data: dict) -> AudioOutputFormat:
+    """Pick the TTS format from the 'format' field or the Accept header"""
+    return negotiate_output_format(data.get('format'), request.headers.get('Accept'))
+
+def synthesize_coalesced(cache_key: str, synthesize):
+    """
+    Run synthesize() at most once at a time per cache key and cache its audio.
+    
+    Returns (audio, cache_status): 'MISS' for the request that synthesized,
+    'COALESCED' for requests that waited on it, 'HIT' if the cache was
+    filled while the caller was looking up.
+    """
+    def run():
+        # A flight that finished since the caller's lookup may have filled the cache
+        if audio_cache:
+            cached_audio = audio_cache.get(cache_key)
+            if cached_audio is not None:
+                return cached_audio, 'HIT'
+        audio = synthesize()
+        if audio and audio_cache:
+            audio_cache.put(cache_key, audio)
+        return audio, 'MISS'
+    
+    (audio, cache_status), shared = tts_flights.do(cache_key, run)
+    return audio, 'COALESCED' if shared else cache_status
+
+def synthesize_cached(text: str, voice: str, audio_format: AudioOutputFormat):
+    """Synthesize one phrase to bytes, going through the audio cache"""
+    cache_key = make_cache_key(text, voice, audio_format.name)
+    if audio_cache:
+        cached_audio = audio_cache.get(cache_key)
+        if cached_audio is not None:
+            return cached_audio
+    
+    audio, _ = synthesize_coalesced(
+        cache_key,
+        lambda: voice_service.tts.synthesize_to_bytes(text, voice=voice, output_format=audio_format.name)
+    )
+    return audio
+
+def synthesize_segments(segments: list, voice: str, audio_format: AudioOutputFormat):
+    """Yield audio for each segment in order; segments render in parallel and are cached individually"""
+    return segment_synthesizer.iter_audio(
+        segments,
+        lambda segment: synthesize_cached(segment, voice, audio_format)
+    )
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (speech service status comes from the background probe)"""
+    speech_health = voice_service.get_health() if voice_service else None
+    speech_status = speech_health['status'] if speech_health else 'down'
+    status = {'down': 'unhealthy', 'degraded': 'degraded'}.get(speech_status, 'healthy')
     return jsonify({
-        'status': 'healthy',
-        'voice_service_ready': voice_service is not None
-    })
+        'status': status,
+        'voice_service_ready': speech_status != 'down',
+        'speech_service': speech_health,
+        'cache_warm': cache_warmer is None or cache_warmer.done,
+        'warmup': cache_warmer.get_progress() if cache_warmer else None
+    }), 503 if status == 'unhealthy' else 200
 
 @app.route('/test-setup', methods=['GET'])
 def test_setup():
@@ -70,17 +292,18 @@ def speech_to_text():
     if not voice_service:
         return jsonify({'error': 'Voice service not initialized'}), 500
     
+    # Audio in the request body: transcribe the client's recording
+    if request.mimetype.startswith('audio/') or request.mimetype == 'application/octet-stream':
+        return recognize_uploaded_audio()
+    
     try:
         data = request.get_json()
         language = data.get('language', 'ar-MA')
         
-        # Set the language for recognition
-        voice_service.stt.set_language(language)
-        
         logger.info(f"Starting speech recognition in {language}...")
         
-        # Perform speech recognition
-        recognized_text = voice_service.stt.recognize_once()
+        # Perform speech recognition (language is scoped to this request)
+        recognized_text = voice_service.stt.recognize_once(language=language)
         
         if recognized_text:
             logger.info(f"Speech recognized: {recognized_text}")
@@ -104,6 +327,51 @@ def speech_to_text():
             'error': str(e)
         }), 500
 
+def read_request_chunks(chunk_size: int = 8192):
+    """Yield the request body as it arrives (works with chunked transfer)"""
+    while True:
+        chunk = request.stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def recognize_uploaded_audio():
+    """Recognize WAV/PCM audio streamed in the request body"""
+    try:
+        language = request.args.get('language', 'ar-MA')
+        sample_rate = int(request.args.get('sample_rate', 16000))
+        
+        logger.info(f"Starting upload speech recognition in {language}...")
+        
+        # Chunks are pushed to Azure while the upload is still in progress
+        recognized_text = voice_service.stt.recognize_stream(
+            read_request_chunks(),
+            language=language,
+            sample_rate=sample_rate
+        )
+        
+        if recognized_text:
+            logger.info(f"Speech recognized: {recognized_text}")
+            return jsonify({
+                'success': True,
+                'text': recognized_text,
+                'language': language
+            })
+        else:
+            logger.warning("No speech recognized in uploaded audio")
+            return jsonify({
+                'success': False,
+                'text': None,
+                'error': 'No speech detected'
+            })
+            
+    except Exception as e:
+        logger.error(f"STT upload error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/text-to-speech', methods=['POST'])
 def text_to_speech():
     """Convert text to speech using Azure TTS"""
@@ -118,13 +386,10 @@ def text_to_speech():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        # Set the voice
-        voice_service.tts.set_voice(voice)
-        
         logger.info(f"Speaking text with voice {voice}: {text[:50]}...")
         
-        # Speak the text
-        success = voice_service.tts.speak_text(text)
+        # Speak the text (voice is scoped to this request)
+        success = voice_service.tts.speak_text(text, voice=voice)
         
         if success:
             logger.info("Text-to-speech completed successfully")
@@ -153,54 +418,52 @@ def text_to_speech_file():
         return jsonify({'error': 'Voice service not initialized'}), 500
     
     try:
-        data = request.get_json()
-        text = data.get('text', '')
-        voice = data.get('voice', 'ar-MA-MounaNeural')
+        with stage_timer('api', 'parse_request'):
+            data = request.get_json()
+            text = data.get('text', '')
+            voice = data.get('voice', 'ar-MA-MounaNeural')
         
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        # Set the voice
-        voice_service.tts.set_voice(voice)
+        try:
+            audio_format = request_output_format(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        temp_filename = temp_file.name
-        temp_file.close()
+        phrase_tracker.record(text, voice, audio_format.name)
         
-        logger.info(f"Generating audio file for text: {text[:50]}...")
+        # Serve repeated phrases straight from the cache
+        cache_key = make_cache_key(text, voice, audio_format.name)
+        if audio_cache:
+            with stage_timer('api', 'cache_lookup'):
+                cached_audio = audio_cache.get(cache_key)
+            if cached_audio is not None:
+                logger.info(f"Serving cached {audio_format.name} audio for text: {text[:50]}...")
+                return audio_response(cached_audio, 'HIT', audio_format)
         
-        # Generate audio file
-        success = voice_service.tts.text_to_audio_file(text, temp_filename)
+        # Long responses: synthesize sentences in parallel and stitch them into one file
+        segments = split_sentences(text) if data.get('segmented') else [text]
         
-        if success:
-            logger.info(f"Audio file generated: {temp_filename}")
-            
-            # Return the audio file
-            def remove_file(filename):
-                """Remove temp file after a delay"""
-                time.sleep(10)  # Wait 10 seconds before cleanup
+        def synthesize():
+            logger.info(f"Generating {audio_format.name} audio for text ({len(segments)} segments): {text[:50]}...")
+            if len(segments) > 1:
                 try:
-                    os.unlink(filename)
-                    logger.info(f"Cleaned up temp file: {filename}")
-                except:
-                    pass
-            
-            # Start cleanup thread
-            threading.Thread(target=remove_file, args=(temp_filename,)).start()
-            
-            return send_file(
-                temp_filename,
-                mimetype='audio/wav',
-                as_attachment=True,
-                download_name='speech.wav'
-            )
+                    with stage_timer('api', 'segmented_synthesis'):
+                        return stitch_audio(list(synthesize_segments(segments, voice, audio_format)), audio_format)
+                except RuntimeError as e:
+                    logger.error(f"Segmented synthesis error: {e}")
+                    return None
+            # Synthesize straight into memory, no temp file involved
+            with stage_timer('api', 'synthesis'):
+                return voice_service.tts.synthesize_to_bytes(text, voice=voice, output_format=audio_format.name)
+        
+        # Identical requests arriving while this one synthesizes share its result
+        audio, cache_status = synthesize_coalesced(cache_key, synthesize)
+        
+        if audio:
+            return audio_response(audio, cache_status, audio_format)
         else:
-            # Clean up failed file
-            try:
-                os.unlink(temp_filename)
-            except:
-                pass
             return jsonify({
                 'success': False,
                 'error': 'Audio generation failed'
@@ -213,6 +476,448 @@ def text_to_speech_file():
             'error': str(e)
         }), 500
 
+def open_speech_stream(text: str, voice: str, audio_format: AudioOutputFormat,
+                       chunk_size: int = 4096, segmented: bool = False,
+                       started: Optional[float] = None):
+    """
+    Start streaming synthesis for text, serving from the cache when possible.
+    
+    Returns (cache_status, chunks) where chunks yields audio bytes in the
+    requested format (for WAV, a streaming header first), or (None, None)
+    if synthesis failed before any audio arrived. With segmented=True the
+    text is split into sentences that are synthesized in parallel and
+    streamed in order. started (perf_counter) is when the client asked,
+    for the time-to-first-audio metric.
+    """
+    if started is None:
+        started = time.perf_counter()
+    
+    cache_key = make_cache_key(text, voice, audio_format.name)
+    if audio_cache:
+        cached_audio = audio_cache.get(cache_key)
+        if cached_audio is not None:
+            logger.info(f"Streaming cached audio for text: {text[:50]}...")
+            record_first_audio('HIT', started)
+            return 'HIT', (
+                cached_audio[offset:offset + chunk_size]
+                for offset in range(0, len(cached_audio), chunk_size)
+            )
+    
+    if segmented:
+        segments = split_sentences(text)
+        if len(segments) > 1:
+            return open_segmented_stream(text, segments, voice, audio_format, started)
+    
+    logger.info(f"Streaming audio for text: {text[:50]}...")
+    
+    chunks = voice_service.tts.stream_text(
+        text, chunk_size=chunk_size, voice=voice, output_format=audio_format.name
+    )
+    
+    # Wait for the first chunk so synthesis errors surface before any audio is sent
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        return None, None
+    record_first_audio('MISS', started)
+    
+    def generate():
+        audio_chunks = [first_chunk]
+        if audio_format.is_pcm:
+            yield streaming_wav_header(audio_format.sample_rate)
+        yield first_chunk
+        for chunk in chunks:
+            audio_chunks.append(chunk)
+            yield chunk
+        
+        # Only complete utterances are cached
+        if audio_cache:
+            audio = b''.join(audio_chunks)
+            if audio_format.is_pcm:
+                audio = pcm_to_wav(audio, audio_format.sample_rate)
+            audio_cache.put(cache_key, audio)
+    
+    return 'MISS', generate()
+
+def open_segmented_stream(text: str, segments: list, voice: str, audio_format: AudioOutputFormat,
+                          started: float):
+    """Stream sentence segments in order while later ones are still being synthesized"""
+    logger.info(f"Streaming {len(segments)} segments for text: {text[:50]}...")
+    
+    audio_segments = synthesize_segments(segments, voice, audio_format)
+    
+    # Wait for the first segment so synthesis errors surface before any audio is sent
+    try:
+        first_segment = next(audio_segments)
+    except RuntimeError as e:
+        logger.error(f"Segmented synthesis error: {e}")
+        return None, None
+    record_first_audio('MISS', started)
+    
+    def payload(audio):
+        # Segments are complete WAV files; only their samples go after the streaming header
+        return wav_pcm_data(audio) if audio_format.is_pcm else audio
+    
+    def generate():
+        completed = [first_segment]
+        if audio_format.is_pcm:
+            yield streaming_wav_header(audio_format.sample_rate)
+        yield payload(first_segment)
+        try:
+            for audio in audio_segments:
+                completed.append(audio)
+                yield payload(audio)
+        except RuntimeError as e:
+            logger.error(f"Segmented synthesis error: {e}")
+            return
+        
+        if audio_cache:
+            audio_cache.put(make_cache_key(text, voice, audio_format.name), stitch_audio(completed, audio_format))
+    
+    return 'MISS', generate()
+
+@app.route('/text-to-speech-stream', methods=['POST'])
+def text_to_speech_stream():
+    """Convert text to speech and stream audio chunks as they are produced"""
+    if not voice_service:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    
+    try:
+        data = request.get_json()
+        text = data.get('text', '')
+        voice = data.get('voice', 'ar-MA-MounaNeural')
+        
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+        
+        try:
+            audio_format = request_output_format(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        phrase_tracker.record(text, voice, audio_format.name)
+        
+        cache_status, chunks = open_speech_stream(
+            text, voice, audio_format, segmented=bool(data.get('segmented')),
+            started=g.request_started
+        )
+        if chunks is None:
+            return jsonify({
+                'success': False,
+                'error': 'Audio generation failed'
+            }), 500
+        
+        response = Response(stream_with_context(metered_chunks(chunks, audio_format)),
+                            mimetype=audio_format.mimetype)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Audio-Format'] = audio_format.name
+        response.vary.add('Accept')
+        return response
+        
+    except Exception as e:
+        logger.error(f"TTS stream error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@sock.route('/voice-session')
+def voice_session(ws):
+    """
+    Full-duplex voice session over a single WebSocket connection.
+    
+    Client -> server:
+      {"type": "start", "language": "ar-MA", "sample_rate": 16000}  begin an utterance
+      binary frames                                                  PCM microphone audio
+      {"type": "stop"}                                               end of the utterance
+      {"type": "speak", "text": "...", "voice": "...", "format": "opus",
+       "segmented": true}                                            synthesize a reply
+      {"type": "close"}                                              end the session
+    
+    Server -> client:
+      {"type": "partial", "text": ...} / {"type": "final", "text": ...}  recognition results
+      {"type": "utterance_end", "text": ...}                             all finals for the utterance
+      {"type": "audio_start", ...}, binary audio frames, {"type": "audio_end", ...}
+      {"type": "error", "error": ...}
+    """
+    send_lock = threading.Lock()
+    
+    def send(message):
+        # SDK callbacks run on their own threads, so sends are serialized
+        payload = message if isinstance(message, bytes) else json.dumps(message, ensure_ascii=False)
+        with send_lock:
+            ws.send(payload)
+    
+    if not voice_service:
+        send({'type': 'error', 'error': 'Voice service not initialized'})
+        return
+    
+    recognition = None
+    logger.info("Voice session opened")
+    
+    try:
+        while True:
+            message = ws.receive()
+            
+            if isinstance(message, bytes):
+                if recognition:
+                    recognition.write(message)
+                continue
+            
+            try:
+                command = json.loads(message)
+            except (TypeError, ValueError):
+                send({'type': 'error', 'error': 'Invalid message'})
+                continue
+            
+            message_type = command.get('type')
+            
+            if message_type == 'start':
+                if recognition:
+                    recognition.stop()
+                language = command.get('language', 'ar-MA')
+                recognition = voice_service.stt.create_push_recognition(
+                    language,
+                    sample_rate=int(command.get('sample_rate', 16000)),
+                    on_recognized=lambda text: send({'type': 'final', 'text': text}),
+                    on_recognizing=lambda text: send({'type': 'partial', 'text': text})
+                )
+                recognition.start()
+                send({'type': 'listening', 'language': language})
+            
+            elif message_type == 'stop':
+                if not recognition:
+                    send({'type': 'error', 'error': 'No active utterance'})
+                    continue
+                recognition.close()
+                text = recognition.wait(timeout=30)
+                send({'type': 'utterance_end', 'text': text, 'error': recognition.error})
+                recognition = None
+            
+            elif message_type == 'speak':
+                text = command.get('text', '')
+                voice = command.get('voice', 'ar-MA-MounaNeural')
+                if not text:
+                    send({'type': 'error', 'error': 'No text provided'})
+                    continue
+                
+                try:
+                    audio_format = negotiate_output_format(command.get('format'))
+                except ValueError as e:
+                    send({'type': 'error', 'error': str(e)})
+                    continue
+                
+                cache_status, chunks = open_speech_stream(
+                    text, voice, audio_format, segmented=bool(command.get('segmented'))
+                )
+                if chunks is None:
+                    send({'type': 'error', 'error': 'Audio generation failed'})
+                    continue
+                
+                send({
+                    'type': 'audio_start',
+                    'format': audio_format.name,
+                    'mimetype': audio_format.mimetype,
+                    'cache': cache_status
+                })
+                audio_bytes = 0
+                for chunk in metered_chunks(chunks, audio_format):
+                    send(chunk)
+                    audio_bytes += len(chunk)
+                send({'type': 'audio_end', 'bytes': audio_bytes})
+            
+            elif message_type == 'close':
+                break
+            
+            else:
+                send({'type': 'error', 'error': f'Unknown message type: {message_type}'})
+                
+    except ConnectionClosed:
+        logger.info("Voice session closed by client")
+    except Exception as e:
+        logger.error(f"Voice session error: {e}")
+    finally:
+        if recognition:
+            recognition.stop()
+        logger.info("Voice session ended")
+
+@app.route('/recognition-sessions', methods=['POST'])
+def create_recognition_session():
+    """Start a live transcription; audio is then posted in chunks to its /audio URL"""
+    if not voice_service:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    
+    data = request.get_json(silent=True) or {}
+    session = recognition_sessions.create_session(
+        data.get('language', 'ar-MA'),
+        sample_rate=int(data.get('sample_rate', 16000))
+    )
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': 'Too many recognition sessions' if recognition_sessions.max_sessions > 0
+                     else 'Recognition sessions are disabled on this server',
+            'max_sessions': recognition_sessions.max_sessions
+        }), 503
+    
+    return jsonify({
+        'success': True,
+        'session_id': session.session_id,
+        'idle_timeout': recognition_sessions.idle_timeout
+    }), 201
+
+@app.route('/recognition-sessions', methods=['GET'])
+def list_recognition_sessions():
+    """Get session limits, lifetime counters and per-session stats"""
+    if not recognition_sessions:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    
+    return jsonify(recognition_sessions.get_stats())
+
+@app.route('/recognition-sessions/<session_id>/audio', methods=['POST'])
+def recognition_session_audio(session_id):
+    """Push raw PCM audio (the request body) into a session and return any new results"""
+    session = recognition_sessions.get_session(session_id) if recognition_sessions else None
+    if session is None:
+        return jsonify({'error': 'Unknown recognition session'}), 404
+    
+    accepted = True
+    for chunk in read_request_chunks():
+        accepted = session.write(chunk)
+        if not accepted:
+            break
+    
+    return jsonify({
+        'accepted': accepted,
+        'events': session.poll(),
+        'stats': session.get_stats()
+    }), 200 if accepted else 413
+
+@app.route('/recognition-sessions/<session_id>/results', methods=['GET'])
+def recognition_session_results(session_id):
+    """Long-poll for partial/final results (?wait=seconds, at most 30)"""
+    session = recognition_sessions.get_session(session_id) if recognition_sessions else None
+    if session is None:
+        return jsonify({'error': 'Unknown recognition session'}), 404
+    
+    wait = min(float(request.args.get('wait', 0)), 30.0)
+    return jsonify({'events': session.poll(timeout=wait), 'state': session.state})
+
+@app.route('/recognition-sessions/<session_id>', methods=['DELETE'])
+def close_recognition_session(session_id):
+    """End a session and return its full transcript"""
+    result = recognition_sessions.close_session(session_id) if recognition_sessions else None
+    if result is None:
+        return jsonify({'error': 'Unknown recognition session'}), 404
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/batch-transcribe', methods=['POST'])
+def batch_transcribe():
+    """Transcribe uploaded WAV files (multipart field "files"), streaming one NDJSON line per file"""
+    if not voice_service:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    
+    uploads = request.files.getlist('files')
+    if not uploads:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    language = request.form.get('language', 'ar-MA')
+    workers = int(os.getenv('ATLAS_BATCH_WORKERS', '4'))
+    results = iter_batch(
+        voice_service.stt, uploads,
+        lambda stt, upload: transcribe_audio(stt, upload.stream, upload.filename, language=language),
+        workers=workers
+    )
+    return Response(
+        stream_with_context(to_ndjson(result) for result in results),
+        mimetype='application/x-ndjson'
+    )
+
+@app.route('/retrieve', methods=['GET', 'POST'])
+def retrieve():
+    """Top-k first-aid passages for a query (JSON {"query", "k"} or ?q=&k=)"""
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    query = (data.get('query') or data.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    try:
+        k = min(max(1, int(data.get('k', 3))), MAX_RETRIEVE_RESULTS)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k must be an integer'}), 400
+    
+    with stage_timer('retrieval', 'search'):
+        results = retriever.retrieve(query, k)
+    return jsonify({'success': True, 'query': query, 'results': results, 'index_version': retriever.version})
+
+@app.route('/voice-turn', methods=['POST'])
+def voice_turn():
+    """
+    Answer a spoken question: streaming STT -> retrieval -> generation -> per-sentence TTS.
+    
+    The body is WAV or raw PCM (?language=&sample_rate=&voice=&format=&k=). Events are
+    streamed as NDJSON while the stages overlap; the last one carries per-stage timings.
+    """
+    if not voice_service:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    if not response_generator:
+        return jsonify({'error': 'Response generator not available'}), 500
+    
+    try:
+        language = request.args.get('language', 'ar-MA')
+        sample_rate = int(request.args.get('sample_rate', 16000))
+        k = min(max(1, int(request.args.get('k', 3))), MAX_RETRIEVE_RESULTS)
+        audio_format = negotiate_output_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    voice = request.args.get('voice', 'ar-MA-MounaNeural')
+    
+    pipeline = VoiceTurnPipeline(
+        voice_service.stt, retriever, response_generator,
+        lambda text: synthesize_cached(text, voice, audio_format),
+        max_parallel_tts=VOICE_TURN_TTS_PARALLEL, top_k=k
+    )
+    events = pipeline.run(request.stream, language, sample_rate=sample_rate, audio_format=audio_format.name)
+    return Response(
+        stream_with_context(to_ndjson(event) for event in events),
+        mimetype='application/x-ndjson'
+    )
+
+@app.route('/knowledge-stats', methods=['GET'])
+def knowledge_stats():
+    """Get retrieval index size and version, and hot reload counters"""
+    return jsonify({
+        'index': retriever.get_stats(),
+        'reload': knowledge_reloader.get_stats() if knowledge_reloader else None
+    })
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Get TTS audio cache and request coalescing counters"""
+    if not audio_cache:
+        return jsonify({'enabled': False, 'coalescing': tts_flights.get_stats()})
+    
+    return jsonify({
+        'enabled': True,
+        'stats': audio_cache.get_stats(),
+        'coalescing': tts_flights.get_stats()
+    })
+
+@app.route('/pool-stats', methods=['GET'])
+def pool_stats():
+    """Get synthesizer/recognizer pool occupancy, wait times and admission queue depth"""
+    if not voice_service:
+        return jsonify({'error': 'Voice service not initialized'}), 500
+    
+    stats = voice_service.get_pool_stats()
+    stats['admission'] = admission.get_stats() if admission else None
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-stage timings, time to first audio, bytes out and cache outcomes in Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/voice-conversation', methods=['POST'])
 def voice_conversation():
     """Handle complete voice conversation cycle"""
@@ -272,18 +977,7 @@ def set_voice():
 @app.route('/available-voices', methods=['GET'])
 def available_voices():
     """Get list of available Arabic voices"""
-    return jsonify({
-        'voices': {
-            'male': [
-                {'name': 'ar-MA-JamalNeural', 'language': 'Arabic (Morocco)', 'gender': 'Male'},
-                {'name': 'ar-SA-HamedNeural', 'language': 'Arabic (Saudi Arabia)', 'gender': 'Male'},
-            ],
-            'female': [
-                {'name': 'ar-MA-MounaNeural', 'language': 'Arabic (Morocco)', 'gender': 'Female'},
-                {'name': 'ar-SA-ZariyahNeural', 'language': 'Arabic (Saudi Arabia)', 'gender': 'Female'},
-            ]
-        }
-    })
+    return jsonify({'voices': ARABIC_VOICES})
 
 @app.errorhandler(404)
 def not_found(error):
@@ -303,9 +997,19 @@ if __name__ == '__main__':
         print("\nAvailable endpoints:")
         print("- GET  /health - Health check")
         print("- GET  /test-setup - Test Azure setup")
-        print("- POST /speech-to-text - Convert speech to text")
+        print("- POST /speech-to-text - Convert speech to text (server mic, or audio/wav body)")
         print("- POST /text-to-speech - Convert text to speech")
         print("- POST /text-to-speech-file - Generate audio file")
+        print("- POST /text-to-speech-stream - Stream audio while it is synthesized")
+        print("- WS   /voice-session - Full-duplex streaming STT + TTS session")
+        print("- POST /batch-transcribe - Transcribe many WAV files, NDJSON results as they finish")
+        print("- POST /recognition-sessions - Start a live transcription (then /<id>/audio, /<id>/results, DELETE /<id>)")
+        print("- POST /retrieve - First-aid passages for a question (also GET ?q=)")
+        print("- POST /voice-turn - Spoken question in, NDJSON transcript/context/answer audio out")
+        print("- GET  /knowledge-stats - Retrieval index version and reload counters")
+        print("- GET  /cache-stats - TTS audio cache counters")
+        print("- GET  /pool-stats - Synthesizer/recognizer pool metrics")
+        print("- GET  /metrics - Prometheus metrics")
         print("- POST /voice-conversation - Complete conversation cycle")
         print("- POST /set-voice - Set TTS voice")
         print("- GET  /available-voices - List available voices")
@@ -0,0 +1,320 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from first_aid_retrieval import (FirstAidRetriever, KnowledgeChunk, chunk_terms, load_first_aid_text,
+                                 load_topic_json, source_files)
+from text_segmenter import split_sentences
+from tts_cache import make_cache_key
+from audio_formats import OUTPUT_FORMATS
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _chunk_hash(chunk: KnowledgeChunk) -> str:
+    return _content_hash(f"{chunk.title}\x1f{chunk.content}".encode("utf-8"))
+
+
+def spoken_texts(chunk: KnowledgeChunk) -> Set[str]:
+    """
+    Texts from a chunk that may have been synthesized and cached.
+
+    Args:
+        chunk (KnowledgeChunk): Knowledge passage
+
+    Returns:
+        set: The title, the whole content, each line and each sentence segment
+    """
+    lines = [line.strip() for line in chunk.content.splitlines() if line.strip()]
+    texts = {chunk.title, chunk.content, *lines}
+    for line in lines:
+        texts.update(split_sentences(line))
+    return texts
+
+
+class KnowledgeReloader:
+    """
+    Watches the knowledge files and swaps in a re-indexed retriever on change.
+
+    Files are compared by size and mtime first and by content hash only
+    when those moved, so touching a file without editing it does nothing.
+    Changed files are re-parsed; only chunks whose text actually changed
+    are re-tokenized (term counts of the others are reused), then the
+    index is rebuilt from the counts and swapped in with
+    FirstAidRetriever.swap_index(). Cached TTS audio is dropped only for
+    texts that disappeared from the knowledge base.
+    """
+
+    def __init__(self, retriever: FirstAidRetriever, interval: float = 5.0,
+                 audio_cache=None, voices: Iterable[str] = ()):
+        """
+        Initialize the reloader.
+
+        Args:
+            retriever (FirstAidRetriever): Retriever whose index is replaced
+            interval (float): Seconds between checks
+            audio_cache (AudioCache, optional): Cache to invalidate for changed texts
+            voices (Iterable[str]): Voice names whose cached audio may contain knowledge texts
+        """
+        self.retriever = retriever
+        self.interval = interval
+        self.audio_cache = audio_cache
+        self.voices = list(dict.fromkeys(voices))
+
+        # path -> (size, mtime_ns, content hash), path -> chunks, chunk hash -> term counts
+        self._files: Dict[str, Tuple[int, int, str]] = {}
+        self._chunks: Dict[str, List[KnowledgeChunk]] = {}
+        self._terms: Dict[str, Counter] = {}
+        # path -> hash of a version that failed to parse, so it is not retried every check
+        self._broken: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "checks": 0,
+            "reloads": 0,
+            "files_changed": 0,
+            "chunks_reindexed": 0,
+            "audio_invalidated": 0,
+            "errors": 0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def _parse(self, path: str, data: bytes) -> List[KnowledgeChunk]:
+        # Parses the bytes that were hashed, so a write landing between hashing
+        # and parsing cannot pair one version's hash with another's chunks
+        text = data.decode("utf-8")
+        if path == self.retriever.text_path:
+            return load_first_aid_text(path, text)
+        return load_topic_json(path, text)
+
+    def _scan(self) -> Dict[str, Tuple[int, int, Optional[str]]]:
+        """Stat every source; the hash is carried over while size and mtime are unchanged."""
+        current = {}
+        for path in source_files(self.retriever.text_path, self.retriever.data_dir):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            known = self._files.get(path)
+            unchanged = known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns)
+            current[path] = (stat.st_size, stat.st_mtime_ns, known[2] if unchanged else None)
+        return current
+
+    def snapshot(self):
+        """Record the current files and tokenize every chunk; called once before watching."""
+        with self._lock:
+            for path, (size, mtime_ns, _) in self._scan().items():
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    digest = _content_hash(data)
+                    chunks = self._parse(path, data)
+                except (OSError, ValueError) as e:
+                    self.logger.error(f"Cannot read knowledge file {path}: {str(e)}")
+                    continue
+                self._files[path] = (size, mtime_ns, digest)
+                self._chunks[path] = chunks
+                for chunk in chunks:
+                    self._terms.setdefault(_chunk_hash(chunk), chunk_terms(chunk))
+
+            # The retriever read the files before this snapshot; a file edited in between
+            # must not become the baseline without being indexed
+            indexed = [_chunk_hash(chunk) for chunk in self.retriever.index.chunks]
+            current = [_chunk_hash(chunk) for path in source_files(self.retriever.text_path, self.retriever.data_dir)
+                       for chunk in self._chunks.get(path, ())]
+            if indexed == current:
+                return
+            index, _, _ = self._build(self._chunks)
+            if index is None:
+                # Forget the baseline so the next check() re-indexes every file
+                self._files.clear()
+                self._chunks.clear()
+                return
+            self.retriever.swap_index(index)
+        self.logger.info(f"Knowledge index v{self.retriever.version}: files changed while the index was built")
+
+    def _build(self, chunks_by_path: Dict[str, List[KnowledgeChunk]]):
+        """
+        Build an index over chunks_by_path, reusing the term counts of unchanged chunks.
+
+        Caller must hold self._lock.
+
+        Returns:
+            tuple: (index or None if the build failed, chunks indexed, chunks re-tokenized)
+        """
+        chunks, term_counts, reindexed = [], [], 0
+        for path in source_files(self.retriever.text_path, self.retriever.data_dir):
+            for chunk in chunks_by_path.get(path, ()):
+                key = _chunk_hash(chunk)
+                if key not in self._terms:
+                    self._terms[key] = chunk_terms(chunk)
+                    reindexed += 1
+                chunks.append(chunk)
+                term_counts.append(self._terms[key])
+
+        try:
+            index = self.retriever.build_index(chunks, term_counts)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.logger.error(f"Error rebuilding knowledge index: {str(e)}")
+            return None, chunks, reindexed
+        live = {_chunk_hash(chunk) for chunk in chunks}
+        self._terms = {key: counts for key, counts in self._terms.items() if key in live}
+        return index, chunks, reindexed
+
+    def check(self) -> bool:
+        """
+        Re-index if any knowledge file was added, removed or edited.
+
+        The new file state is recorded only once the rebuilt index is swapped
+        in, so a failed build is retried on the next check.
+
+        Returns:
+            bool: True if a new index was swapped in
+        """
+        with self._lock:
+            self.stats["checks"] += 1
+            changed, contents = {}, {}
+            for path, (size, mtime_ns, digest) in self._scan().items():
+                if digest is None:
+                    try:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    except OSError:
+                        continue
+                    digest = _content_hash(data)
+                    known = self._files.get(path)
+                    if known is not None and known[2] == digest:
+                        # Touched or rewritten with the same content
+                        self._files[path] = (size, mtime_ns, digest)
+                        continue
+                    if self._broken.get(path) == digest:
+                        continue
+                    changed[path] = (size, mtime_ns, digest)
+                    contents[path] = data
+            removed = [path for path in self._files if not os.path.exists(path)]
+            if not changed and not removed:
+                return False
+
+            old_texts = set()
+            for path in list(changed) + removed:
+                for chunk in self._chunks.get(path, ()):
+                    old_texts.update(spoken_texts(chunk))
+
+            files, chunks_by_path = dict(self._files), dict(self._chunks)
+            for path, state in list(changed.items()):
+                try:
+                    chunks = self._parse(path, contents[path])
+                except ValueError as e:
+                    # Keep serving the last good version of a half-written or broken file
+                    self.stats["errors"] += 1
+                    self.logger.error(f"Keeping previous version of {path}: {str(e)}")
+                    self._broken[path] = state[2]
+                    del changed[path]
+                    continue
+                self._broken.pop(path, None)
+                files[path] = state
+                chunks_by_path[path] = chunks
+            for path in removed:
+                files.pop(path, None)
+                chunks_by_path.pop(path, None)
+            if not changed and not removed:
+                return False
+
+            index, chunks, reindexed = self._build(chunks_by_path)
+            if index is None:
+                return False
+            self.retriever.swap_index(index)
+            self._files, self._chunks = files, chunks_by_path
+
+            new_texts = set()
+            for chunk in chunks:
+                new_texts.update(spoken_texts(chunk))
+            invalidated = self._invalidate_audio(old_texts - new_texts)
+
+            self.stats["reloads"] += 1
+            self.stats["files_changed"] += len(changed) + len(removed)
+            self.stats["chunks_reindexed"] += reindexed
+            self.stats["audio_invalidated"] += invalidated
+        self.logger.info(f"Knowledge index v{self.retriever.version}: {len(changed) + len(removed)} file(s) changed, "
+                         f"{reindexed} chunk(s) re-indexed, {invalidated} cached audio file(s) dropped")
+        return True
+
+    def _invalidate_audio(self, texts: Set[str]) -> int:
+        if not self.audio_cache or not texts:
+            return 0
+        removed = 0
+        for text in texts:
+            for voice in self.voices:
+                for output_format in OUTPUT_FORMATS:
+                    removed += self.audio_cache.delete(make_cache_key(text, voice, output_format))
+        return removed
+
+    def start(self):
+        """Snapshot the sources and watch them in the background."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="knowledge-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        self.snapshot()
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Error checking knowledge files: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get reload counters.
+
+        Returns:
+            dict: Watched files, index version and lifetime counters
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["files"] = len(self._files)
+        stats["index_version"] = self.retriever.version
+        return stats
+
+
+def create_knowledge_reloader_from_env(retriever: FirstAidRetriever, audio_cache=None,
+                                       voices: Iterable[str] = ()) -> Optional[KnowledgeReloader]:
+    """
+    Create KnowledgeReloader instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_KNOWLEDGE_RELOAD_INTERVAL: Seconds between checks of the knowledge files
+      (default: 5, 0 disables hot reload)
+
+    Args:
+        retriever (FirstAidRetriever): Retriever whose index is replaced
+        audio_cache (AudioCache, optional): Cache to invalidate for changed texts
+        voices (Iterable[str]): Voice names whose cached audio may contain knowledge texts
+
+    Returns:
+        KnowledgeReloader: Configured reloader (not started) or None if disabled
+    """
+    interval = float(os.getenv('ATLAS_KNOWLEDGE_RELOAD_INTERVAL', '5'))
+    if interval <= 0:
+        return None
+    return KnowledgeReloader(retriever, interval=interval, audio_cache=audio_cache, voices=voices)
@@ -0,0 +1,327 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Upper bounds in seconds; covers cache hits (ms) through long syntheses (10s+)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float): Non-negative increment
+            **labels: One value per label name
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels.
+
+    observe() is a bisect plus a few additions under a lock, so recording on
+    the hot path costs microseconds; text is only built when scraped.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Record one observation.
+
+        Args:
+            value (float): Observed value (seconds for durations)
+            **labels: One value per label name
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauge whose samples are read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a second app instance in tests) replaces the old metric
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                       collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]) -> GaugeCallback:
+        """Create and register a gauge read from collect() on every scrape."""
+        return self._register(GaugeCallback(name, documentation, labelnames, collect))
+
+    def render(self) -> str:
+        """
+        Render all metrics.
+
+        Returns:
+            str: Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry and the metrics shared by the API servers and speech wrappers
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "atlas_stage_seconds",
+    "Duration of individual request processing stages",
+    ["component", "stage"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "atlas_http_request_seconds",
+    "HTTP request duration until the response is returned (streams: until headers)",
+    ["endpoint", "method", "status"]
+)
+TIME_TO_FIRST_AUDIO_SECONDS = REGISTRY.histogram(
+    "atlas_tts_time_to_first_audio_seconds",
+    "Time from request start until the first audio byte is ready to send",
+    ["endpoint", "cache"]
+)
+AUDIO_BYTES_OUT = REGISTRY.counter(
+    "atlas_audio_bytes_out_total",
+    "Audio bytes sent to clients",
+    ["endpoint", "format"]
+)
+TTS_CACHE_REQUESTS = REGISTRY.counter(
+    "atlas_tts_cache_requests_total",
+    "Audio cache lookups by outcome",
+    ["endpoint", "outcome"]
+)
+
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "atlas_admission_wait_seconds",
+    "Time requests waited in the admission queue before running",
+    ["priority"]
+)
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "atlas_admission_decisions_total",
+    "Admission outcomes per priority lane (admitted, rejected, timed_out)",
+    ["priority", "outcome"]
+)
+
+RETRIEVAL_CACHE_REQUESTS = REGISTRY.counter(
+    "atlas_retrieval_cache_requests_total",
+    "Retrieval result cache lookups by outcome (hit, miss, expired)",
+    ["outcome"]
+)
+
+
+def stage_timer(component: str, stage: str):
+    """
+    Time a processing stage into atlas_stage_seconds.
+
+    Args:
+        component (str): Component doing the work (e.g. "tts", "stt", "api")
+        stage (str): Stage name (e.g. "synthesis", "cache_lookup")
+
+    Returns:
+        Context manager observing the duration of its block
+    """
+    return STAGE_SECONDS.time(component=component, stage=stage)
+
+
+def observe_stage(component: str, stage: str, seconds: float):
+    """Record an already measured stage duration into atlas_stage_seconds."""
+    STAGE_SECONDS.observe(seconds, component=component, stage=stage)
+
+
+def register_service_gauges(voice_service, audio_cache=None, recognition_sessions=None,
+                            single_flight=None, admission=None):
+    """
+    Expose pool, connection, cache, session, coalescing and admission state as gauges.
+
+    Values are read from get_pool_stats() / get_stats() only when /metrics
+    is scraped, so the request path pays nothing for them.
+
+    Args:
+        voice_service (AzureVoiceService): Service whose pools are reported
+        audio_cache (AudioCache, optional): Cache whose counters are reported
+        recognition_sessions (RecognitionSessionManager, optional): Live transcriptions reported
+        single_flight (SingleFlight, optional): TTS request coalescing counters reported
+        admission (AdmissionController, optional): Running requests and queue depth reported
+    """
+    def collect_pools():
+        for pool, stats in voice_service.get_pool_stats().items():
+            keys = stats.get("keys", {}).values()
+            yield (pool, "in_use"), sum(key["in_use"] for key in keys)
+            yield (pool, "idle"), sum(key["idle"] for key in keys)
+
+    REGISTRY.gauge_callback(
+        "atlas_pool_objects",
+        "Pooled synthesizers/recognizers by state",
+        ["pool", "state"],
+        collect_pools
+    )
+
+    def collect_connections():
+        for pool, stats in voice_service.get_health()["connections"].items():
+            for stat, value in stats.items():
+                yield (pool, stat), value
+
+    REGISTRY.gauge_callback(
+        "atlas_speech_connections",
+        "Pre-opened speech service connections and reconnect counters",
+        ["pool", "stat"],
+        collect_connections
+    )
+
+    if audio_cache is not None:
+        REGISTRY.gauge_callback(
+            "atlas_tts_cache",
+            "Audio cache counters and tier sizes (see /cache-stats)",
+            ["stat"],
+            lambda: [((name,), value) for name, value in audio_cache.get_stats().items()]
+        )
+
+    if recognition_sessions is not None:
+        def collect_sessions():
+            stats = recognition_sessions.get_stats()
+            for name in ("active", "max_sessions", "created", "closed", "evicted", "rejected"):
+                yield (name,), stats[name]
+
+        REGISTRY.gauge_callback(
+            "atlas_recognition_sessions",
+            "Live transcription sessions and lifetime counters (see /recognition-sessions)",
+            ["stat"],
+            collect_sessions
+        )
+
+    if single_flight is not None:
+        REGISTRY.gauge_callback(
+            "atlas_tts_coalescing",
+            "Identical in-flight syntheses: executions, coalesced requests, errors, in flight",
+            ["stat"],
+            lambda: [((name,), value) for name, value in single_flight.get_stats().items()]
+        )
+
+    if admission is not None:
+        def collect_admission():
+            stats = admission.get_stats()
+            yield ("running", "all"), stats["running"]
+            yield ("max_concurrent", "all"), stats["max_concurrent"]
+            for priority, depth in stats["queue_depth"].items():
+                yield ("queued", priority), depth
+
+        REGISTRY.gauge_callback(
+            "atlas_admission",
+            "Requests running and queued per priority lane",
+            ["state", "priority"],
+            collect_admission
+        )
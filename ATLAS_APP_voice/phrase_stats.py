@@ -0,0 +1,228 @@
+import os
+import glob
+import json
+import logging
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from tts_cache import normalize_text
+
+
+class PhraseFrequencyTracker:
+    """
+    Request-frequency histogram of synthesized phrases.
+
+    Counts are kept per (normalized text, voice, output format), pruned to
+    a bounded number of entries, and periodically flushed to a JSON file so
+    a restarted server knows which phrases to warm first.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = 5000,
+                 flush_interval: float = 60.0):
+        """
+        Initialize the tracker and load counts from a previous run.
+
+        Args:
+            path (str, optional): JSON file for persisted counts, None to keep them in memory
+            max_entries (int): Maximum phrases tracked before the rarest are pruned
+            flush_interval (float): Seconds between background flushes
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._dirty = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        if self.path:
+            self.load()
+
+    def record(self, text: str, voice: str, output_format: str):
+        """
+        Count one synthesis request.
+
+        Args:
+            text (str): Requested text
+            voice (str): Azure voice name
+            output_format (str): Output format name
+        """
+        key = (normalize_text(text), voice, output_format)
+        with self._lock:
+            self._counts[key] += 1
+            self._dirty = True
+            if len(self._counts) > self.max_entries:
+                self._prune()
+
+    def _prune(self):
+        # Caller must hold self._lock. Keep the most frequent half plus room to grow.
+        keep = self._counts.most_common(self.max_entries // 2)
+        self._counts = Counter(dict(keep))
+
+    def top(self, n: int) -> List[Tuple[str, str, str, int]]:
+        """
+        Get the most requested phrases.
+
+        Args:
+            n (int): Number of entries to return
+
+        Returns:
+            list: (text, voice, output format, count) tuples, most frequent first
+        """
+        with self._lock:
+            return [key + (count,) for key, count in self._counts.most_common(n)]
+
+    def load(self, path: Optional[str] = None):
+        """
+        Add persisted counts, ignoring a missing or corrupt file.
+
+        Args:
+            path (str, optional): File to read, defaults to self.path; counts from
+                another file are written to self.path on the next flush
+        """
+        path = path or self.path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not load phrase stats from {path}: {e}")
+            return
+
+        with self._lock:
+            for text, voice, output_format, count in entries:
+                self._counts[(text, voice, output_format)] += int(count)
+            if len(self._counts) > self.max_entries:
+                self._prune()
+            if path != self.path:
+                self._dirty = True
+        self.logger.info(f"Loaded {len(entries)} phrase counts from {path}")
+
+    def flush(self) -> bool:
+        """
+        Write counts to disk atomically if they changed since the last flush.
+
+        Returns:
+            bool: False if writing failed
+        """
+        if not self.path:
+            return True
+
+        with self._lock:
+            if not self._dirty:
+                return True
+            entries = [list(key) + [count] for key, count in self._counts.most_common()]
+            self._dirty = False
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"Error flushing phrase stats: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+
+    def start(self):
+        """Start flushing in the background (no-op without a path)."""
+        if not self.path or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="phrase-stats-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and flush one last time."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+
+def _worker_path(path: str, worker_id: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{worker_id}{ext}"
+
+
+def merge_worker_stats(path: str, max_entries: int = 5000) -> int:
+    """
+    Fold the per-worker count files of a pre-fork run into the main file.
+
+    Called by the supervisor before it forks: worker 0, which warms the
+    cache, then starts from everyone's counts, and the other workers start
+    new files so no count is merged twice.
+
+    Args:
+        path (str): Main counts file
+        max_entries (int): Maximum phrases kept
+
+    Returns:
+        int: Number of worker files merged (and removed)
+    """
+    root, ext = os.path.splitext(path)
+    worker_paths = sorted(glob.glob(f"{glob.escape(root)}.worker*{ext}"))
+    if not worker_paths:
+        return 0
+    tracker = PhraseFrequencyTracker(path, max_entries=max_entries)
+    for worker_path in worker_paths:
+        tracker.load(worker_path)
+    if not tracker.flush():
+        return 0
+    for worker_path in worker_paths:
+        try:
+            os.unlink(worker_path)
+        except OSError as e:
+            tracker.logger.warning(f"Could not remove merged phrase stats {worker_path}: {e}")
+    return len(worker_paths)
+
+
+def create_phrase_tracker_from_env() -> PhraseFrequencyTracker:
+    """
+    Create PhraseFrequencyTracker instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_PHRASE_STATS_FILE: Where counts are persisted (default: .tts_cache/phrase_stats.json)
+    - ATLAS_PHRASE_STATS_MAX: Maximum phrases tracked (default: 5000)
+    - ATLAS_WORKER_ID: Set by prefork_server.py; workers other than 0 then keep their
+      own file (phrase_stats.worker<N>.json), merged into the main one on the next start
+
+    Returns:
+        PhraseFrequencyTracker: Configured tracker
+    """
+    path = os.getenv('ATLAS_PHRASE_STATS_FILE', os.path.join('.tts_cache', 'phrase_stats.json'))
+    worker_id = os.getenv('ATLAS_WORKER_ID')
+    if path and worker_id and worker_id != '0':
+        path = _worker_path(path, worker_id)
+    max_entries = int(os.getenv('ATLAS_PHRASE_STATS_MAX', '5000'))
+    return PhraseFrequencyTracker(path or None, max_entries=max_entries)
+
+
+def merge_worker_stats_from_env() -> int:
+    """
+    Run merge_worker_stats() on the file configured by ATLAS_PHRASE_STATS_FILE.
+
+    Returns:
+        int: Number of worker files merged
+    """
+    path = os.getenv('ATLAS_PHRASE_STATS_FILE', os.path.join('.tts_cache', 'phrase_stats.json'))
+    if not path:
+        return 0
+    return merge_worker_stats(path, max_entries=int(os.getenv('ATLAS_PHRASE_STATS_MAX', '5000')))
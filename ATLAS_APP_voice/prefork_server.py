@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Pre-fork production server for the voice API.
+
+The supervisor opens one listening socket and forks N worker processes
+that all accept on it, so requests spread over every core instead of
+queueing behind one interpreter's GIL. Workers share the audio cache
+through its on-disk tier; only worker 0 warms it at startup. Workers
+that crash or grow past a memory ceiling are replaced.
+
+The supervisor alone watches the knowledge files: on a change it
+re-indexes once, drops stale cached audio and replaces the workers so
+they all load the new index. Workers 1..N keep their own phrase counts
+files; the supervisor merges them into worker 0's file (which drives the
+warm-up) before forking. Recognition sessions live in the worker that created them and the
+shared socket cannot route a client back to it, so with more than one
+worker they are disabled (ATLAS_MAX_RECOGNITION_SESSIONS=0 in workers);
+run a single worker to serve /recognition-sessions.
+
+Each worker reports its own /metrics and /pool-stats; scrape every
+worker (or aggregate) when more than one is running.
+
+Examples:
+    python prefork_server.py --workers 4
+    python prefork_server.py --async --port 8080 --max-rss-mb 1024
+"""
+
+import os
+import sys
+import time
+import errno
+import signal
+import socket
+import logging
+import argparse
+from typing import Dict, Optional
+
+# Exit code a worker uses when the voice service cannot start (e.g. bad credentials)
+INIT_FAILED = 3
+
+# Workers dying sooner than this after start are restarted with a growing delay
+MIN_HEALTHY_SECONDS = 10.0
+MAX_RESTART_DELAY = 30.0
+
+logger = logging.getLogger("prefork")
+
+
+def process_rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, or None where it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+def serve_worker(listener: socket.socket, use_async: bool, worker_id: int):
+    """
+    Run one worker on the inherited listening socket; never returns.
+
+    The API modules (and the Speech SDK threads they start) are imported
+    only here, after the fork, so no worker inherits another's threads.
+    """
+    # The supervisor handles Ctrl+C and stops workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    try:
+        if use_async:
+            from aiohttp import web
+            import async_voice_api
+            # run_app turns SIGTERM into a graceful shutdown with on_cleanup hooks
+            web.run_app(async_voice_api.create_app(), sock=listener, print=None)
+        else:
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            from werkzeug.serving import make_server
+            import flask_voice_api
+            if not flask_voice_api.initialize_voice_service():
+                os._exit(INIT_FAILED)
+            host, port = listener.getsockname()[:2]
+            server = make_server(host, port, flask_voice_api.app, threaded=True, fd=listener.fileno())
+            logger.info(f"Worker {worker_id} (pid {os.getpid()}) serving")
+            server.serve_forever()
+    except SystemExit:
+        # atexit handlers (phrase counts, session cleanup) run on the way out
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"Worker {worker_id} failed: {e}")
+        os._exit(1)
+    os._exit(0)
+
+
+class PreforkSupervisor:
+    """
+    Keeps N workers running on one listening socket.
+
+    Crashed workers are restarted (with a back-off when they die right
+    after starting); workers over the memory ceiling are stopped
+    gracefully and replaced, which also recycles slow leaks. Stopping
+    workers never blocks the loop: they are signalled, then reaped (or
+    killed once graceful_timeout has passed) on later iterations.
+    """
+
+    def __init__(self, listener: socket.socket, workers: int, use_async: bool = False,
+                 max_rss_bytes: Optional[int] = None, check_interval: float = 5.0,
+                 graceful_timeout: float = 30.0, knowledge_reloader=None):
+        """
+        Initialize the supervisor.
+
+        Args:
+            listener (socket.socket): Bound, listening socket shared by all workers
+            workers (int): Number of worker processes
+            use_async (bool): Run async_voice_api instead of flask_voice_api
+            max_rss_bytes (int, optional): Memory ceiling per worker, None for no limit
+            check_interval (float): Seconds between memory checks
+            graceful_timeout (float): Seconds a stopping worker may finish requests
+            knowledge_reloader (KnowledgeReloader, optional): Checked from the supervisor
+                loop; workers are replaced after each reload
+        """
+        self.listener = listener
+        self.workers = max(1, workers)
+        self.use_async = use_async
+        self.max_rss_bytes = max_rss_bytes
+        self.check_interval = check_interval
+        self.graceful_timeout = graceful_timeout
+        self.knowledge_reloader = knowledge_reloader
+
+        # pid -> (worker id, start time)
+        self._children: Dict[int, tuple] = {}
+        # pid -> monotonic deadline of replaced workers finishing their requests
+        self._retiring: Dict[int, float] = {}
+        # worker id -> current restart back-off, and -> monotonic time a restart is due
+        self._restart_delay: Dict[int, float] = {}
+        self._pending: Dict[int, float] = {}
+        self._stopping = False
+
+        self.stats = {
+            "started": 0,
+            "crashed": 0,
+            "memory_restarts": 0,
+            "knowledge_restarts": 0,
+        }
+
+    def _spawn(self, worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            os.environ["ATLAS_WORKER_ID"] = str(worker_id)
+            if worker_id != 0:
+                # One worker fills the shared disk cache; the rest read from it
+                os.environ["ATLAS_WARMUP_TOP_N"] = "0"
+            serve_worker(self.listener, self.use_async, worker_id)
+        self._children[pid] = (worker_id, time.monotonic())
+        self.stats["started"] += 1
+        logger.info(f"Started worker {worker_id} (pid {pid})")
+
+    def _retire(self, pid: int):
+        """Ask a worker to finish its requests and exit; _reap() collects it."""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self._retiring[pid] = time.monotonic() + self.graceful_timeout
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self._retiring.items()):
+            if deadline > now:
+                continue
+            logger.warning(f"Worker pid {pid} did not stop in {self.graceful_timeout:g}s, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            # Still reaped by _reap(), but only killed once
+            self._retiring[pid] = float("inf")
+
+    def _replace(self, pid: int, worker_id: int):
+        # Start the replacement first so capacity does not drop
+        del self._children[pid]
+        self._spawn(worker_id)
+        self._retire(pid)
+
+    def _reap(self):
+        """Collect exited workers and schedule their restart."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._retiring.clear()
+                return
+            if pid == 0:
+                return
+            self._retiring.pop(pid, None)
+            worker_id, started = self._children.pop(pid, (None, None))
+            if worker_id is None or self._stopping:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            self.stats["crashed"] += 1
+            uptime = time.monotonic() - started
+            if uptime < MIN_HEALTHY_SECONDS:
+                delay = min(MAX_RESTART_DELAY, self._restart_delay.get(worker_id, 0.5) * 2)
+            else:
+                delay = 0.0
+            self._restart_delay[worker_id] = delay or 0.5
+            self._pending[worker_id] = time.monotonic() + delay
+            reason = "failed to initialize" if code == INIT_FAILED else f"exited with {code}"
+            logger.error(f"Worker {worker_id} (pid {pid}) {reason} after {uptime:.1f}s, "
+                         f"restarting in {delay:.1f}s")
+
+    def _restart_due(self):
+        now = time.monotonic()
+        for worker_id, due in list(self._pending.items()):
+            if due <= now:
+                del self._pending[worker_id]
+                self._spawn(worker_id)
+
+    def _check_memory(self):
+        if not self.max_rss_bytes:
+            return
+        for pid, (worker_id, _) in list(self._children.items()):
+            rss = process_rss_bytes(pid)
+            if rss is not None and rss > self.max_rss_bytes:
+                logger.warning(f"Worker {worker_id} (pid {pid}) uses {rss / 1e6:.0f} MB, "
+                               f"over the {self.max_rss_bytes / 1e6:.0f} MB ceiling; replacing it")
+                self.stats["memory_restarts"] += 1
+                self._replace(pid, worker_id)
+
+    def _check_knowledge(self):
+        try:
+            reloaded = self.knowledge_reloader.check()
+        except Exception as e:
+            logger.error(f"Error checking knowledge files: {e}")
+            return
+        if reloaded:
+            logger.info(f"Knowledge files changed; replacing {len(self._children)} worker(s)")
+            self.stats["knowledge_restarts"] += 1
+            for pid, (worker_id, _) in list(self._children.items()):
+                self._replace(pid, worker_id)
+
+    def _shutdown(self, signum, frame):
+        self._stopping = True
+
+    def run(self) -> int:
+        """
+        Start the workers and supervise them until SIGTERM/SIGINT.
+
+        Returns:
+            int: Process exit code
+        """
+        signal.signal(signal.SIGTERM, self._shutdown)
+        signal.signal(signal.SIGINT, self._shutdown)
+
+        if self.knowledge_reloader is not None:
+            self.knowledge_reloader.snapshot()
+
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        last_check = last_reload_check = time.monotonic()
+        while not self._stopping:
+            self._reap()
+            self._kill_overdue()
+            self._restart_due()
+            if time.monotonic() - last_check >= self.check_interval:
+                self._check_memory()
+                last_check = time.monotonic()
+            if (self.knowledge_reloader is not None
+                    and time.monotonic() - last_reload_check >= self.knowledge_reloader.interval):
+                self._check_knowledge()
+                last_reload_check = time.monotonic()
+            time.sleep(0.5)
+
+        logger.info(f"Stopping {len(self._children) + len(self._retiring)} worker(s)")
+        for pid in list(self._children):
+            self._retire(pid)
+        self._children.clear()
+        while self._retiring:
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.1)
+        self.listener.close()
+        return 0
+
+
+def open_listener(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """
+    Create the listening socket all workers accept on.
+
+    Args:
+        host (str): Interface to bind
+        port (int): TCP port
+        backlog (int): Pending connection queue length
+
+    Returns:
+        socket.socket: Bound, listening, inheritable socket
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        listener.bind((host, port))
+    except OSError as e:
+        listener.close()
+        if e.errno == errno.EADDRINUSE:
+            raise OSError(e.errno, f"Port {port} is already in use") from e
+        raise
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the voice API from pre-forked worker processes")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv('ATLAS_WORKERS', '0')) or os.cpu_count() or 1,
+                        help="Worker processes (default: ATLAS_WORKERS or the CPU count)")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=5000, help="TCP port")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run the asyncio server (async_voice_api.py) in each worker")
+    parser.add_argument("--max-rss-mb", type=float,
+                        default=float(os.getenv('ATLAS_WORKER_MAX_RSS_MB', '0')),
+                        help="Replace workers above this resident memory (default: ATLAS_WORKER_MAX_RSS_MB, 0 = off)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds a stopping worker may finish in-flight requests")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if not hasattr(os, "fork"):
+        print("❌ Pre-fork mode needs os.fork() (Linux/macOS); run the server directly on this platform")
+        return 1
+
+    # Workers inherit these: all of them use one disk cache directory
+    os.environ["ATLAS_TTS_CACHE_SHARED"] = "1"
+
+    if args.workers > 1 and int(os.getenv('ATLAS_MAX_RECOGNITION_SESSIONS', '50')) > 0:
+        # A session stays in the worker that created it, but its follow-up requests
+        # land on any worker
+        logger.warning("Recognition sessions are disabled with more than one worker; "
+                       "use --workers 1 to serve /recognition-sessions")
+        os.environ["ATLAS_MAX_RECOGNITION_SESSIONS"] = "0"
+
+    # Worker 0 warms the cache from the counts every worker collected last run
+    from phrase_stats import merge_worker_stats_from_env
+    merged = merge_worker_stats_from_env()
+    if merged:
+        logger.info(f"Merged phrase counts of {merged} worker(s)")
+
+    # Builds (or validates) a saved TF-IDF index once, so workers only memory-map it
+    from first_aid_retrieval import create_retriever_from_env
+    from knowledge_reload import create_knowledge_reloader_from_env
+    from azure_voice_service import ARABIC_VOICES
+    from tts_cache import create_audio_cache_from_env
+    retriever = create_retriever_from_env()
+    knowledge_reloader = create_knowledge_reloader_from_env(
+        retriever, create_audio_cache_from_env(),
+        [voice['name'] for voices in ARABIC_VOICES.values() for voice in voices]
+    )
+    # Only the supervisor re-indexes; workers pick up changes when they are replaced
+    os.environ["ATLAS_KNOWLEDGE_RELOAD_INTERVAL"] = "0"
+
+    listener = open_listener(args.host, args.port)
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    supervisor = PreforkSupervisor(
+        listener,
+        args.workers,
+        use_async=args.use_async,
+        max_rss_bytes=int(args.max_rss_mb * 1024 * 1024) or None,
+        graceful_timeout=args.graceful_timeout,
+        knowledge_reloader=knowledge_reloader
+    )
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from audio_formats import DEFAULT_SAMPLE_RATE, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS
+
+
+class RecognitionSession:
+    """
+    One live transcription: a push-stream recognition plus its result queue.
+
+    SDK callbacks append events to a bounded queue that the client drains
+    with poll(). When the queue is full, the oldest partial result is
+    dropped first (a newer partial supersedes it); finals are only dropped
+    if the queue holds nothing else.
+    """
+
+    def __init__(self, session_id: str, recognition, language: str, sample_rate: int,
+                 queue_size: int = 200, max_audio_bytes: int = 32 * 1024 * 1024):
+        """
+        Wrap a recognition created by SpeechToTextBackend.create_push_recognition().
+
+        Args:
+            session_id (str): Identifier handed to the client
+            recognition (PushStreamRecognition): Session, not yet started
+            language (str): Recognition language
+            sample_rate (int): PCM sample rate of the pushed audio
+            queue_size (int): Maximum undelivered events kept
+            max_audio_bytes (int): Audio accepted before the session is closed
+        """
+        self.session_id = session_id
+        self.recognition = recognition
+        self.language = language
+        self.sample_rate = sample_rate
+        self.queue_size = max(1, queue_size)
+        self.max_audio_bytes = max_audio_bytes
+
+        self.created = time.time()
+        self.last_activity = time.monotonic()
+        self.state = "listening"
+
+        self._events = deque()
+        self._condition = threading.Condition()
+
+        self.stats = {
+            "bytes_received": 0,
+            "partials": 0,
+            "finals": 0,
+            "events_dropped": 0,
+            "audio_rejected_bytes": 0,
+        }
+
+    def _push(self, event: Dict[str, Any], counter: Optional[str] = None):
+        with self._condition:
+            if counter:
+                self.stats[counter] += 1
+            if len(self._events) >= self.queue_size:
+                partial = next((e for e in self._events if e["type"] == "partial"), None)
+                self._events.remove(partial if partial is not None else self._events[0])
+                self.stats["events_dropped"] += 1
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def on_recognizing(self, text: str):
+        self._push({"type": "partial", "text": text, "time": time.time()}, "partials")
+
+    def on_recognized(self, text: str):
+        self._push({"type": "final", "text": text, "time": time.time()}, "finals")
+
+    def on_stopped(self):
+        if self.state != "evicted":
+            self.state = "finished"
+        self._push({"type": "end", "error": self.recognition.error, "time": time.time()})
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def write(self, chunk: bytes) -> bool:
+        """
+        Push audio into the recognizer.
+
+        Args:
+            chunk (bytes): Raw PCM samples
+
+        Returns:
+            bool: False if the session no longer accepts audio (finished or over its cap)
+        """
+        self.touch()
+        if self.state != "listening":
+            return False
+        if self.stats["bytes_received"] + len(chunk) > self.max_audio_bytes:
+            # Finish with what was received rather than buffering without bound
+            self.stats["audio_rejected_bytes"] += len(chunk)
+            self.finish()
+            return False
+        self.recognition.write(chunk)
+        self.stats["bytes_received"] += len(chunk)
+        return True
+
+    def poll(self, timeout: float = 0.0, max_events: int = 100) -> List[Dict[str, Any]]:
+        """
+        Take queued results, waiting up to timeout for the first one.
+
+        Args:
+            timeout (float): Seconds to wait if nothing is queued
+            max_events (int): Maximum events returned
+
+        Returns:
+            list: Events ({"type": "partial" | "final" | "end", ...}) in arrival order
+        """
+        self.touch()
+        with self._condition:
+            if not self._events and timeout > 0:
+                self._condition.wait(timeout)
+            events = []
+            while self._events and len(events) < max_events:
+                events.append(self._events.popleft())
+        return events
+
+    def finish(self):
+        """Signal end of audio; remaining results still arrive in the queue."""
+        if self.state == "listening":
+            self.state = "finishing"
+            self.recognition.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-session counters.
+
+        Returns:
+            dict: State, language, audio received, result counts, queue depth and idle time
+        """
+        with self._condition:
+            queued = len(self._events)
+            stats = dict(self.stats)
+        bytes_per_second = self.sample_rate * DEFAULT_BITS_PER_SAMPLE // 8 * DEFAULT_CHANNELS
+        stats.update({
+            "session_id": self.session_id,
+            "state": self.state,
+            "language": self.language,
+            "created": self.created,
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+            "audio_seconds": round(stats["bytes_received"] / bytes_per_second, 2),
+            "queued_events": queued,
+            "error": self.recognition.error,
+        })
+        return stats
+
+
+class RecognitionSessionManager:
+    """
+    Tracks concurrent continuous-recognition sessions by id.
+
+    AzureSpeechToText.start_continuous_recognition() holds a single
+    recognizer per process; this manager instead gives every client its own
+    push-stream recognition, caps how many run at once and how much each
+    may consume, and evicts sessions whose client stopped talking to us.
+    """
+
+    def __init__(self, stt, max_sessions: int = 50, idle_timeout: float = 60.0,
+                 queue_size: int = 200, max_audio_bytes: int = 32 * 1024 * 1024):
+        """
+        Initialize the manager.
+
+        Args:
+            stt (SpeechToTextBackend): Backend creating the push-stream recognitions
+            max_sessions (int): Maximum sessions open at once
+            idle_timeout (float): Seconds without writes or polls before a session is evicted
+            queue_size (int): Maximum undelivered events per session
+            max_audio_bytes (int): Audio accepted per session before it is closed
+        """
+        self.stt = stt
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self.max_audio_bytes = max_audio_bytes
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, RecognitionSession] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "created": 0,
+            "closed": 0,
+            "evicted": 0,
+            "rejected": 0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def create_session(self, language: Optional[str] = None,
+                       sample_rate: int = DEFAULT_SAMPLE_RATE) -> Optional[RecognitionSession]:
+        """
+        Start a new continuous recognition.
+
+        Args:
+            language (str, optional): Recognition language, defaults to the backend's language
+            sample_rate (int): PCM sample rate the client will send
+
+        Returns:
+            RecognitionSession: Started session, or None at capacity or if the start failed
+        """
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self.stats["rejected"] += 1
+                self.logger.warning(f"Recognition session limit reached ({self.max_sessions})")
+                return None
+            session_id = uuid.uuid4().hex
+            # Reserve the slot so concurrent creates cannot overshoot the limit
+            self._sessions[session_id] = None
+
+        try:
+            holder = {}
+            recognition = self.stt.create_push_recognition(
+                language,
+                sample_rate=sample_rate,
+                bits_per_sample=DEFAULT_BITS_PER_SAMPLE,
+                channels=DEFAULT_CHANNELS,
+                on_recognized=lambda text: holder["session"].on_recognized(text),
+                on_recognizing=lambda text: holder["session"].on_recognizing(text),
+                on_stopped=lambda: holder["session"].on_stopped()
+            )
+            session = RecognitionSession(
+                session_id, recognition, language or "default", sample_rate,
+                queue_size=self.queue_size, max_audio_bytes=self.max_audio_bytes
+            )
+            holder["session"] = session
+            recognition.start()
+        except Exception as e:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            self.logger.error(f"Error starting recognition session: {str(e)}")
+            return None
+
+        with self._lock:
+            self._sessions[session_id] = session
+            self.stats["created"] += 1
+        self.logger.info(f"Recognition session {session_id} started ({language or 'default'})")
+        return session
+
+    def get_session(self, session_id: str) -> Optional[RecognitionSession]:
+        """
+        Look up an open session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            RecognitionSession: Session or None if unknown, closed or evicted
+        """
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close_session(self, session_id: str, timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """
+        End a session and wait for its last results.
+
+        Args:
+            session_id (str): Session identifier
+            timeout (float): Seconds to wait for buffered audio to be recognized
+
+        Returns:
+            dict: "text" (all finals joined), undelivered "events" and final "stats",
+                or None if the session is unknown
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return None
+            self.stats["closed"] += 1
+
+        session.finish()
+        text = session.recognition.wait(timeout)
+        return {
+            "text": text,
+            "events": session.poll(),
+            "stats": session.get_stats()
+        }
+
+    def evict_idle(self) -> int:
+        """
+        Stop sessions idle for longer than idle_timeout.
+
+        Returns:
+            int: Number of sessions evicted
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [session for session in self._sessions.values()
+                    if session is not None and now - session.last_activity > self.idle_timeout]
+            for session in idle:
+                del self._sessions[session.session_id]
+            self.stats["evicted"] += len(idle)
+
+        for session in idle:
+            session.state = "evicted"
+            try:
+                session.recognition.stop(wait=False)
+            except Exception as e:
+                self.logger.error(f"Error stopping idle session {session.session_id}: {str(e)}")
+        if idle:
+            self.logger.info(f"Evicted {len(idle)} idle recognition session(s)")
+        return len(idle)
+
+    def start(self):
+        """Start evicting idle sessions in the background."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="recognition-sessions", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the eviction thread and every open session."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            sessions = [session for session in self._sessions.values() if session is not None]
+            self._sessions.clear()
+        for session in sessions:
+            session.recognition.stop(wait=False)
+
+    def _run(self):
+        interval = max(1.0, min(self.idle_timeout / 4, 15.0))
+        while not self._stop_event.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                self.logger.error(f"Error evicting recognition sessions: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get manager counters and per-session stats.
+
+        Returns:
+            dict: Limits, lifetime counters, "active" count and "sessions" keyed by id
+        """
+        with self._lock:
+            sessions = [session for session in self._sessions.values() if session is not None]
+            stats = dict(self.stats)
+        stats.update({
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "active": len(sessions),
+            "sessions": {session.session_id: session.get_stats() for session in sessions}
+        })
+        return stats
+
+
+def create_session_manager_from_env(stt) -> RecognitionSessionManager:
+    """
+    Create RecognitionSessionManager instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_MAX_RECOGNITION_SESSIONS: Concurrent live transcriptions (default: 50)
+    - ATLAS_SESSION_IDLE_TIMEOUT: Seconds before an idle session is evicted (default: 60)
+    - ATLAS_SESSION_QUEUE_SIZE: Undelivered results kept per session (default: 200)
+    - ATLAS_SESSION_MAX_AUDIO_MB: Audio accepted per session in MB (default: 32, ~17 min at 16 kHz)
+
+    Args:
+        stt (SpeechToTextBackend): Backend creating the push-stream recognitions
+
+    Returns:
+        RecognitionSessionManager: Configured manager (not started)
+    """
+    return RecognitionSessionManager(
+        stt,
+        max_sessions=int(os.getenv('ATLAS_MAX_RECOGNITION_SESSIONS', '50')),
+        idle_timeout=float(os.getenv('ATLAS_SESSION_IDLE_TIMEOUT', '60')),
+        queue_size=int(os.getenv('ATLAS_SESSION_QUEUE_SIZE', '200')),
+        max_audio_bytes=int(float(os.getenv('ATLAS_SESSION_MAX_AUDIO_MB', '32')) * 1024 * 1024)
+    )
@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from arabic_text import tokenize
+from metrics import RETRIEVAL_CACHE_REQUESTS
+
+
+def make_query_key(query: str, k: int, version: int) -> Tuple[str, int, int]:
+    """
+    Build the cache key of a retrieval.
+
+    The query is reduced to its sorted search terms, so spelling variants,
+    diacritics, articles and word order that the index cannot tell apart
+    share one entry.
+
+    Args:
+        query (str): Free-text query
+        k (int): Number of results requested
+        version (int): Index version the results come from
+
+    Returns:
+        tuple: (normalized query, k, version)
+    """
+    return " ".join(sorted(tokenize(query))), k, version
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieval results with a time-to-live.
+
+    Entries are keyed by normalized query, k and index version. When a
+    lookup carries a newer index version than the cache has seen, every
+    entry is dropped at once, so a knowledge reload never serves results
+    from the previous index.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted
+            ttl (float): Seconds an entry stays valid
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # key -> (expiry time, results)
+        self._entries: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._version = None
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self, version: int):
+        # Caller must hold self._lock
+        if self._version != version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+                self._entries.clear()
+            self._version = version
+
+    def get(self, query: str, k: int, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached results.
+
+        Args:
+            query (str): Free-text query
+            k (int): Number of results requested
+            version (int): Current index version
+
+        Returns:
+            list: Cached results (shared, treat as read-only) or None on miss
+        """
+        key = make_query_key(query, k, version)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                outcome = "hit"
+            elif entry is not None:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                outcome = "expired"
+            else:
+                self.stats["misses"] += 1
+                outcome = "miss"
+        RETRIEVAL_CACHE_REQUESTS.inc(outcome=outcome)
+        return entry[1] if outcome == "hit" else None
+
+    def put(self, query: str, k: int, version: int, results: List[Dict[str, Any]]):
+        """
+        Store results.
+
+        Args:
+            query (str): Free-text query
+            k (int): Number of results requested
+            version (int): Index version the results come from
+            results (list): Retrieved passages
+        """
+        key = make_query_key(query, k, version)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit/miss/expiry/eviction counters, size and hit rate
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "index_version": self._version,
+            })
+        lookups = stats["hits"] + stats["misses"] + stats["expired"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def create_retrieval_cache_from_env() -> Optional[RetrievalCache]:
+    """
+    Create RetrievalCache instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_RETRIEVAL_CACHE_SIZE: Cached queries (default: 1024, 0 disables the cache)
+    - ATLAS_RETRIEVAL_CACHE_TTL: Seconds a cached result stays valid (default: 600)
+
+    Returns:
+        RetrievalCache: Configured cache or None if disabled
+    """
+    max_entries = int(os.getenv('ATLAS_RETRIEVAL_CACHE_SIZE', '1024'))
+    if max_entries <= 0:
+        return None
+    return RetrievalCache(max_entries=max_entries, ttl=float(os.getenv('ATLAS_RETRIEVAL_CACHE_TTL', '600')))
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+
+
+class SegmentedSynthesizer:
+    """
+    Synthesizes sentence segments concurrently and emits them in order.
+
+    At most max_parallel segments are in flight; as soon as the head segment
+    is done it is yielded and the next one is submitted, so audio for the
+    first sentence is ready while later sentences are still rendering.
+    """
+
+    def __init__(self, max_parallel: int = 3):
+        """
+        Initialize the segmented synthesizer.
+
+        Args:
+            max_parallel (int): Maximum segments synthesized at the same time
+        """
+        self.max_parallel = max(1, max_parallel)
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def iter_audio(self, segments: List[str],
+                   synthesize: Callable[[str], Optional[bytes]]) -> Iterator[bytes]:
+        """
+        Yield audio for each segment in order, synthesizing ahead in parallel.
+
+        Args:
+            segments (list): Text segments in playback order
+            synthesize (Callable): synthesize(text) -> audio bytes or None
+
+        Yields:
+            bytes: Audio of each segment
+
+        Raises:
+            RuntimeError: If a segment fails to synthesize
+        """
+        remaining = iter(segments)
+        in_flight = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="segment") as executor:
+            try:
+                for segment in remaining:
+                    in_flight.append(executor.submit(synthesize, segment))
+                    if len(in_flight) >= self.max_parallel:
+                        break
+
+                index = 0
+                while in_flight:
+                    audio = in_flight.popleft().result()
+
+                    # Refill the window before handing audio to the (possibly slow) consumer
+                    segment = next(remaining, None)
+                    if segment is not None:
+                        in_flight.append(executor.submit(synthesize, segment))
+
+                    if not audio:
+                        raise RuntimeError(f"Synthesis failed for segment {index + 1}/{len(segments)}")
+                    index += 1
+                    yield audio
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    async def iter_audio_async(self, segments: List[str],
+                               synthesize: Callable[[str], Awaitable[Optional[bytes]]]
+                               ) -> AsyncIterator[bytes]:
+        """
+        asyncio variant of iter_audio() for the async server.
+
+        Args:
+            segments (list): Text segments in playback order
+            synthesize (Callable): async synthesize(text) -> audio bytes or None
+
+        Yields:
+            bytes: Audio of each segment
+
+        Raises:
+            RuntimeError: If a segment fails to synthesize
+        """
+        remaining = iter(segments)
+        in_flight = deque()
+
+        try:
+            for segment in remaining:
+                in_flight.append(asyncio.ensure_future(synthesize(segment)))
+                if len(in_flight) >= self.max_parallel:
+                    break
+
+            index = 0
+            while in_flight:
+                audio = await in_flight.popleft()
+
+                segment = next(remaining, None)
+                if segment is not None:
+                    in_flight.append(asyncio.ensure_future(synthesize(segment)))
+
+                if not audio:
+                    raise RuntimeError(f"Synthesis failed for segment {index + 1}/{len(segments)}")
+                index += 1
+                yield audio
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+
+def create_segmented_synthesizer_from_env() -> SegmentedSynthesizer:
+    """
+    Create SegmentedSynthesizer instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_SEGMENT_PARALLELISM: Segments synthesized concurrently per request (default: 3)
+
+    Returns:
+        SegmentedSynthesizer: Configured instance
+    """
+    return SegmentedSynthesizer(max_parallel=int(os.getenv('ATLAS_SEGMENT_PARALLELISM', '3')))
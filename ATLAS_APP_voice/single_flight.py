@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one execution.
+
+    While fn is running for a key, later callers with the same key block
+    until it finishes and receive the same result (or exception) instead
+    of starting the work again. Nothing is remembered once the call
+    completes; pair it with the audio cache for reuse over time.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        """
+        Initialize the group.
+
+        Args:
+            name (str): Name used in stats
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+        self.stats = {
+            "executions": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn for key unless the same key is already running.
+
+        Args:
+            key (Hashable): Identity of the work (e.g. the audio cache key)
+            fn (Callable): Work to run when no identical call is in flight
+
+        Returns:
+            tuple: (result, shared) where shared is True if another caller did the work
+
+        Raises:
+            Exception: Whatever fn raised, for the executing and all waiting callers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if shared:
+                call.waiters += 1
+                self.stats["coalesced"] += 1
+            else:
+                call = self._calls[key] = _Call()
+                self.stats["executions"] += 1
+
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            dict: executions, coalesced callers, errors and calls currently in flight
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines running on one event loop.
+
+    The shared work runs as its own task, so a caller that disconnects
+    (and is cancelled) does not cancel the result the others wait for.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        """
+        Initialize the group.
+
+        Args:
+            name (str): Name used in stats
+        """
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+        self.stats = {
+            "executions": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn() for key unless the same key is already running.
+
+        Args:
+            key (Hashable): Identity of the work (e.g. the audio cache key)
+            fn (Callable): Coroutine function to run when no identical call is in flight
+
+        Returns:
+            tuple: (result, shared) where shared is True if another caller did the work
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["executions"] += 1
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            dict: executions, coalesced callers, errors and calls currently in flight
+        """
+        stats = dict(self.stats)
+        stats["in_flight"] = len(self._tasks)
+        return stats
@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterable, List, Optional
+
+import azure.cognitiveservices.speech as speechsdk
+
+from audio_formats import DEFAULT_OUTPUT_FORMAT, AudioOutputFormat, detect_stream_format, get_output_format
+
+
+class AsyncObjectPool:
+    """
+    asyncio counterpart of SpeechObjectPool.
+
+    Waiting for a free object suspends the coroutine instead of blocking a
+    thread, so hundreds of requests can queue on one event loop.
+    """
+
+    def __init__(self, factory: Callable[[Hashable], Any], max_size: int = 64,
+                 timeout: Optional[float] = 30.0, name: str = "async-pool",
+                 on_discard: Optional[Callable[[Any], None]] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            factory (Callable): Builds a new object for a key
+            max_size (int): Maximum objects per key (idle + checked out)
+            timeout (float, optional): Seconds to wait for a free object
+            name (str): Pool name used in errors
+            on_discard (Callable, optional): Called with objects dropped after an error
+        """
+        self.factory = factory
+        self.on_discard = on_discard
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.name = name
+
+        self._condition = asyncio.Condition()
+        self._idle: Dict[Hashable, List[Any]] = {}
+        self._counts: Dict[Hashable, int] = {}
+
+        self.stats = {
+            "checkouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+        self.logger = logging.getLogger(__name__)
+
+    @asynccontextmanager
+    async def checkout(self, key: Hashable):
+        """
+        Borrow an object for the duration of an async with-block.
+
+        Raises:
+            asyncio.TimeoutError: If no object became available in time
+        """
+        started = time.perf_counter()
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(
+                        lambda: self._idle.get(key) or self._counts.get(key, 0) < self.max_size
+                    ),
+                    self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise
+
+            if self._idle.get(key):
+                obj = self._idle[key].pop()
+            else:
+                self._counts[key] = self._counts.get(key, 0) + 1
+                obj = None
+
+            wait_seconds = time.perf_counter() - started
+            self.stats["checkouts"] += 1
+            if wait_seconds > 0.001:
+                self.stats["waits"] += 1
+                self.stats["total_wait_seconds"] += wait_seconds
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait_seconds)
+
+        if obj is None:
+            try:
+                obj = self.factory(key)
+            except BaseException:
+                await self._discard(key)
+                raise
+            self.stats["created"] += 1
+
+        try:
+            yield obj
+        except BaseException:
+            await self._discard(key)
+            if self.on_discard:
+                self.on_discard(obj)
+            raise
+        else:
+            async with self._condition:
+                self._idle.setdefault(key, []).append(obj)
+                self._condition.notify()
+
+    async def warm(self, keys: Iterable[Hashable], count: int = 1):
+        """
+        Pre-build idle objects so the first requests skip construction.
+
+        Args:
+            keys (Iterable): Keys to warm
+            count (int): Objects to build per key (capped at max_size)
+        """
+        for key in keys:
+            async with self._condition:
+                missing = max(min(count, self.max_size) - self._counts.get(key, 0), 0)
+                self._counts[key] = self._counts.get(key, 0) + missing
+
+            for _ in range(missing):
+                try:
+                    obj = self.factory(key)
+                except Exception as e:
+                    self.logger.error(f"Error warming {self.name} for {key}: {e}")
+                    await self._discard(key)
+                    continue
+                async with self._condition:
+                    self.stats["created"] += 1
+                    self._idle.setdefault(key, []).append(obj)
+                    self._condition.notify()
+
+    async def _discard(self, key: Hashable):
+        async with self._condition:
+            self._counts[key] -= 1
+            self.stats["discarded"] += 1
+            self._condition.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool counters and occupancy.
+
+        Returns:
+            dict: Checkout/creation/wait counters plus in-use object count
+        """
+        stats = dict(self.stats)
+        stats["max_size"] = self.max_size
+        stats["objects"] = sum(self._counts.values())
+        stats["idle"] = sum(len(idle) for idle in self._idle.values())
+        stats["avg_wait_seconds"] = (
+            stats["total_wait_seconds"] / stats["waits"] if stats["waits"] else 0.0
+        )
+        return stats
+
+
+class AsyncSynthesizer:
+    """
+    Device-less synthesizer whose SDK events resolve asyncio futures.
+
+    The ResultFuture returned by speak_text_async() only offers a blocking
+    get(), so completion is observed through the synthesis_completed /
+    synthesis_canceled events instead and handed to the event loop with
+    call_soon_threadsafe(). No thread is held while Azure is working.
+    """
+
+    def __init__(self, speech_config: speechsdk.SpeechConfig, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+
+        self._future: Optional[asyncio.Future] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+        self.synthesizer.synthesizing.connect(self._on_synthesizing)
+        self.synthesizer.synthesis_completed.connect(self._on_finished)
+        self.synthesizer.synthesis_canceled.connect(self._on_finished)
+
+    def _on_synthesizing(self, evt):
+        queue = self._queue
+        if queue is not None and evt.result.audio_data:
+            self.loop.call_soon_threadsafe(queue.put_nowait, evt.result.audio_data)
+
+    def _on_finished(self, evt):
+        result = evt.result
+        if self._queue is not None:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, result)
+        if self._future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self._future, result)
+
+    async def speak(self, text: str) -> speechsdk.SpeechSynthesisResult:
+        """
+        Synthesize text and return the final SDK result.
+
+        Args:
+            text (str): Text to synthesize
+
+        Returns:
+            SpeechSynthesisResult: Completed or canceled result
+        """
+        self._future = self.loop.create_future()
+        try:
+            self.synthesizer.speak_text_async(text)
+            return await self._future
+        finally:
+            self._future = None
+
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Synthesize text and yield audio chunks from the synthesizing event.
+
+        Raises:
+            RuntimeError: If synthesis is canceled
+        """
+        self._queue = asyncio.Queue()
+        try:
+            self.synthesizer.speak_text_async(text)
+            while True:
+                item = await self._queue.get()
+                if isinstance(item, bytes):
+                    yield item
+                    continue
+                if item.reason == speechsdk.ResultReason.Canceled:
+                    details = item.cancellation_details
+                    raise RuntimeError(f"Speech synthesis canceled: {details.error_details or details.reason}")
+                return
+        finally:
+            self._queue = None
+
+
+def _resolve(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class AsyncVoiceService:
+    """
+    Awaitable synthesis and recognition on top of an AzureVoiceService.
+
+    Reuses the service's credentials and default settings, but keeps its own
+    event-bridged synthesizer pool so requests only hold a coroutine.
+    """
+
+    def __init__(self, voice_service, pool_size: int = 64):
+        """
+        Initialize the async service.
+
+        Args:
+            voice_service (AzureVoiceService): Service providing credentials and defaults
+            pool_size (int): Event-bridged synthesizers per (voice, output format)
+        """
+        self.voice_service = voice_service
+        self.subscription_key = voice_service.subscription_key
+        self.region = voice_service.region
+        self.loop = asyncio.get_running_loop()
+
+        # Pre-opened and kept alive by the TTS backend's keeper, like the blocking pool's synthesizers
+        self.connections = voice_service.tts.connections
+        self.synthesizer_pool = AsyncObjectPool(
+            self._create_synthesizer,
+            max_size=pool_size,
+            name="async-synthesizer",
+            on_discard=self.connections.untrack if self.connections is not None else None
+        )
+
+        self.logger = logging.getLogger(__name__)
+
+    def _create_synthesizer(self, key: tuple) -> AsyncSynthesizer:
+        voice_name, output_format = key
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.subscription_key,
+            region=self.region
+        )
+        speech_config.speech_synthesis_voice_name = voice_name
+        speech_config.set_speech_synthesis_output_format(output_format)
+        synthesizer = AsyncSynthesizer(speech_config, self.loop)
+        if self.connections is not None:
+            self.connections.track(
+                synthesizer, speechsdk.Connection.from_speech_synthesizer(synthesizer.synthesizer)
+            )
+        return synthesizer
+
+    async def warm_up(self, voices: Optional[list] = None, output_format: str = DEFAULT_OUTPUT_FORMAT):
+        """
+        Pre-build event-bridged synthesizers (connections opened) for the first requests.
+
+        Args:
+            voices (list, optional): Voices to warm, defaults to both Moroccan voices
+            output_format (str): Output format name to warm
+        """
+        voices = voices or ["ar-MA-MounaNeural", "ar-MA-JamalNeural"]
+        sdk_format = getattr(speechsdk.SpeechSynthesisOutputFormat, get_output_format(output_format).sdk_format)
+        await self.synthesizer_pool.warm([(voice, sdk_format) for voice in voices])
+        self.logger.info(f"Warmed async synthesizer pool for voices: {', '.join(voices)}")
+
+    async def synthesize(self, text: str, voice: str, audio_format: AudioOutputFormat) -> Optional[bytes]:
+        """
+        Convert text to speech without blocking the event loop.
+
+        Returns:
+            bytes: Audio data in the requested format or None if synthesis failed
+        """
+        key = (voice, getattr(speechsdk.SpeechSynthesisOutputFormat, audio_format.sdk_format))
+        async with self.synthesizer_pool.checkout(key) as synthesizer:
+            result = await synthesizer.speak(text)
+
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            self.logger.info(f"Synthesized {len(result.audio_data)} bytes for text: '{text[:50]}...'")
+            return result.audio_data
+
+        details = result.cancellation_details
+        self.logger.error(f"Speech synthesis canceled: {details.reason}")
+        if details.error_details:
+            self.logger.error(f"Error details: {details.error_details}")
+        return None
+
+    async def stream(self, text: str, voice: str, audio_format: AudioOutputFormat) -> AsyncIterator[bytes]:
+        """
+        Yield audio chunks as Azure produces them (raw PCM for WAV formats).
+
+        Raises:
+            RuntimeError: If synthesis is canceled
+        """
+        key = (voice, getattr(speechsdk.SpeechSynthesisOutputFormat, audio_format.stream_sdk_format))
+        async with self.synthesizer_pool.checkout(key) as synthesizer:
+            async for chunk in synthesizer.stream(text):
+                yield chunk
+
+    async def recognize_stream(self, chunks: AsyncIterator[bytes], language: str,
+                               sample_rate: int = 16000, timeout: float = 30.0) -> Optional[str]:
+        """
+        Recognize audio arriving from an async iterator (e.g. a request body).
+
+        The push-stream session reports its end through on_stopped, which
+        resolves an asyncio future, so no thread waits on the recognizer.
+
+        Returns:
+            str: Recognized text or None if recognition failed
+        """
+        done = self.loop.create_future()
+        recognition = None
+        header = b''
+        try:
+            async for chunk in chunks:
+                if recognition is None:
+                    header += chunk
+                    stream_format = detect_stream_format(header, sample_rate)
+                    if stream_format is None:
+                        continue
+                    rate, bits, channels, data_offset = stream_format
+
+                    recognition = self.voice_service.stt.create_push_recognition(
+                        language, sample_rate=rate, bits_per_sample=bits, channels=channels,
+                        on_stopped=lambda: self.loop.call_soon_threadsafe(_resolve, done, None)
+                    )
+                    recognition.start(wait=False)
+                    chunk = header[data_offset:]
+
+                recognition.write(chunk)
+
+            if recognition is None:
+                self.logger.warning("No audio received for recognition")
+                return None
+
+            recognition.close()
+            try:
+                await asyncio.wait_for(asyncio.shield(done), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning("Timed out waiting for push-stream recognition to finish")
+
+            if recognition.error:
+                self.logger.error(f"Stream recognition failed: {recognition.error}")
+            return " ".join(recognition.results) if recognition.results else None
+
+        finally:
+            if recognition is not None:
+                recognition.stop(wait=False)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get async synthesizer pool metrics."""
+        return {"async_synthesizers": self.synthesizer_pool.get_stats()}
+
+
+class ThreadedAsyncVoiceService(AsyncVoiceService):
+    """
+    AsyncVoiceService for backends without SDK events (e.g. the offline fake).
+
+    Synthesis calls the backend's blocking methods on worker threads;
+    recognition already goes through the backend's push-stream sessions.
+    """
+
+    async def warm_up(self, voices: Optional[list] = None, output_format: str = DEFAULT_OUTPUT_FORMAT):
+        """Nothing to do: synthesis uses the backend's own pool, warmed by AzureVoiceService.warm_up()."""
+
+    async def synthesize(self, text: str, voice: str, audio_format: AudioOutputFormat) -> Optional[bytes]:
+        """
+        Convert text to speech on a worker thread.
+
+        Returns:
+            bytes: Audio data in the requested format or None if synthesis failed
+        """
+        return await asyncio.to_thread(
+            self.voice_service.tts.synthesize_to_bytes, text, voice, audio_format.name
+        )
+
+    async def stream(self, text: str, voice: str, audio_format: AudioOutputFormat) -> AsyncIterator[bytes]:
+        """
+        Yield audio chunks from the backend's blocking stream, one thread hop per chunk.
+
+        Raises:
+            RuntimeError: If synthesis fails after audio started flowing
+        """
+        loop = asyncio.get_running_loop()
+        chunks = self.voice_service.tts.stream_text(text, voice=voice, output_format=audio_format.name)
+        pending = None
+
+        def close_when_idle(future):
+            if not future.cancelled():
+                # Retrieved so a chunk that failed after the consumer left is not logged as unhandled
+                future.exception()
+            loop.run_in_executor(None, chunks.close)
+
+        try:
+            while True:
+                # Shielded so a cancelled consumer leaves the future tracking the thread's next()
+                pending = loop.run_in_executor(None, next, chunks, None)
+                chunk = await asyncio.shield(pending)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            if pending is not None and not pending.done():
+                # close() raises "generator already executing" while a worker thread is inside
+                # next(chunks), so close once that call has returned
+                pending.add_done_callback(close_when_idle)
+            else:
+                chunks.close()
@@ -0,0 +1,249 @@
+import os
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+from metrics import observe_stage, stage_timer
+from audio_formats import (
+    DEFAULT_OUTPUT_FORMAT, DEFAULT_SAMPLE_RATE, DEFAULT_BITS_PER_SAMPLE, DEFAULT_CHANNELS,
+    detect_stream_format
+)
+
+
+class TextToSpeechBackend(ABC):
+    """
+    Synthesis operations the voice service and the API servers rely on.
+
+    Implementations keep a `synthesizer_pool` (a SpeechObjectPool) so pool
+    warm-up and /pool-stats work the same for every backend, and may set
+    `connections` to a ConnectionKeeper for their pooled objects.
+    """
+
+    connections = None
+
+    def check_connection(self, timeout: float = 5.0):
+        """Raise if the synthesis service cannot be reached (used by the health probe)."""
+
+    @abstractmethod
+    def set_voice(self, voice_name: str):
+        """Set the default voice."""
+
+    @abstractmethod
+    def pool_key(self, voice: Optional[str] = None, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                 streaming: bool = False) -> tuple:
+        """Get the synthesizer pool key for a voice and output format."""
+
+    @abstractmethod
+    def speak_text(self, text: str, voice: Optional[str] = None) -> bool:
+        """Synthesize text and play it through the speakers."""
+
+    @abstractmethod
+    def speak_segments(self, segments: List[str], voice: Optional[str] = None) -> bool:
+        """Play text segments through the speakers back to back."""
+
+    @abstractmethod
+    def text_to_audio_file(self, text: str, output_file: str) -> bool:
+        """Synthesize text into a WAV file."""
+
+    @abstractmethod
+    def synthesize_to_bytes(self, text: str, voice: Optional[str] = None,
+                            output_format: str = DEFAULT_OUTPUT_FORMAT) -> Optional[bytes]:
+        """Synthesize text and return the audio, or None on failure."""
+
+    @abstractmethod
+    def stream_text(self, text: str, chunk_size: int = 4096,
+                    voice: Optional[str] = None,
+                    output_format: str = DEFAULT_OUTPUT_FORMAT) -> Iterator[bytes]:
+        """Yield audio chunks as they are synthesized (raw PCM for WAV formats)."""
+
+
+class SpeechToTextBackend(ABC):
+    """
+    Recognition operations the voice service and the API servers rely on.
+
+    Implementations keep a `recognizer_pool` (a SpeechObjectPool) and return
+    push-stream sessions with the PushStreamRecognition interface: start(),
+    write(), close(), wait(), stop(), results, error, finished.
+    """
+
+    connections = None
+
+    def warm(self, languages: Iterable[str], count: int = 1):
+        """
+        Pre-build microphone recognizers so the first requests skip setup.
+
+        Args:
+            languages (Iterable[str]): Recognition languages to warm
+            count (int): Recognizers to build per language
+        """
+        self.recognizer_pool.warm([(language, "microphone") for language in languages], count)
+
+    @abstractmethod
+    def set_language(self, language_code: str):
+        """Set the default recognition language."""
+
+    @abstractmethod
+    def recognize_once(self, language: Optional[str] = None) -> Optional[str]:
+        """Recognize a single utterance from the microphone."""
+
+    @abstractmethod
+    def test_microphone(self) -> bool:
+        """Check that audio input works."""
+
+    @abstractmethod
+    def create_push_recognition(self, language: Optional[str] = None,
+                                sample_rate: int = DEFAULT_SAMPLE_RATE,
+                                bits_per_sample: int = DEFAULT_BITS_PER_SAMPLE,
+                                channels: int = DEFAULT_CHANNELS,
+                                on_recognized: Optional[Callable[[str], None]] = None,
+                                on_recognizing: Optional[Callable[[str], None]] = None,
+                                on_stopped: Optional[Callable[[], None]] = None):
+        """Create a recognition session that is fed audio by the caller."""
+
+    def recognize_stream(self, chunks: Iterable[bytes], language: Optional[str] = None,
+                         sample_rate: int = DEFAULT_SAMPLE_RATE,
+                         timeout: float = 30.0) -> Optional[str]:
+        """
+        Recognize speech from audio that arrives in chunks (e.g. an upload).
+
+        WAV input is detected from its RIFF header and the PCM format is taken
+        from it; anything else is treated as raw 16-bit mono PCM at sample_rate.
+        Chunks are pushed into the recognizer as soon as they are received.
+
+        Args:
+            chunks (Iterable[bytes]): Audio data in arrival order
+            language (str, optional): Language for this call only, defaults to the current language
+            sample_rate (int): Sample rate for raw PCM input
+            timeout (float): Seconds to wait for results after the last chunk
+
+        Returns:
+            str: Recognized text or None if recognition failed
+        """
+        recognition = None
+        try:
+            started = time.perf_counter()
+            header = b''
+            for chunk in chunks:
+                if recognition is None:
+                    header += chunk
+                    stream_format = detect_stream_format(header, sample_rate)
+                    if stream_format is None:
+                        continue
+                    rate, bits, channels, data_offset = stream_format
+
+                    recognition = self.create_push_recognition(
+                        language, sample_rate=rate, bits_per_sample=bits, channels=channels
+                    )
+                    recognition.start()
+                    self.logger.info(f"Recognizing streamed audio ({rate} Hz, {bits}-bit, {channels} ch)")
+                    chunk = header[data_offset:]
+
+                recognition.write(chunk)
+
+            if recognition is None:
+                self.logger.warning("No audio received for recognition")
+                return None
+
+            # Upload time overlaps recognition; finalize is what the client waits for afterwards
+            observe_stage("stt", "upload", time.perf_counter() - started)
+            recognition.close()
+            with stage_timer("stt", "finalize"):
+                text = recognition.wait(timeout)
+
+            if text:
+                self.logger.info(f"Recognized from stream: {text}")
+            elif recognition.error:
+                self.logger.error(f"Stream recognition failed: {recognition.error}")
+            else:
+                self.logger.warning("No speech could be recognized from stream")
+            return text
+
+        except Exception as e:
+            self.logger.error(f"Error recognizing from stream: {str(e)}")
+            if recognition is not None:
+                recognition.stop()
+            return None
+
+
+class SpeechBackend(NamedTuple):
+    """A synthesis and a recognition implementation used together."""
+    name: str
+    tts: TextToSpeechBackend
+    stt: SpeechToTextBackend
+
+
+def create_azure_backend(subscription_key: str, region: str, pool_size: int = 4,
+                         keepalive_interval: float = 60.0, standby_size: int = 2) -> SpeechBackend:
+    """
+    Create the Azure Speech Service backend.
+
+    The Speech SDK is only imported here, so the offline fake runs on
+    machines where it is not installed.
+
+    Args:
+        subscription_key (str): Azure Speech Service subscription key
+        region (str): Azure region (e.g., 'eastus', 'westus2')
+        pool_size (int): Warm synthesizers/recognizers kept per voice or language
+        keepalive_interval (float): Seconds between re-opening dropped pooled connections
+        standby_size (int): Push-stream recognition sessions kept ready per warmed language
+
+    Returns:
+        SpeechBackend: Azure TTS and STT
+    """
+    from azure_tts import AzureTextToSpeech
+    from azure_stt import AzureSpeechToText
+
+    return SpeechBackend(
+        "azure",
+        AzureTextToSpeech(subscription_key, region, pool_size=pool_size,
+                          keepalive_interval=keepalive_interval),
+        AzureSpeechToText(subscription_key, region, pool_size=pool_size,
+                          keepalive_interval=keepalive_interval, standby_size=standby_size)
+    )
+
+
+def create_speech_backend_from_env() -> Optional[SpeechBackend]:
+    """
+    Create the speech backend selected by environment variables.
+
+    Optional environment variables:
+    - ATLAS_SPEECH_BACKEND: "azure" (default) or "fake" for the offline fake backend
+    - ATLAS_SPEECH_POOL_SIZE: Warm synthesizers/recognizers per voice or language (default: 4)
+    - ATLAS_SPEECH_KEEPALIVE_INTERVAL: Seconds between re-opening dropped Azure connections (default: 60)
+    - ATLAS_SPEECH_STANDBY_SIZE: Azure push-stream recognition sessions kept ready per language (default: 2)
+
+    The Azure backend additionally requires AZURE_SPEECH_KEY and
+    AZURE_SPEECH_REGION; the fake backend is configured by the ATLAS_FAKE_*
+    variables described in fake_speech.create_fake_backend_from_env().
+
+    Returns:
+        SpeechBackend: Configured backend or None if required env vars are missing
+    """
+    backend_name = os.getenv('ATLAS_SPEECH_BACKEND', 'azure').lower()
+    pool_size = int(os.getenv('ATLAS_SPEECH_POOL_SIZE', '4'))
+
+    if backend_name == 'fake':
+        from fake_speech import create_fake_backend_from_env
+        return create_fake_backend_from_env(pool_size=pool_size)
+
+    if backend_name != 'azure':
+        logging.getLogger(__name__).error(f"Unknown speech backend: {backend_name}")
+        return None
+
+    subscription_key = os.getenv('AZURE_SPEECH_KEY')
+    region = os.getenv('AZURE_SPEECH_REGION')
+
+    if not subscription_key or not region:
+        print("Error: Missing environment variables!")
+        print("Please set:")
+        print("- AZURE_SPEECH_KEY: Your Azure Speech Service subscription key")
+        print("- AZURE_SPEECH_REGION: Your Azure region (e.g., 'eastus')")
+        print("Or set ATLAS_SPEECH_BACKEND=fake to run without Azure")
+        return None
+
+    return create_azure_backend(
+        subscription_key, region, pool_size=pool_size,
+        keepalive_interval=float(os.getenv('ATLAS_SPEECH_KEEPALIVE_INTERVAL', '60')),
+        standby_size=int(os.getenv('ATLAS_SPEECH_STANDBY_SIZE', '2'))
+    )
@@ -0,0 +1,279 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class _KeptConnection:
+    """State of one pre-opened SDK connection."""
+
+    def __init__(self, connection, for_continuous_recognition: bool):
+        self.connection = connection
+        self.for_continuous_recognition = for_continuous_recognition
+        self.connected = False
+
+
+class ConnectionKeeper:
+    """
+    Pre-opens and keeps alive the service connections of pooled SDK objects.
+
+    A synthesizer or recognizer normally connects (TLS + WebSocket
+    handshake) on its first request. track() opens the connection as soon
+    as the object is built, and a background thread re-opens connections
+    the service has dropped (idle timeout, network blip) so the next
+    request finds them ready. The SDK has no explicit ping, so re-opening
+    on each interval is what keeps the connection alive.
+    """
+
+    def __init__(self, name: str = "connections", interval: float = 60.0):
+        """
+        Initialize the keeper.
+
+        Args:
+            name (str): Name used in logs and stats
+            interval (float): Seconds between checks for dropped connections
+        """
+        self.name = name
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._entries: Dict[int, _KeptConnection] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "opened": 0,
+            "reconnects": 0,
+            "open_failures": 0,
+            "drops": 0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def track(self, owner: Any, connection, for_continuous_recognition: bool = False):
+        """
+        Open a connection for a pooled object and keep it open.
+
+        Args:
+            owner: The synthesizer/recognizer the connection belongs to
+            connection (speechsdk.Connection): Connection created from owner
+            for_continuous_recognition (bool): Passed to Connection.open()
+        """
+        entry = _KeptConnection(connection, for_continuous_recognition)
+        connection.connected.connect(lambda evt: self._mark(entry, True))
+        connection.disconnected.connect(lambda evt: self._mark(entry, False))
+
+        with self._lock:
+            self._entries[id(owner)] = entry
+        self._open(entry)
+
+    def untrack(self, owner: Any):
+        """
+        Stop keeping a connection open (e.g. the pool discarded its object).
+
+        Args:
+            owner: Object passed to track()
+        """
+        with self._lock:
+            entry = self._entries.pop(id(owner), None)
+            if entry is not None:
+                # A deliberate close is not a drop
+                entry.connected = False
+        if entry is not None:
+            try:
+                entry.connection.close()
+            except Exception as e:
+                self.logger.debug(f"Error closing {self.name} connection: {e}")
+
+    def _mark(self, entry: _KeptConnection, connected: bool):
+        with self._lock:
+            if entry.connected and not connected:
+                self.stats["drops"] += 1
+            entry.connected = connected
+
+    def _open(self, entry: _KeptConnection, reconnect: bool = False) -> bool:
+        try:
+            entry.connection.open(entry.for_continuous_recognition)
+        except Exception as e:
+            with self._lock:
+                self.stats["open_failures"] += 1
+            self.logger.warning(f"Could not open {self.name} connection: {e}")
+            return False
+        with self._lock:
+            self.stats["reconnects" if reconnect else "opened"] += 1
+        return True
+
+    def refresh(self):
+        """Re-open every tracked connection that is currently closed."""
+        with self._lock:
+            dropped = [entry for entry in self._entries.values() if not entry.connected]
+        for entry in dropped:
+            self._open(entry, reconnect=True)
+        if dropped:
+            self.logger.info(f"Re-opened {len(dropped)} dropped {self.name} connection(s)")
+
+    def start(self):
+        """Start re-opening dropped connections in the background."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f"Error refreshing {self.name} connections: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get connection counters.
+
+        Returns:
+            dict: Tracked/connected counts plus open, reconnect, failure and drop counters
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tracked"] = len(self._entries)
+            stats["connected"] = sum(1 for entry in self._entries.values() if entry.connected)
+        return stats
+
+
+class HealthProbe:
+    """
+    Periodically checks that the speech service is reachable.
+
+    The result is cached, so /health answers instantly and never opens a
+    connection itself. After failure_threshold consecutive failures the
+    status changes from "degraded" to "down".
+    """
+
+    def __init__(self, check: Callable[[float], None], interval: float = 30.0,
+                 timeout: float = 5.0, failure_threshold: int = 3):
+        """
+        Initialize the probe.
+
+        Args:
+            check (Callable): check(timeout) raises if the service is unreachable
+            interval (float): Seconds between probes
+            timeout (float): Seconds a single probe may take
+            failure_threshold (int): Consecutive failures before reporting "down"
+        """
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._status = {
+            "status": "unknown",
+            "last_probe": None,
+            "last_success": None,
+            "latency_ms": None,
+            "consecutive_failures": 0,
+            "error": None,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def probe_once(self):
+        """Run one probe and update the cached status."""
+        started = time.perf_counter()
+        try:
+            self.check(self.timeout)
+        except Exception as e:
+            with self._lock:
+                failures = self._status["consecutive_failures"] + 1
+                self._status.update({
+                    "status": "down" if failures >= self.failure_threshold else "degraded",
+                    "last_probe": time.time(),
+                    "consecutive_failures": failures,
+                    "error": str(e) or type(e).__name__,
+                })
+            self.logger.warning(f"Speech service probe failed ({failures} in a row): {e}")
+            return
+
+        with self._lock:
+            now = time.time()
+            self._status.update({
+                "status": "ok",
+                "last_probe": now,
+                "last_success": now,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "consecutive_failures": 0,
+                "error": None,
+            })
+
+    def start(self):
+        """Probe once right away, then keep probing in the background."""
+        if self._thread is not None:
+            return
+        self.probe_once()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="speech-health-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.probe_once()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the cached probe result.
+
+        Returns:
+            dict: status ("ok", "degraded", "down" or "unknown"), timestamps, latency and last error
+        """
+        with self._lock:
+            status = dict(self._status)
+        status["age_seconds"] = (
+            round(time.time() - status["last_probe"], 1) if status["last_probe"] else None
+        )
+        return status
+
+
+def create_health_probe_from_env(check: Callable[[float], None]) -> Optional[HealthProbe]:
+    """
+    Create HealthProbe instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_HEALTH_PROBE_INTERVAL: Seconds between probes (default: 30, 0 disables probing)
+    - ATLAS_HEALTH_PROBE_TIMEOUT: Seconds a probe may take (default: 5)
+
+    Args:
+        check (Callable): check(timeout) raising if the service is unreachable
+
+    Returns:
+        HealthProbe: Configured probe (not started) or None if disabled
+    """
+    interval = float(os.getenv('ATLAS_HEALTH_PROBE_INTERVAL', '30'))
+    if interval <= 0:
+        return None
+    return HealthProbe(
+        check,
+        interval=interval,
+        timeout=float(os.getenv('ATLAS_HEALTH_PROBE_TIMEOUT', '5'))
+    )
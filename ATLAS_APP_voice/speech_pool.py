@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from metrics import observe_stage
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no pooled object became available in time."""
+
+
+class SpeechObjectPool:
+    """
+    Keyed pool of reusable Azure SDK objects (synthesizers, recognizers).
+
+    Each key (for example (voice, output format)) gets its own set of warm
+    objects, capped at max_size. A checkout hands an object to exactly one
+    request at a time, so per-request settings never leak between threads.
+    """
+
+    def __init__(self, factory: Callable[[Hashable], Any], max_size: int = 4,
+                 timeout: Optional[float] = 30.0, name: str = "speech-pool",
+                 on_discard: Optional[Callable[[Any], None]] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            factory (Callable): Builds a new object for a key
+            max_size (int): Maximum objects per key (idle + checked out)
+            timeout (float, optional): Default seconds to wait for a free object
+            name (str): Pool name used in logs
+            on_discard (Callable, optional): Called with objects dropped after an error
+        """
+        self.factory = factory
+        self.on_discard = on_discard
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.name = name
+
+        self._condition = threading.Condition()
+        self._idle: Dict[Hashable, List[Any]] = {}
+        self._counts: Dict[Hashable, int] = {}
+
+        self.stats = {
+            "checkouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def warm(self, keys: Iterable[Hashable], count: int = 1):
+        """
+        Pre-build idle objects so the first requests skip construction.
+
+        Args:
+            keys (Iterable): Keys to warm
+            count (int): Objects to build per key (capped at max_size)
+        """
+        for key in keys:
+            with self._condition:
+                missing = min(count, self.max_size) - self._counts.get(key, 0)
+                self._counts[key] = self._counts.get(key, 0) + max(missing, 0)
+
+            for _ in range(max(missing, 0)):
+                try:
+                    obj = self.factory(key)
+                except Exception as e:
+                    self.logger.error(f"Error warming {self.name} for {key}: {e}")
+                    with self._condition:
+                        self._counts[key] -= 1
+                        self._condition.notify_all()
+                    continue
+
+                with self._condition:
+                    self.stats["created"] += 1
+                    self._idle.setdefault(key, []).append(obj)
+                    self._condition.notify_all()
+
+    @contextmanager
+    def checkout(self, key: Hashable, timeout: Optional[float] = None):
+        """
+        Borrow an object for the duration of a with-block.
+
+        Objects are returned to the pool on normal exit and discarded if the
+        block raises, since the SDK object may be left mid-operation.
+
+        Args:
+            key (Hashable): Pool key
+            timeout (float, optional): Seconds to wait, defaults to the pool timeout
+
+        Yields:
+            The pooled object
+
+        Raises:
+            PoolTimeoutError: If no object became available in time
+        """
+        obj = self._acquire(key, self.timeout if timeout is None else timeout)
+        try:
+            yield obj
+        except BaseException:
+            self._discard(key)
+            if self.on_discard:
+                self.on_discard(obj)
+            raise
+        else:
+            self._release(key, obj)
+
+    def _acquire(self, key: Hashable, timeout: Optional[float]) -> Any:
+        started = time.perf_counter()
+        waited = False
+
+        with self._condition:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    obj = idle.pop()
+                    break
+
+                if self._counts.get(key, 0) < self.max_size:
+                    # Reserve the slot, then build outside the lock
+                    self._counts[key] = self._counts.get(key, 0) + 1
+                    obj = None
+                    break
+
+                waited = True
+                remaining = None if timeout is None else timeout - (time.perf_counter() - started)
+                if remaining is not None and remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"No {self.name} object available for {key}")
+                self._condition.wait(remaining)
+
+            wait_seconds = time.perf_counter() - started
+            self.stats["checkouts"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["total_wait_seconds"] += wait_seconds
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait_seconds)
+        observe_stage(self.name, "checkout_wait", wait_seconds)
+
+        if obj is None:
+            started = time.perf_counter()
+            try:
+                obj = self.factory(key)
+            except BaseException:
+                self._discard(key)
+                raise
+            observe_stage(self.name, "construction", time.perf_counter() - started)
+            with self._condition:
+                self.stats["created"] += 1
+
+        return obj
+
+    def _release(self, key: Hashable, obj: Any):
+        with self._condition:
+            self._idle.setdefault(key, []).append(obj)
+            self._condition.notify()
+
+    def _discard(self, key: Hashable):
+        with self._condition:
+            self._counts[key] -= 1
+            self.stats["discarded"] += 1
+            self._condition.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool counters and occupancy.
+
+        Returns:
+            dict: Checkout/creation/wait counters plus per-key object counts
+        """
+        with self._condition:
+            stats = dict(self.stats)
+            stats["max_size"] = self.max_size
+            stats["keys"] = {
+                "/".join(str(part) for part in (key if isinstance(key, tuple) else (key,))): {
+                    "total": count,
+                    "idle": len(self._idle.get(key, [])),
+                    "in_use": count - len(self._idle.get(key, [])),
+                }
+                for key, count in self._counts.items()
+            }
+        stats["avg_wait_seconds"] = (
+            stats["total_wait_seconds"] / stats["waits"] if stats["waits"] else 0.0
+        )
+        return stats
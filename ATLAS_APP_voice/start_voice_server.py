@@ -6,11 +6,20 @@ Run this before using the Flutter voice chat feature
 
 import os
 import sys
+import argparse
 import subprocess
 from pathlib import Path
 
+def uses_fake_backend():
+    """True when the offline fake speech backend is selected"""
+    return os.getenv('ATLAS_SPEECH_BACKEND', 'azure').lower() == 'fake'
+
 def check_environment():
     """Check if required environment variables are set"""
+    if uses_fake_backend():
+        print("ℹ️  ATLAS_SPEECH_BACKEND=fake: using the offline fake speech backend")
+        return True
+    
     required_vars = ['AZURE_SPEECH_KEY', 'AZURE_SPEECH_REGION']
     missing_vars = []
     
@@ -33,12 +42,16 @@ def check_environment():
     
     return True
 
-def check_dependencies():
+def check_dependencies(use_async=False):
     """Check if required Python packages are installed"""
     try:
-        import azure.cognitiveservices.speech
+        if use_async or not uses_fake_backend():
+            import azure.cognitiveservices.speech
         import flask
         import flask_cors
+        import flask_sock
+        if use_async:
+            import aiohttp
         print("✅ All required packages are installed")
         return True
     except ImportError as e:
@@ -47,8 +60,36 @@ def check_dependencies():
         print("pip install -r requirements.txt")
         return False
 
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Start the Azure Voice Services API server")
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="Serve with the asyncio server (async_voice_api.py) instead of Flask"
+    )
+    parser.add_argument(
+        "--prefork", action="store_true",
+        help="Production mode: pre-fork worker processes sharing one socket (prefork_server.py)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes in --prefork mode (default: CPU count)"
+    )
+    return parser.parse_args()
+
 def main():
     """Main startup function"""
+    args = parse_args()
+    server_script = "async_voice_api.py" if args.use_async else "flask_voice_api.py"
+    command = [sys.executable, server_script]
+    if args.prefork or args.workers:
+        server_script = "prefork_server.py"
+        command = [sys.executable, server_script]
+        if args.use_async:
+            command.append("--async")
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+    
     print("🎙️ Azure Voice Services - Startup Script")
     print("=" * 50)
     
@@ -85,18 +126,18 @@ def main():
     
     # Check dependencies
     print("\n📦 Checking dependencies...")
-    if not check_dependencies():
+    if not check_dependencies(args.use_async):
         return 1
     
-    # Start the Flask server
-    print("\n🚀 Starting Flask API server...")
+    # Start the API server
+    print(f"\n🚀 Starting API server ({server_script})...")
     print("📱 Flutter app will be able to connect to voice services")
     print("⏹️  Press Ctrl+C to stop the server")
     print("\n" + "=" * 50)
     
     try:
-        # Run the Flask app
-        subprocess.run([sys.executable, "flask_voice_api.py"])
+        # Run the API server
+        subprocess.run(command)
     except KeyboardInterrupt:
         print("\n\n⏹️  Server stopped by user")
         print("👋 Goodbye!")
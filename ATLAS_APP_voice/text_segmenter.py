@@ -0,0 +1,76 @@
+import re
+from typing import List
+
+# Sentence-ending punctuation (Latin and Arabic) followed by whitespace, or a line break
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?؟؛…])\s+|\n+')
+
+# Weaker boundaries used only to break up sentences that are still too long
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,،:;])\s+')
+
+# Numbered-list markers such as "1." or "٣." that belong to the next sentence
+LIST_MARKER = re.compile(r'^[0-9٠-٩]+[.)]$')
+
+
+def split_sentences(text: str, min_chars: int = 20, max_chars: int = 300) -> List[str]:
+    """
+    Split text into segments that can be synthesized independently.
+
+    Splits at Latin and Arabic sentence punctuation (. ! ? ؟ ؛) and line
+    breaks. Fragments shorter than min_chars (list numbers like "1.", short
+    exclamations) are merged into the following segment so each request
+    carries natural prosody; segments longer than max_chars are split again
+    at commas (، ,) and colons.
+
+    Args:
+        text (str): Text to split
+        min_chars (int): Minimum segment length before merging
+        max_chars (int): Length above which clause boundaries are used
+
+    Returns:
+        list: Non-empty segments in order
+    """
+    sentences = []
+    marker = ''
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if LIST_MARKER.match(sentence):
+            marker = f"{marker} {sentence}" if marker else sentence
+            continue
+        sentences.append(f"{marker} {sentence}" if marker else sentence)
+        marker = ''
+    if marker:
+        sentences.append(marker)
+
+    pieces = []
+    for sentence in sentences:
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        current = ''
+        for clause in CLAUSE_BOUNDARY.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            pieces.append(current)
+
+    segments = []
+    pending = ''
+    for piece in pieces:
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            segments.append(pending)
+            pending = ''
+
+    if pending:
+        if segments and len(segments[-1]) + len(pending) + 1 <= max_chars:
+            segments[-1] = f"{segments[-1]} {pending}"
+        else:
+            segments.append(pending)
+
+    return segments
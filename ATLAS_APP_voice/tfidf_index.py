@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+TF-IDF vector index over the first-aid knowledge base.
+
+Chunks are stored as L2-normalized TF-IDF rows of one float32 matrix, so
+scoring a query is a single matrix-vector product followed by
+argpartition, and scoring many queries is one matrix multiply. The
+arrays are saved as .npy files and memory-mapped when opened: worker
+processes share the same pages and start without re-tokenizing the
+corpus. A fingerprint of the source files decides when to rebuild.
+
+Examples:
+    python tfidf_index.py --build
+    python tfidf_index.py questions.txt --k 3 > results.ndjson
+"""
+
+import os
+import sys
+import json
+import math
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from arabic_text import STEM_SIMILARITY, NGramIndex, tokenize
+from first_aid_retrieval import FUZZY_MATCHES, KnowledgeChunk, chunk_terms
+
+# Bump when chunking, tokenization or weighting changes so saved indexes are rebuilt
+FORMAT_VERSION = 3
+
+MANIFEST = "tfidf.json"
+
+logger = logging.getLogger(__name__)
+
+
+def _replace_file(path: str, write: Callable[[Any], None], binary: bool = True):
+    """
+    Write a file through a temp file and rename it into place.
+
+    The temp name is unique per process and thread (as in AudioCache.put),
+    so processes rebuilding the same index directory never share one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") if binary else open(tmp_path, "w", encoding="utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def sources_fingerprint(paths: Sequence[str]) -> str:
+    """
+    Hash the knowledge source files and the index format.
+
+    Args:
+        paths (Sequence[str]): Source files, in load order
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(f"tfidf-v{FORMAT_VERSION}".encode("utf-8"))
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first (argpartition, then sort only those k)."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[-1])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class TfidfIndex:
+    """
+    Chunks as rows of an L2-normalized TF-IDF matrix; cosine similarity for search.
+
+    Terms use sublinear term frequency (1 + log tf) and smoothed idf. Query
+    terms missing from the vocabulary are replaced by similar terms from a
+    character n-gram index, as in BM25Index.
+    """
+
+    def __init__(self, chunks: List[KnowledgeChunk], terms: List[str], idf: np.ndarray,
+                 matrix: np.ndarray, fuzzy_min_similarity: float = 0.6, fingerprint: Optional[str] = None):
+        """
+        Wrap built or loaded arrays.
+
+        Args:
+            chunks (list): Chunks in row order
+            terms (list): Vocabulary in column order
+            idf (np.ndarray): Inverse document frequency per term
+            matrix (np.ndarray): (chunks x terms) float32 matrix, possibly memory-mapped
+            fuzzy_min_similarity (float): Lowest n-gram similarity for replacing an unknown term,
+                0 disables fuzzy matching
+            fingerprint (str, optional): Fingerprint of the sources the arrays were built from
+        """
+        self.chunks = chunks
+        self.terms = terms
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+        self.idf = idf
+        self.matrix = matrix
+        self.fuzzy_min_similarity = fuzzy_min_similarity
+        self.fingerprint = fingerprint
+        self.ngrams = NGramIndex(terms)
+
+    @classmethod
+    def build(cls, chunks: List[KnowledgeChunk], fingerprint: Optional[str] = None,
+              term_counts: Optional[List[Counter]] = None) -> "TfidfIndex":
+        """
+        Tokenize chunks and compute the TF-IDF matrix.
+
+        Args:
+            chunks (list): Passages to index
+            fingerprint (str, optional): Fingerprint recorded with the arrays
+            term_counts (list, optional): chunk_terms() of every chunk, in order, when already computed
+
+        Returns:
+            TfidfIndex: Index held in memory
+        """
+        counts = term_counts if term_counts is not None else [chunk_terms(chunk) for chunk in chunks]
+        terms = sorted(set().union(*counts)) if counts else []
+        vocabulary = {term: column for column, term in enumerate(terms)}
+
+        matrix = np.zeros((len(chunks), len(terms)), dtype=np.float32)
+        for row, chunk_counts in enumerate(counts):
+            columns = [vocabulary[term] for term in chunk_counts]
+            matrix[row, columns] = 1.0 + np.log(np.fromiter(chunk_counts.values(), dtype=np.float32))
+
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((1.0 + len(chunks)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return cls(chunks, terms, idf, matrix, fingerprint=fingerprint)
+
+    def query_weights(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Turn a query into its non-zero TF-IDF weights, L2-normalized.
+
+        Args:
+            query (str): Free-text query
+
+        Returns:
+            tuple: (columns, weights) arrays, both empty if no term is known
+        """
+        weights: Dict[int, float] = {}
+        for term, frequency in Counter(tokenize(query)).items():
+            column = self.vocabulary.get(term)
+            if column is not None:
+                matches = [(column, 1.0)]
+                if self.fuzzy_min_similarity > 0:
+                    matches += [(self.vocabulary[variant], STEM_SIMILARITY) for variant in self.ngrams.variants(term)]
+            elif self.fuzzy_min_similarity > 0 and len(term) >= 3:
+                matches = [(self.vocabulary[match], similarity) for match, similarity in
+                           self.ngrams.lookup(term, limit=FUZZY_MATCHES, min_similarity=self.fuzzy_min_similarity)]
+            else:
+                continue
+            for column, similarity in matches:
+                weight = (1.0 + math.log(frequency)) * float(self.idf[column]) * similarity
+                weights[column] = max(weights.get(column, 0.0), weight)
+
+        columns = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+        values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        if len(values):
+            values /= np.linalg.norm(values)
+        return columns, values
+
+    def query_vector(self, query: str) -> np.ndarray:
+        """
+        Turn a query into a dense TF-IDF vector over the vocabulary.
+
+        Args:
+            query (str): Free-text query
+
+        Returns:
+            np.ndarray: float32 vector, all zeros if no term is known
+        """
+        vector = np.zeros(len(self.terms), dtype=np.float32)
+        columns, values = self.query_weights(query)
+        vector[columns] = values
+        return vector
+
+    def _results(self, scores: np.ndarray, k: int) -> List[tuple]:
+        return [(float(scores[row]), self.chunks[row]) for row in _top_k(scores, k) if scores[row] > 0]
+
+    def search(self, query: str, k: int = 3) -> List[tuple]:
+        """
+        Rank chunks by cosine similarity to the query.
+
+        Args:
+            query (str): Free-text query
+            k (int): Number of results
+
+        Returns:
+            list: (score, KnowledgeChunk) pairs, best first
+        """
+        columns, values = self.query_weights(query)
+        if not len(columns):
+            return []
+        # Only the query's columns can contribute, so multiply just that slice
+        return self._results(self.matrix[:, columns] @ values, k)
+
+    def search_batch(self, queries: Sequence[str], k: int = 3) -> List[List[tuple]]:
+        """
+        Rank chunks for many queries with one matrix multiply.
+
+        Args:
+            queries (Sequence[str]): Free-text queries
+            k (int): Number of results per query
+
+        Returns:
+            list: One result list per query, as returned by search()
+        """
+        if not queries:
+            return []
+        scores = np.stack([self.query_vector(query) for query in queries]) @ self.matrix.T
+        return [self._results(row, k) for row in scores]
+
+    def save(self, index_dir: str):
+        """
+        Write the arrays and metadata, replacing any previous version atomically.
+
+        Files are written under a name derived from the fingerprint and the
+        manifest is swapped last, so a process opening the index concurrently
+        sees either the old or the new version, never a mix.
+
+        Args:
+            index_dir (str): Target directory (created if missing)
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        prefix = f"tfidf-{(self.fingerprint or 'unversioned')[:16]}"
+        arrays = {"matrix": self.matrix, "idf": self.idf}
+        for name, array in arrays.items():
+            _replace_file(
+                os.path.join(index_dir, f"{prefix}.{name}.npy"),
+                lambda f: np.save(f, np.ascontiguousarray(array, dtype=np.float32))
+            )
+
+        metadata = {"terms": self.terms, "chunks": [chunk.to_dict() for chunk in self.chunks]}
+        manifest = {"format": FORMAT_VERSION, "fingerprint": self.fingerprint, "prefix": prefix}
+        for name, content in ((f"{prefix}.json", metadata), (MANIFEST, manifest)):
+            _replace_file(
+                os.path.join(index_dir, name),
+                lambda f: json.dump(content, f, ensure_ascii=False),
+                binary=False
+            )
+
+        # Processes still mapping an older version keep their pages until they reopen;
+        # temp files may belong to another process saving right now
+        for name in os.listdir(index_dir):
+            if name.startswith("tfidf-") and not name.startswith(prefix + ".") and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(index_dir, name))
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, index_dir: str, fingerprint: Optional[str] = None) -> Optional["TfidfIndex"]:
+        """
+        Memory-map a saved index.
+
+        Args:
+            index_dir (str): Directory written by save()
+            fingerprint (str, optional): Required fingerprint; a different saved one counts as stale
+
+        Returns:
+            TfidfIndex: Index backed by read-only memory maps, or None if missing, stale or unreadable
+        """
+        if not os.path.isfile(os.path.join(index_dir, MANIFEST)):
+            return None
+        try:
+            with open(os.path.join(index_dir, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != FORMAT_VERSION:
+                return None
+            if fingerprint is not None and manifest.get("fingerprint") != fingerprint:
+                return None
+
+            prefix = os.path.join(index_dir, manifest["prefix"])
+            with open(prefix + ".json", encoding="utf-8") as f:
+                metadata = json.load(f)
+            matrix = np.load(prefix + ".matrix.npy", mmap_mode="r")
+            idf = np.load(prefix + ".idf.npy", mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cannot load TF-IDF index from {index_dir}: {str(e)}")
+            return None
+
+        chunks = [KnowledgeChunk(chunk["id"], chunk["title"], chunk["content"], chunk["source"])
+                  for chunk in metadata["chunks"]]
+        return cls(chunks, metadata["terms"], idf, matrix, fingerprint=manifest.get("fingerprint"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "type": "tfidf",
+            "chunks": len(self.chunks),
+            "terms": len(self.terms),
+            "memory_mapped": isinstance(self.matrix, np.memmap),
+            "matrix_bytes": int(self.matrix.nbytes),
+        }
+
+
+def open_tfidf_index(index_dir: Optional[str], paths: Sequence[str],
+                     load_chunks: Callable[[], List[KnowledgeChunk]]) -> TfidfIndex:
+    """
+    Memory-map the saved index if it matches the sources, otherwise build and save it.
+
+    Args:
+        index_dir (str, optional): Directory of the saved arrays, None to build in memory only
+        paths (Sequence[str]): Source files the index is built from
+        load_chunks (Callable): Parses the sources, only called when (re)building
+
+    Returns:
+        TfidfIndex: Ready index
+    """
+    fingerprint = sources_fingerprint(paths)
+    if index_dir:
+        index = TfidfIndex.load(index_dir, fingerprint)
+        if index is not None:
+            return index
+
+    index = TfidfIndex.build(load_chunks(), fingerprint=fingerprint)
+    if index_dir:
+        try:
+            index.save(index_dir)
+            # Reopen so this process shares the mapped pages like every other worker
+            return TfidfIndex.load(index_dir, fingerprint) or index
+        except OSError as e:
+            logger.error(f"Cannot save TF-IDF index to {index_dir}: {str(e)}")
+    return index
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the TF-IDF index or score questions against it")
+    parser.add_argument("questions", nargs="?", help="Text file with one question per line")
+    parser.add_argument("--k", type=int, default=3, help="Results per question")
+    parser.add_argument("--build", action="store_true", help="Rebuild and save the index, then exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    from first_aid_retrieval import load_knowledge_chunks, source_files
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    text_path = os.getenv('ATLAS_FIRST_AID_TEXT', os.path.join(root, 'FirstAidInfo.txt'))
+    data_dir = os.getenv('ATLAS_FIRST_AID_DATA_DIR', os.path.join(root, 'assets', 'first_aid_data'))
+    index_dir = os.getenv('ATLAS_RETRIEVAL_INDEX_DIR', '.retrieval_index') or None
+    paths = source_files(text_path, data_dir)
+
+    if args.build:
+        index = TfidfIndex.build(load_knowledge_chunks(text_path, data_dir), fingerprint=sources_fingerprint(paths))
+        if index_dir:
+            index.save(index_dir)
+        print(f"Indexed {len(index.chunks)} chunks, {len(index.terms)} terms -> {index_dir}", file=sys.stderr)
+        return 0
+
+    if not args.questions:
+        print("Give a questions file or --build", file=sys.stderr)
+        return 1
+
+    index = open_tfidf_index(index_dir, paths, lambda: load_knowledge_chunks(text_path, data_dir))
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    for question, results in zip(questions, index.search_batch(questions, args.k)):
+        line = {"query": question,
+                "results": [{"id": chunk.id, "title": chunk.title, "score": round(score, 4)}
+                            for score, chunk in results]}
+        sys.stdout.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from arabic_text import normalize_for_speech
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so trivially different requests share audio.
+
+    Args:
+        text (str): Text sent for synthesis
+
+    Returns:
+        str: Text normalized by arabic_text.normalize_for_speech()
+    """
+    return normalize_for_speech(text)
+
+
+def make_cache_key(text: str, voice: str, output_format: str) -> str:
+    """
+    Build a content-addressed cache key for synthesized audio.
+
+    Args:
+        text (str): Text to synthesize
+        voice (str): Azure voice name
+        output_format (str): Audio output format name
+
+    Returns:
+        str: Hex SHA-256 digest of (normalized text, voice, format)
+    """
+    payload = "\x1f".join([normalize_text(text), voice, output_format])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Two-tier cache for synthesized audio.
+
+    A bounded in-memory LRU sits in front of an on-disk store. Both tiers
+    evict least recently used entries once their byte budget is exceeded.
+
+    With shared=True several processes use the same cache_dir: a key that
+    is missing from this process's disk index is still looked up on disk,
+    so audio synthesized by one worker is served by all of them. Disk hits
+    refresh the file's mtime and every scan_interval the index is rebuilt
+    from the directory, so max_disk_bytes bounds what all processes wrote
+    together, evicting least recently used files first.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_memory_bytes: int = 32 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024,
+                 shared: bool = False, scan_interval: float = 30.0):
+        """
+        Initialize the audio cache.
+
+        Args:
+            cache_dir (str, optional): Directory for the disk tier, None to disable it
+            max_memory_bytes (int): Byte budget of the in-memory tier
+            max_disk_bytes (int): Byte budget of the disk tier
+            shared (bool): Other processes write to cache_dir too
+            scan_interval (float): Seconds between directory scans in shared mode
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.shared = shared and bool(cache_dir)
+        self.scan_interval = scan_interval
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._last_scan = time.monotonic()
+        self._scanning = False
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "invalidations": 0,
+        }
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.audio")
+
+    def _scan_disk(self) -> list:
+        """List (mtime, key, size) of every audio file in cache_dir."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".audio"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        return entries
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU index from files left by a previous run."""
+        for _, key, size in sorted(self._scan_disk()):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+        self.logger.info(f"Audio cache loaded {len(self._disk)} entries from {self.cache_dir}")
+        self._evict_disk()
+
+    def _rescan_shared(self):
+        """Replace the disk index with what all processes wrote, then evict to the budget."""
+        with self._lock:
+            if self._scanning or time.monotonic() - self._last_scan < self.scan_interval:
+                return
+            self._scanning = True
+        try:
+            entries = self._scan_disk()
+            with self._lock:
+                self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+                self._disk_bytes = sum(self._disk.values())
+                self._evict_disk()
+        finally:
+            with self._lock:
+                self._scanning = False
+                self._last_scan = time.monotonic()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up audio by cache key.
+
+        Args:
+            key (str): Key from make_cache_key()
+
+        Returns:
+            bytes: Cached audio or None on miss
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return data
+
+            if key not in self._disk and not self.shared:
+                self.stats["misses"] += 1
+                return None
+
+        path = self._path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+                self.stats["misses"] += 1
+            return None
+
+        if self.shared:
+            # The mtime is the recency other processes see when they evict
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            elif self.shared:
+                # Written by another process; track it so this process evicts it too
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+                self._evict_disk()
+            self.stats["disk_hits"] += 1
+            self._store_memory(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """
+        Store audio in both tiers.
+
+        Args:
+            key (str): Key from make_cache_key()
+            data (bytes): Synthesized audio
+        """
+        if not data:
+            return
+
+        if self.cache_dir and len(data) <= self.max_disk_bytes:
+            path = self._path_for(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self.logger.error(f"Error writing audio cache entry: {e}")
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            else:
+                with self._lock:
+                    previous = self._disk.pop(key, None)
+                    if previous is not None:
+                        self._disk_bytes -= previous
+                    self._disk[key] = len(data)
+                    self._disk_bytes += len(data)
+                    self._evict_disk()
+                if self.shared:
+                    self._rescan_shared()
+
+        with self._lock:
+            self.stats["puts"] += 1
+            self._store_memory(key, data)
+
+    def _store_memory(self, key: str, data: bytes):
+        # Caller must hold self._lock
+        if len(data) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def _evict_disk(self):
+        # Caller must hold self._lock (or be in __init__)
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.stats["disk_evictions"] += 1
+            try:
+                os.unlink(self._path_for(key))
+            except OSError:
+                pass
+
+    def delete(self, key: str) -> bool:
+        """
+        Drop one entry from both tiers.
+
+        Args:
+            key (str): Key from make_cache_key()
+
+        Returns:
+            bool: True if the entry existed
+        """
+        with self._lock:
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+        removed = data is not None or size is not None
+        if self.cache_dir and (size is not None or self.shared):
+            try:
+                os.unlink(self._path_for(key))
+                removed = True
+            except OSError:
+                pass
+        if removed:
+            with self._lock:
+                self.stats["invalidations"] += 1
+        return removed
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            keys = list(self._disk)
+            self._disk.clear()
+            self._disk_bytes = 0
+        for key in keys:
+            try:
+                os.unlink(self._path_for(key))
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and tier sizes.
+
+        Returns:
+            dict: Hit/miss/eviction counters plus entry and byte counts
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            })
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def create_audio_cache_from_env() -> Optional[AudioCache]:
+    """
+    Create AudioCache instance from environment variables.
+
+    Optional environment variables:
+    - ATLAS_TTS_CACHE: Set to "0" to disable caching
+    - ATLAS_TTS_CACHE_DIR: Disk tier directory (default: .tts_cache)
+    - ATLAS_TTS_CACHE_MEMORY_MB: In-memory tier budget (default: 32)
+    - ATLAS_TTS_CACHE_DISK_MB: Disk tier budget (default: 512)
+    - ATLAS_TTS_CACHE_SHARED: Set to "1" when several processes share the disk tier
+      (set by prefork_server.py)
+    - ATLAS_TTS_CACHE_SCAN_INTERVAL: Seconds between scans of a shared disk tier that
+      enforce its budget across processes (default: 30)
+
+    Returns:
+        AudioCache: Configured cache or None if disabled
+    """
+    if os.getenv('ATLAS_TTS_CACHE', '1') == '0':
+        return None
+
+    cache_dir = os.getenv('ATLAS_TTS_CACHE_DIR', '.tts_cache')
+    memory_mb = float(os.getenv('ATLAS_TTS_CACHE_MEMORY_MB', '32'))
+    disk_mb = float(os.getenv('ATLAS_TTS_CACHE_DISK_MB', '512'))
+
+    return AudioCache(
+        cache_dir=cache_dir or None,
+        max_memory_bytes=int(memory_mb * 1024 * 1024),
+        max_disk_bytes=int(disk_mb * 1024 * 1024),
+        shared=os.getenv('ATLAS_TTS_CACHE_SHARED', '0') == '1',
+        scan_interval=float(os.getenv('ATLAS_TTS_CACHE_SCAN_INTERVAL', '30'))
+    )
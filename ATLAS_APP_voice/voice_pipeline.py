@@ -0,0 +1,407 @@
+import os
+import time
+import queue
+import base64
+import logging
+import importlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+from audio_formats import DEFAULT_SAMPLE_RATE, detect_stream_format
+from text_segmenter import SENTENCE_BOUNDARY, split_sentences
+from metrics import observe_stage
+
+CHUNK_SIZE = 8192
+
+# Leading list bullets in the knowledge text, not read out
+BULLETS = "•-*· \t"
+
+# Said when nothing in the knowledge base matches the question
+NO_CONTEXT_ANSWER = "ما لقيتش معلومات على هاد الحالة. إلا كانت الحالة خطيرة، عيّط للإسعاف فالرقم 150 ولا 15."
+
+
+class ResponseGenerator(ABC):
+    """Produces the spoken answer for a voice turn, as a stream of text pieces."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, question: str, context: List[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Stream the answer to a question.
+
+        Args:
+            question (str): Transcript of the user's turn
+            context (list): Retrieved passages (id, title, content, source, score), best first
+
+        Yields:
+            str: Consecutive pieces of the answer (tokens, words or whole sentences)
+        """
+
+
+class LocalResponseGenerator(ResponseGenerator):
+    """
+    Extractive stand-in for a language model, for tests and offline use.
+
+    Answers with the first lines of the best passage (without its
+    title), streamed word by word, optionally with a delay per word to imitate token latency.
+    """
+
+    name = "local"
+
+    def __init__(self, max_sentences: int = 4, token_delay: float = 0.0):
+        """
+        Initialize the generator.
+
+        Args:
+            max_sentences (int): Lines of the best passage used in the answer
+            token_delay (float): Seconds to wait before each word
+        """
+        self.max_sentences = max_sentences
+        self.token_delay = token_delay
+
+    def generate(self, question: str, context: List[Dict[str, Any]]) -> Iterator[str]:
+        # The title is an index label ("الفصل 5: ..."), not something to read out
+        lines = [line.strip(BULLETS) for line in context[0]["content"].splitlines()] if context else []
+        lines = [line for line in lines if line]
+        # Every line is a sentence of its own when spoken
+        answer = " ".join(line if line[-1] in ".!?؟؛…" else f"{line}." for line in lines[:self.max_sentences])
+        answer = answer or NO_CONTEXT_ANSWER
+
+        for index, word in enumerate(answer.split(" ")):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if index == 0 else f" {word}"
+
+
+class SentenceStream:
+    """
+    Cuts streamed text into sentences as soon as each one is complete.
+
+    Text is held until a sentence boundary arrives; complete text goes
+    through split_sentences(), and pieces shorter than min_chars wait for
+    the next one so list markers and short exclamations are not spoken
+    on their own.
+    """
+
+    def __init__(self, min_chars: int = 20, max_chars: int = 300):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def _segments(self, text: str) -> List[str]:
+        segments = []
+        for piece in split_sentences(text, min_chars=1, max_chars=self.max_chars):
+            self._pending = f"{self._pending} {piece}" if self._pending else piece
+            if len(self._pending) >= self.min_chars:
+                segments.append(self._pending)
+                self._pending = ""
+        return segments
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add streamed text.
+
+        Args:
+            text (str): Next piece of the answer
+
+        Returns:
+            list: Sentences completed by this piece, possibly empty
+        """
+        self._buffer += text
+        boundary = None
+        for boundary in SENTENCE_BOUNDARY.finditer(self._buffer):
+            pass
+        if boundary is None:
+            return []
+        complete, self._buffer = self._buffer[:boundary.start()], self._buffer[boundary.end():]
+        return self._segments(complete)
+
+    def flush(self) -> List[str]:
+        """
+        End of the answer.
+
+        Returns:
+            list: Remaining sentences
+        """
+        segments = self._segments(self._buffer)
+        self._buffer = ""
+        if self._pending:
+            segments.append(self._pending)
+            self._pending = ""
+        return segments
+
+
+class QueueAudioReader:
+    """
+    File-like reader over chunks put on a queue by another thread.
+
+    Lets the asyncio server stream an upload into the (blocking) pipeline
+    while the body is still arriving. put() never blocks, so it is safe to
+    call from the event loop; put(None) marks the end.
+    """
+
+    def __init__(self):
+        self._chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._buffer = b""
+        self._eof = False
+
+    def put(self, chunk: Optional[bytes]):
+        self._chunks.put(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer += chunk
+            if self._buffer and size >= 0:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class VoiceTurnPipeline:
+    """
+    One voice turn on the server: audio in, grounded spoken answer out.
+
+    Stages overlap wherever their input allows it:
+    - the upload is pushed into streaming recognition while it arrives;
+    - every final recognition result triggers a retrieval of the transcript
+      so far, so the context is usually ready when recognition ends;
+    - the answer is cut into sentences while the generator is still
+      streaming, and each sentence is synthesized as soon as it completes
+      (up to max_parallel_tts at once), so the first audio is sent while
+      later sentences are still being generated.
+
+    run() yields events in order: "transcript", "context", then a
+    "sentence" event as each sentence is sent to synthesis and an "audio"
+    event (same index) when its audio is ready, and a final "done" with
+    per-stage timings (or "error" if the turn cannot continue).
+    """
+
+    def __init__(self, stt, retriever, generator: ResponseGenerator,
+                 synthesize: Callable[[str], Optional[bytes]], max_parallel_tts: int = 3,
+                 top_k: int = 3, stt_timeout: float = 30.0):
+        """
+        Initialize the pipeline.
+
+        Args:
+            stt (SpeechToTextBackend): Backend creating the push-stream recognition
+            retriever (FirstAidRetriever): Knowledge retrieval
+            generator (ResponseGenerator): Answer generator
+            synthesize (Callable): synthesize(text) -> audio bytes or None, e.g. through the audio cache
+            max_parallel_tts (int): Sentences synthesized at the same time
+            top_k (int): Passages retrieved as context
+            stt_timeout (float): Seconds to wait for recognition after the upload ends
+        """
+        self.stt = stt
+        self.retriever = retriever
+        self.generator = generator
+        self.synthesize = synthesize
+        self.max_parallel_tts = max(1, max_parallel_tts)
+        self.top_k = top_k
+        self.stt_timeout = stt_timeout
+
+        # Configure logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+    def _recognize(self, audio: BinaryIO, language: Optional[str], sample_rate: int,
+                   timings: Dict[str, Any], started: float, prefetch: Dict[str, Any]) -> Optional[str]:
+        finals = []
+
+        def on_recognized(text: str):
+            finals.append(text)
+            if "stt_first_result" not in timings:
+                timings["stt_first_result"] = time.perf_counter() - started
+            # Retrieve for the transcript so far; the last one usually matches the final transcript
+            transcript = " ".join(finals)
+            try:
+                prefetch.update(text=transcript, results=self.retriever.retrieve(transcript, self.top_k))
+            except Exception as e:
+                self.logger.error(f"Error prefetching context: {str(e)}")
+
+        header = audio.read(CHUNK_SIZE)
+        stream_format = detect_stream_format(header, sample_rate)
+        while stream_format is None:
+            chunk = audio.read(CHUNK_SIZE)
+            if not chunk:
+                raise ValueError("No audio received")
+            header += chunk
+            stream_format = detect_stream_format(header, sample_rate)
+        rate, bits, channels, data_offset = stream_format
+
+        recognition = self.stt.create_push_recognition(
+            language, sample_rate=rate, bits_per_sample=bits, channels=channels, on_recognized=on_recognized
+        )
+        recognition.start()
+        try:
+            chunk = header[data_offset:]
+            while chunk:
+                recognition.write(chunk)
+                chunk = audio.read(CHUNK_SIZE)
+        except Exception:
+            recognition.stop()
+            raise
+        timings["upload"] = time.perf_counter() - started
+
+        recognition.close()
+        text = recognition.wait(self.stt_timeout)
+        if not text and recognition.error:
+            raise RuntimeError(recognition.error)
+        return text
+
+    def _audio_event(self, index: int, text: str, future, audio_format: str) -> Dict[str, Any]:
+        try:
+            audio = future.result()
+        except Exception as e:
+            self.logger.error(f"Error synthesizing sentence {index + 1}: {str(e)}")
+            audio = None
+        event = {"type": "audio", "index": index, "text": text, "format": audio_format}
+        if audio:
+            event["audio"] = base64.b64encode(audio).decode("ascii")
+        else:
+            event["error"] = "Synthesis failed"
+        return event
+
+    def run(self, audio: BinaryIO, language: Optional[str] = None, sample_rate: int = DEFAULT_SAMPLE_RATE,
+            audio_format: str = "wav") -> Iterator[Dict[str, Any]]:
+        """
+        Run one turn.
+
+        Args:
+            audio (BinaryIO): WAV or raw 16-bit mono PCM, read in chunks as it arrives
+            language (str, optional): Recognition language, defaults to the backend's language
+            sample_rate (int): Sample rate for raw PCM input
+            audio_format (str): Output format name reported with the audio
+
+        Yields:
+            dict: Pipeline events; audio is base64-encoded. In the "done" timings,
+            upload, stt, stt_first_result, generation_first_token, first_sentence,
+            first_audio and total are seconds since the turn started;
+            stt_finalize, retrieval and generation are stage durations
+        """
+        started = time.perf_counter()
+        timings: Dict[str, Any] = {}
+
+        def elapsed() -> float:
+            return time.perf_counter() - started
+
+        # Stage 1: streaming recognition of the upload
+        prefetch: Dict[str, Any] = {}
+        try:
+            transcript = self._recognize(audio, language, sample_rate, timings, started, prefetch)
+        except Exception as e:
+            self.logger.error(f"Voice turn recognition failed: {str(e)}")
+            yield {"type": "error", "stage": "stt", "error": str(e)}
+            return
+        timings["stt"] = elapsed()
+        timings["stt_finalize"] = timings["stt"] - timings["upload"]
+        if not transcript:
+            yield {"type": "error", "stage": "stt", "error": "No speech detected"}
+            return
+        yield {"type": "transcript", "text": transcript}
+
+        # Stage 2: retrieval (already done while recognizing when the transcript did not change since)
+        stage_started = time.perf_counter()
+        if prefetch.get("text") == transcript:
+            context = prefetch["results"]
+            timings["retrieval_prefetched"] = True
+        else:
+            context = self.retriever.retrieve(transcript, self.top_k)
+            timings["retrieval_prefetched"] = False
+        timings["retrieval"] = time.perf_counter() - stage_started
+        yield {"type": "context", "passages": [
+            {"id": passage["id"], "title": passage["title"], "score": passage["score"]} for passage in context
+        ]}
+
+        # Stages 3 and 4: generation, with each finished sentence synthesized while generation continues
+        stage_started = time.perf_counter()
+        sentences = SentenceStream()
+        answer = []
+        in_flight = deque()
+        index = 0
+        with ThreadPoolExecutor(max_workers=self.max_parallel_tts, thread_name_prefix="turn-tts") as executor:
+            try:
+                def submit(texts: List[str]) -> Iterator[Dict[str, Any]]:
+                    nonlocal index
+                    for text in texts:
+                        if "first_sentence" not in timings:
+                            timings["first_sentence"] = elapsed()
+                        in_flight.append((index, text, executor.submit(self.synthesize, text)))
+                        # Clients can show the text while its audio is being synthesized
+                        yield {"type": "sentence", "index": index, "text": text}
+                        index += 1
+
+                def ready_events(block: bool) -> Iterator[Dict[str, Any]]:
+                    while in_flight and (block or in_flight[0][2].done()):
+                        event = self._audio_event(*in_flight.popleft(), audio_format)
+                        if "first_audio" not in timings and "audio" in event:
+                            timings["first_audio"] = elapsed()
+                        yield event
+
+                try:
+                    for piece in self.generator.generate(transcript, context):
+                        if "generation_first_token" not in timings:
+                            timings["generation_first_token"] = elapsed()
+                        answer.append(piece)
+                        yield from submit(sentences.feed(piece))
+                        yield from ready_events(block=False)
+                except Exception as e:
+                    self.logger.error(f"Response generation failed: {str(e)}")
+                    yield {"type": "error", "stage": "generation", "error": str(e)}
+                yield from submit(sentences.flush())
+                timings["generation"] = time.perf_counter() - stage_started
+                yield from ready_events(block=True)
+            finally:
+                for _, _, future in in_flight:
+                    future.cancel()
+
+        timings["total"] = elapsed()
+        timings["sentences"] = index
+        for stage in ("stt", "stt_finalize", "retrieval", "generation", "first_audio", "total"):
+            if stage in timings:
+                observe_stage("voice_turn", stage, timings[stage])
+        yield {
+            "type": "done",
+            "transcript": transcript,
+            "response": "".join(answer).strip(),
+            "timings": {name: round(value, 4) if isinstance(value, float) else value
+                        for name, value in timings.items()}
+        }
+
+
+def create_response_generator_from_env() -> Optional[ResponseGenerator]:
+    """
+    Create the response generator selected by environment variables.
+
+    Optional environment variables:
+    - ATLAS_RESPONSE_GENERATOR: "local" (default) for the extractive stand-in, or
+      "module:Class" naming a ResponseGenerator subclass to construct without arguments
+    - ATLAS_LOCAL_GENERATOR_TOKEN_DELAY: Seconds per word for the local generator (default: 0)
+
+    Returns:
+        ResponseGenerator: Configured generator or None if it cannot be loaded
+    """
+    name = os.getenv('ATLAS_RESPONSE_GENERATOR', 'local')
+    if name == 'local':
+        return LocalResponseGenerator(token_delay=float(os.getenv('ATLAS_LOCAL_GENERATOR_TOKEN_DELAY', '0')))
+
+    try:
+        module_name, class_name = name.split(':', 1)
+        generator = getattr(importlib.import_module(module_name), class_name)()
+    except (ValueError, ImportError, AttributeError, TypeError) as e:
+        logging.getLogger(__name__).error(f"Cannot load response generator {name}: {str(e)}")
+        return None
+    if not isinstance(generator, ResponseGenerator):
+        logging.getLogger(__name__).error(f"{name} is not a ResponseGenerator")
+        return None
+    return generator
@@ -159,19 +159,25 @@ class _VoiceChatPageState extends State<VoiceChatPage> with TickerProviderStateM
         body: jsonEncode({
           'text': text,
           'voice': 'ar-MA-MounaNeural',
+          'format': 'mp3', // ~10x smaller than WAV over mobile data
         }),
       ).timeout(Duration(seconds: 30));
       
       print('TTS Response status: ${response.statusCode}');
       print('TTS Response size: ${response.bodyBytes.length} bytes');
       
+      final contentType = response.headers['content-type'] ?? '';
+      
       if (response.statusCode == 200) {
-        if (response.bodyBytes.length > 1000) {
+        if (contentType.startsWith('audio/')) {
           // Save audio file temporarily and play it
-          return await _playAudioFromBytes(response.bodyBytes);
+          final extension = contentType.startsWith('audio/mpeg')
+              ? 'mp3'
+              : contentType.startsWith('audio/ogg') ? 'ogg' : 'wav';
+          return await _playAudioFromBytes(response.bodyBytes, extension);
         } else {
-          print('TTS response too small, likely an error');
-          _showSnackBar('استجابة صوتية صغيرة جداً، ربما هناك خطأ');
+          print('TTS response is not audio ($contentType): ${response.body}');
+          _showSnackBar('استجابة غير صوتية من الخادم، ربما هناك خطأ');
           return false;
         }
       } else {
@@ -186,13 +192,13 @@ class _VoiceChatPageState extends State<VoiceChatPage> with TickerProviderStateM
     }
   }
 
-  Future<bool> _playAudioFromBytes(List<int> audioBytes) async {
+  Future<bool> _playAudioFromBytes(List<int> audioBytes, [String extension = 'wav']) async {
     try {
       print('Audio received: ${audioBytes.length} bytes');
       
       // Get temporary directory
       final tempDir = await getTemporaryDirectory();
-      final tempFile = File('${tempDir.path}/temp_audio_${DateTime.now().millisecondsSinceEpoch}.wav');
+      final tempFile = File('${tempDir.path}/temp_audio_${DateTime.now().millisecondsSinceEpoch}.$extension');
       
       // Write audio bytes to temporary file
       await tempFile.writeAsBytes(audioBytes);
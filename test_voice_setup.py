@@ -14,6 +14,10 @@ def test_environment_variables():
     """Test if Azure environment variables are set"""
     print("🔧 Testing Environment Variables...")
     
+    if os.getenv('ATLAS_SPEECH_BACKEND', 'azure').lower() == 'fake':
+        print("✅ ATLAS_SPEECH_BACKEND=fake: Azure credentials not needed")
+        return True
+    
     key = os.getenv('AZURE_SPEECH_KEY')
     region = os.getenv('AZURE_SPEECH_REGION')
     
@@ -128,6 +132,44 @@ def test_text_to_speech(base_url="http://localhost:5000"):
         print(f"❌ Error testing TTS: {e}")
         return False
 
+# Spoken questions and the chunks (id prefixes) their best retrieval result must come from
+RETRIEVAL_CHECKS = [
+    ("كيفاش نعرف واش عندو كسر فاليد؟", ("fractures", "guide_8")),
+    ("كيفاش نعمل الإنعاش", ("cpr",)),
+    ("كيفاش نوقف النزيف ديال الجرح؟", ("bleeding", "wounds", "guide_5")),
+    ("ولدي بلع شي حاجة وكيتخنق", ("choking", "guide_4")),
+    ("شنو ندير فحالة لدغة العقرب؟", ("scorpion_stings",)),
+    # Inflected and broken-plural forms only reachable through light stemming
+    ("تحرقت", ("burns", "guide_7")),
+    ("شنو ندير إلا شي واحد تحرق؟", ("burns", "guide_7")),
+    ("كسر", ("fractures", "guide_8")),
+    ("عندو كسور فرجلو", ("fractures", "guide_8")),
+]
+
+def test_retrieval():
+    """Check that Darija questions retrieve the right first-aid topic (no server needed)"""
+    print(f"\n📚 Testing First-Aid Retrieval...")
+    
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "ATLAS_APP_voice"))
+    from first_aid_retrieval import FirstAidRetriever
+    
+    root = Path(__file__).resolve().parent
+    failures = 0
+    for index_type in ("bm25", "tfidf"):
+        retriever = FirstAidRetriever(
+            str(root / "FirstAidInfo.txt"), str(root / "assets" / "first_aid_data"), index_type=index_type
+        )
+        for query, expected in RETRIEVAL_CHECKS:
+            results = retriever.retrieve(query, 3)
+            top = results[0]['id'] if results else None
+            if top and top.startswith(expected):
+                print(f"✅ [{retriever.index_type}] {query} -> {top}")
+            else:
+                print(f"❌ [{retriever.index_type}] {query} -> {[result['id'] for result in results]}, expected {expected}")
+                failures += 1
+    
+    return failures == 0
+
 def test_flutter_dependencies():
     """Check if Flutter dependencies are properly configured"""
     print(f"\n📦 Testing Flutter Dependencies...")
@@ -200,6 +242,7 @@ def main():
     
     tests = [
         ("Environment Variables", test_environment_variables),
+        ("First-Aid Retrieval", test_retrieval),
         ("Flutter Dependencies", test_flutter_dependencies),
         ("Android Permissions", test_android_permissions),
         ("Flask Server", test_flask_server),